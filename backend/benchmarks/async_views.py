@@ -0,0 +1,300 @@
+"""
+Throughput and tail latency of single-exercise-history served by a sync WSGI
+worker (what gunicorn's sync workers do: one request at a time) against the
+async view under one uvicorn worker, with the same number of concurrent
+clients. Both servers run in this process against the test database and
+authenticate real Supabase-style tokens against a local JWKS endpoint. The
+clients run in a process of their own.
+
+Two scenarios: every token signed by a cached key, and one token in
+ROTATED_EVERY signed by a key just rotated in, which has to be fetched from a
+JWKS endpoint that takes JWKS_DELAY seconds to answer, as when Supabase is
+slow. "others p99" is the tail latency of the requests that needed no fetch.
+
+The test database is SQLite unless run in Docker, where queries are CPU work
+in this process rather than waits on MySQL, which favours the sync worker.
+"""
+
+import asyncio
+import itertools
+import json
+import multiprocessing
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from . import print_table, setup, test_database
+
+SESSIONS = 100
+CONCURRENCY = 32
+REQUESTS = 400
+ROTATED_EVERY = 10
+JWKS_DELAY = 0.2
+
+
+class JWKSServer(ThreadingHTTPServer):
+    """
+    Serves the keys published so far, JWKS_DELAY seconds late. Keys are
+    published by POSTing them.
+    """
+
+    request_queue_size = 2048
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), JWKSHandler)
+        self.keys = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/jwks.json"
+
+
+class JWKSHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(JWKS_DELAY)
+        body = json.dumps({"keys": list(self.server.keys)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers["Content-Length"])
+        self.server.keys.append(json.loads(self.rfile.read(length)))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class SyncWorker(WSGIServer):
+    # gunicorn's default backlog, so that waiting clients queue rather than
+    # being refused
+    request_queue_size = 2048
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def make_key(kid):
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from jwt.algorithms import ECAlgorithm
+
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    jwk = json.loads(ECAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": kid, "use": "sig", "alg": "ES256"})
+    return private_key, jwk
+
+
+def make_token(private_key, kid, audience):
+    import jwt
+
+    payload = {
+        "sub": "supabase-lifter",
+        "email": "lifter@example.com",
+        "aud": audience,
+        "exp": int(time.time()) + 3600,
+    }
+    return jwt.encode(payload, private_key, algorithm="ES256", headers={"kid": kid})
+
+
+def log_history(user):
+    from django.utils import timezone
+    from tracker.models import Exercise, Set, Workout
+
+    now = timezone.now()
+    Workout.objects.bulk_create(
+        Workout(user=user, name="Session", date=now - timedelta(days=i))
+        for i in range(SESSIONS)
+    )
+    Exercise.objects.bulk_create(
+        workout.build_exercise(name="Squat", rest_period=timedelta(seconds=180))
+        for workout in Workout.objects.filter(user=user)
+    )
+    Set.objects.bulk_create(
+        Set(exercise_id=pk, min_reps=5, max_reps=8, reps=6, weight=100 + i * 2.5)
+        for pk in Exercise.objects.filter(user=user).values_list("pk", flat=True)
+        for i in range(5)
+    )
+
+
+def start_wsgi_server():
+    from django.core.wsgi import get_wsgi_application
+
+    server = make_server(
+        "127.0.0.1",
+        0,
+        get_wsgi_application(),
+        server_class=SyncWorker,
+        handler_class=QuietHandler,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+def start_asgi_server():
+    import uvicorn
+    from django.core.asgi import get_asgi_application
+
+    config = uvicorn.Config(
+        get_asgi_application(), port=0, log_level="warning", lifespan="off"
+    )
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+def run_load(url, tokens, jwks_url):
+    """
+    Requests url once per (token, jwk) from CONCURRENCY clients, publishing
+    the jwk (if any) on the JWKS endpoint just before. Returns the wall time
+    and the latencies of the requests with and without a jwk, in seconds.
+    """
+    import httpx
+
+    async def load():
+        queue = asyncio.Queue()
+        for token in tokens:
+            queue.put_nowait(token)
+        latencies = {True: [], False: []}
+
+        async def client(http):
+            while not queue.empty():
+                token, jwk = queue.get_nowait()
+                if jwk is not None:
+                    await http.post(jwks_url, json=jwk)
+                start = time.perf_counter()
+                response = await http.get(
+                    url, headers={"Authorization": f"Bearer {token}"}
+                )
+                latencies[jwk is not None].append(time.perf_counter() - start)
+                assert response.status_code == 200, response.status_code
+
+        limits = httpx.Limits(max_connections=CONCURRENCY * 2)
+        async with httpx.AsyncClient(limits=limits, timeout=60) as http:
+            start = time.perf_counter()
+            await asyncio.gather(*(client(http) for _ in range(CONCURRENCY)))
+            return time.perf_counter() - start, latencies
+
+    return asyncio.run(load())
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def make_tokens(jwks_server, audience, rotated_every=None):
+    """
+    REQUESTS (token, jwk) pairs. jwk is set for the tokens signed by a newly
+    rotated key, which the JWKS endpoint starts serving just before the
+    token's request.
+    """
+    private_key, jwk = make_key("current")
+    jwks_server.keys = [jwk]
+    token = make_token(private_key, "current", audience)
+    tokens = []
+    for i in range(REQUESTS):
+        if rotated_every and i % rotated_every == 0:
+            new_key, new_jwk = make_key(f"rotated-{i}")
+            tokens.append((make_token(new_key, f"rotated-{i}", audience), new_jwk))
+        else:
+            tokens.append((token, None))
+    return tokens
+
+
+def main():
+    setup()
+    with test_database():
+        from django.conf import settings
+        from django.contrib.auth import get_user_model
+        from django.test import override_settings
+        from tracker import authentication, jwks
+
+        User = get_user_model()
+        user = User.objects.create_user(
+            username="lifter@example.com",
+            email="lifter@example.com",
+            supabase_id="supabase-lifter",
+        )
+        log_history(user)
+        audience = settings.SUPABASE_AUDIENCE
+
+        jwks_server = JWKSServer()
+        threading.Thread(target=jwks_server.serve_forever, daemon=True).start()
+        servers = [
+            ("WSGI, 1 sync worker", start_wsgi_server(), "/api/exercises/"),
+            ("ASGI, 1 uvicorn worker", start_asgi_server(), "/api/async/exercises/"),
+        ]
+        scenarios = [("keys cached", None), ("keys rotated", ROTATED_EVERY)]
+        clients = ProcessPoolExecutor(
+            1, mp_context=multiprocessing.get_context("spawn")
+        )
+
+        rows = []
+        try:
+            with clients, override_settings(ALLOWED_HOSTS=["127.0.0.1"]):
+                for (scenario, rotated_every), (
+                    name,
+                    (base_url, _),
+                    prefix,
+                ) in itertools.product(scenarios, servers):
+                    jwks._key_store = jwks.JWKSKeyStore(
+                        url=jwks_server.url, background=False, miss_cooldown=0
+                    )
+                    authentication.verified_tokens.clear()
+                    tokens = make_tokens(jwks_server, audience, rotated_every)
+                    # Fetch the current key before timing
+                    jwks._key_store.refresh()
+
+                    url = f"{base_url}{prefix}single-exercise-history/"
+                    url += "?exercise_name=Squat"
+                    elapsed, latencies = clients.submit(
+                        run_load, url, tokens, jwks_server.url
+                    ).result()
+                    all_latencies = latencies[True] + latencies[False]
+                    rows.append(
+                        [
+                            scenario,
+                            name,
+                            f"{len(tokens) / elapsed:.0f}",
+                            f"{statistics.median(all_latencies) * 1000:.1f}",
+                            f"{percentile(all_latencies, 0.95) * 1000:.1f}",
+                            f"{percentile(all_latencies, 0.99) * 1000:.1f}",
+                            f"{percentile(latencies[False], 0.99) * 1000:.1f}",
+                        ]
+                    )
+        finally:
+            for _, (_, stop), _ in servers:
+                stop()
+            jwks_server.shutdown()
+
+        print(
+            f"{CONCURRENCY} concurrent clients, {SESSIONS}-session history, "
+            f"{JWKS_DELAY * 1000:.0f} ms JWKS endpoint"
+        )
+        print_table(
+            ["scenario", "server", "req/s", "p50 ms", "p95 ms", "p99 ms", "others p99"],
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    main()
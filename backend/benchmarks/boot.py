@@ -0,0 +1,116 @@
+"""
+How long a new worker takes to answer its first request: started from
+scratch, as gunicorn did before gunicorn.conf.py, with and without the
+dependencies that are now only imported when used, and forked from a master
+that has preloaded the app, as it does now. Also the import time of each of
+those dependencies. The requests are unauthenticated, so no database is
+needed.
+"""
+
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from . import print_table, setup
+
+REPEAT = 10
+LAZY_IMPORTS = ["supabase", "numpy", "httpx"]
+PATH = "/api/exercises/"
+
+# Run in a fresh interpreter: imports the modules named in argv, sets up
+# Django and answers one request
+COLD_WORKER = f"""
+import os, sys
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "liftinglog.settings")
+for name in sys.argv[1:]:
+    __import__(name)
+import django
+django.setup()
+from django.test import Client
+from django.test.utils import setup_test_environment
+setup_test_environment()
+Client().get("{PATH}")
+"""
+
+IMPORT_TIME = """
+import os, sys, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "liftinglog.settings")
+import django
+django.setup()
+start = time.perf_counter()
+__import__(sys.argv[1])
+print(time.perf_counter() - start)
+"""
+
+
+def median_ms(timings):
+    return f"{statistics.median(timings) * 1000:.0f}"
+
+
+def run(code, *args):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", code, *args],
+        cwd=Path(__file__).resolve().parent.parent,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return time.perf_counter() - start, result.stdout
+
+
+def cold_worker(*imports):
+    return [run(COLD_WORKER, *imports)[0] for _ in range(REPEAT)]
+
+
+def forked_worker(client):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            client.get(PATH)
+            os._exit(0)
+        os.waitpid(pid, 0)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    setup()
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+    from django.urls import get_resolver
+
+    # What gunicorn.conf.py's when_ready does before forking
+    setup_test_environment()
+    get_resolver().url_patterns
+    client = Client()
+    logging.getLogger("django.request").setLevel(logging.ERROR)
+
+    rows = [
+        [
+            "from scratch, eager imports",
+            median_ms(cold_worker(*LAZY_IMPORTS)),
+        ],
+        ["from scratch, lazy imports", median_ms(cold_worker())],
+        ["forked from a preloaded master", median_ms(forked_worker(client))],
+    ]
+    print(f"Median ms from starting a worker to its first response ({REPEAT} runs)")
+    print_table(["worker", "ms"], rows)
+    print()
+
+    rows = [
+        [name, median_ms([float(run(IMPORT_TIME, name)[1]) for _ in range(REPEAT)])]
+        for name in LAZY_IMPORTS
+    ]
+    print("Median ms to import after django.setup(), now only on first use")
+    print_table(["module", "ms"], rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Exercise name search: LIKE '%x%' over every logged exercise (the old
+directory search), over the per-exercise summaries, and the trigram index.
+The index should cost the same however long the history gets.
+"""
+
+import random
+from datetime import timedelta
+
+from . import median_time, print_table, setup, test_database
+
+HISTORY_SIZES = [100, 1_000, 10_000]
+EXERCISES_PER_WORKOUT = 6
+NAMES = [
+    f"{variation} {movement}".strip()
+    for movement in [
+        "Squat",
+        "Bench Press",
+        "Deadlift",
+        "Overhead Press",
+        "Row",
+        "Pull Up",
+        "Curl",
+        "Lunge",
+        "Leg Press",
+        "Lateral Raise",
+    ]
+    for variation in ["", "Dumbbell", "Paused", "Incline", "Single Arm"]
+]
+QUERIES = ["bench", "dumbell pres", "sq"]
+
+
+def log_history(user, workouts):
+    from django.utils import timezone
+    from tracker.models import Exercise, ExerciseSummary, Workout
+
+    rng = random.Random(workouts)
+    now = timezone.now()
+    Workout.objects.bulk_create(
+        Workout(user=user, name="Session", date=now - timedelta(days=i))
+        for i in range(workouts)
+    )
+    created = Workout.objects.filter(user=user).order_by("id")
+    Exercise.objects.bulk_create(
+        (
+            workout.build_exercise(name=name, rest_period=timedelta(seconds=90))
+            for workout in created.iterator()
+            for name in rng.sample(NAMES, EXERCISES_PER_WORKOUT)
+        ),
+        batch_size=1000,
+    )
+    ExerciseSummary.rebuild(user.id)
+
+
+def main():
+    setup()
+    with test_database():
+        from django.contrib.auth import get_user_model
+        from tracker.models import Exercise, ExerciseNameTrigram, ExerciseSummary
+
+        User = get_user_model()
+        rows = []
+        for workouts in HISTORY_SIZES:
+            user = User.objects.create_user(
+                username=f"lifter-{workouts}", email=f"lifter-{workouts}@example.com"
+            )
+            log_history(user, workouts)
+
+            def exercise_scan():
+                for query in QUERIES:
+                    list(
+                        Exercise.objects.filter(
+                            workout__user=user, name__icontains=query
+                        )
+                        .values_list("name", flat=True)
+                        .distinct()
+                    )
+
+            def summary_scan():
+                for query in QUERIES:
+                    list(
+                        ExerciseSummary.objects.filter(
+                            user=user, name__icontains=query
+                        ).values_list("name", flat=True)
+                    )
+
+            def trigram_index():
+                for query in QUERIES:
+                    ExerciseNameTrigram.search(user, query, performed_only=True)
+
+            rows.append(
+                [
+                    workouts,
+                    workouts * EXERCISES_PER_WORKOUT,
+                    f"{median_time(exercise_scan):.2f}",
+                    f"{median_time(summary_scan):.2f}",
+                    f"{median_time(trigram_index):.2f}",
+                ]
+            )
+
+        print(f"Median ms for {len(QUERIES)} searches")
+        print_table(
+            ["workouts", "exercises", "exercise LIKE", "summary LIKE", "trigram"],
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Full history export: the nested workout serializer over the whole history
+(what paging through the API amounts to) against the streamed CSV and NDJSON
+exports. Peak memory of the serializer grows with the history, the streams'
+should stay flat.
+"""
+
+import time
+import tracemalloc
+from datetime import timedelta
+
+from . import print_table, setup, test_database
+
+HISTORY_SIZES = [100, 1_000, 5_000]
+EXERCISES_PER_WORKOUT = 5
+SETS_PER_EXERCISE = 4
+
+
+def log_history(user, workouts):
+    from django.utils import timezone
+    from tracker.models import Exercise, Set, Workout
+
+    now = timezone.now()
+    Workout.objects.bulk_create(
+        Workout(user=user, name="Session", date=now - timedelta(days=i))
+        for i in range(workouts)
+    )
+    Exercise.objects.bulk_create(
+        (
+            workout.build_exercise(name=f"Lift {i}", rest_period=timedelta(seconds=90))
+            for workout in Workout.objects.filter(user=user).iterator()
+            for i in range(EXERCISES_PER_WORKOUT)
+        ),
+        batch_size=1000,
+    )
+    Set.objects.bulk_create(
+        (
+            Set(exercise_id=pk, min_reps=5, max_reps=8, reps=6, weight=100)
+            for pk in Exercise.objects.filter(user=user)
+            .values_list("pk", flat=True)
+            .iterator()
+            for _ in range(SETS_PER_EXERCISE)
+        ),
+        batch_size=1000,
+    )
+
+
+def measure(func):
+    """
+    (wall time in ms, peak traced memory in MB) of one call.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return f"{elapsed * 1000:.0f}", f"{peak / 1024 / 1024:.1f}"
+
+
+def main():
+    setup()
+    with test_database():
+        from django.contrib.auth import get_user_model
+        from rest_framework.test import APIRequestFactory
+        from tracker import export
+        from tracker.models import Workout
+        from tracker.serializers import WorkoutSerializer
+        from tracker.views import prefetch_exercises
+
+        User = get_user_model()
+        request = APIRequestFactory().get("/api/workouts/")
+        rows = []
+        for workouts in HISTORY_SIZES:
+            user = User.objects.create_user(
+                username=f"lifter-{workouts}", email=f"lifter-{workouts}@example.com"
+            )
+            log_history(user, workouts)
+
+            def serializer():
+                queryset = prefetch_exercises(Workout.objects.filter(user=user))
+                WorkoutSerializer(
+                    queryset, many=True, context={"request": request}
+                ).data
+
+            def stream(file_format):
+                stream, _ = export.FORMATS[file_format]
+                for _ in stream(user):
+                    pass
+
+            sets = workouts * EXERCISES_PER_WORKOUT * SETS_PER_EXERCISE
+            rows.append(
+                [
+                    workouts,
+                    sets,
+                    *measure(serializer),
+                    *measure(lambda: stream("csv")),
+                    *measure(lambda: stream("ndjson")),
+                ]
+            )
+
+        print("Wall ms and peak MB for one full export")
+        print_table(
+            [
+                "workouts",
+                "sets",
+                "serializer ms",
+                "MB",
+                "csv ms",
+                "MB",
+                "ndjson ms",
+                "MB",
+            ],
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    main()
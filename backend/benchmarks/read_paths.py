@@ -0,0 +1,101 @@
+"""
+The workout list and single exercise history built by their serializers
+against the serializer-free fast paths in tracker/fast_reads.py, on responses
+of up to 10k rows. Queries included, rendering not.
+"""
+
+from datetime import timedelta
+
+from . import median_time, print_table, setup, test_database
+
+SIZES = [100, 1_000, 10_000]
+SETS_PER_EXERCISE = 5
+
+
+def log_history(user, sessions):
+    from django.utils import timezone
+    from tracker.models import Exercise, Set, Workout, WorkoutTemplate
+
+    now = timezone.now()
+    template = WorkoutTemplate.objects.create(user=user, name="Legs")
+    Workout.objects.bulk_create(
+        Workout(
+            user=user,
+            name="Session",
+            date=now - timedelta(days=i),
+            template=template if i % 2 else None,
+        )
+        for i in range(sessions)
+    )
+    Exercise.objects.bulk_create(
+        workout.build_exercise(name="Squat", rest_period=timedelta(seconds=180))
+        for workout in Workout.objects.filter(user=user)
+    )
+    Set.objects.bulk_create(
+        Set(exercise_id=pk, min_reps=5, max_reps=8, reps=6, weight=102.5 + i * 2.5)
+        for pk in Exercise.objects.filter(user=user).values_list("pk", flat=True)
+        for i in range(SETS_PER_EXERCISE)
+    )
+
+
+def main():
+    setup()
+    with test_database():
+        from django.contrib.auth import get_user_model
+        from rest_framework.test import APIRequestFactory
+        from tracker import fast_reads
+        from tracker.models import Exercise, Workout
+        from tracker.serializers import ExerciseSerializer, WorkoutListSerializer
+        from tracker.views import prefetch_sets
+
+        User = get_user_model()
+        rows = []
+        for sessions in SIZES:
+            user = User.objects.create_user(
+                username=f"lifter-{sessions}", email=f"lifter-{sessions}@example.com"
+            )
+            log_history(user, sessions)
+            request = APIRequestFactory().get("/api/workouts/")
+            request.user = user
+            workouts = Workout.objects.filter(user=user).select_related("user")
+            workouts = workouts.order_by("-date")
+            history = Exercise.objects.filter(user=user, name="Squat").order_by("date")
+            repeat = 5 if sessions >= 10_000 else 20
+
+            def serialized_list():
+                context = {"request": request}
+                return WorkoutListSerializer(workouts, many=True, context=context).data
+
+            def serialized_history():
+                return ExerciseSerializer(prefetch_sets(history), many=True).data
+
+            for name, slow, fast in [
+                (
+                    "workout list",
+                    serialized_list,
+                    lambda: fast_reads.workout_list(request, workouts),
+                ),
+                (
+                    "exercise history",
+                    serialized_history,
+                    lambda: fast_reads.exercise_history(history),
+                ),
+            ]:
+                assert slow() == fast()
+                slow_ms = median_time(slow, repeat)
+                fast_ms = median_time(fast, repeat)
+                rows.append(
+                    [
+                        f"{name}, {sessions} rows",
+                        f"{slow_ms:.1f}",
+                        f"{fast_ms:.1f}",
+                        f"{slow_ms / fast_ms:.1f}x",
+                    ]
+                )
+
+        print("Median ms to build the response data")
+        print_table(["response", "serializer ms", "fast path ms", "speedup"], rows)
+
+
+if __name__ == "__main__":
+    main()
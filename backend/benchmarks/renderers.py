@@ -0,0 +1,109 @@
+"""
+Response rendering: DRF's stdlib JSON renderer against the orjson and
+MessagePack renderers, on the serialized data of a long single exercise
+history and of a big workout. Rendering only, the queries and serializers
+are the same for all three.
+"""
+
+from datetime import timedelta
+
+from . import median_time, print_table, setup, test_database
+
+HISTORY_SIZES = [50, 200, 1_000]
+SETS_PER_EXERCISE = 5
+WORKOUT_EXERCISES = 12
+
+
+def log_history(user, sessions):
+    from django.utils import timezone
+    from tracker.models import Exercise, Set, Workout
+
+    now = timezone.now()
+    Workout.objects.bulk_create(
+        Workout(user=user, name="Session", date=now - timedelta(days=i))
+        for i in range(sessions)
+    )
+    Exercise.objects.bulk_create(
+        workout.build_exercise(name="Squat", rest_period=timedelta(seconds=180))
+        for workout in Workout.objects.filter(user=user)
+    )
+    Set.objects.bulk_create(
+        Set(exercise_id=pk, min_reps=5, max_reps=8, reps=6, weight=102.5 + i * 2.5)
+        for pk in Exercise.objects.filter(user=user).values_list("pk", flat=True)
+        for i in range(SETS_PER_EXERCISE)
+    )
+
+
+def main():
+    setup()
+    with test_database():
+        from django.contrib.auth import get_user_model
+        from django.utils import timezone
+        from rest_framework.renderers import JSONRenderer
+        from rest_framework.test import APIRequestFactory
+        from tracker.models import Exercise, Set, Workout
+        from tracker.renderers import MessagePackRenderer, ORJSONRenderer
+        from tracker.serializers import ExerciseSerializer, WorkoutSerializer
+        from tracker.views import prefetch_exercises, prefetch_sets
+
+        User = get_user_model()
+        request = APIRequestFactory().get("/api/workouts/")
+        renderers = [JSONRenderer(), ORJSONRenderer(), MessagePackRenderer()]
+
+        payloads = []
+        for sessions in HISTORY_SIZES:
+            user = User.objects.create_user(
+                username=f"lifter-{sessions}", email=f"lifter-{sessions}@example.com"
+            )
+            log_history(user, sessions)
+            exercises = prefetch_sets(Exercise.objects.filter(user=user))
+            payloads.append(
+                (
+                    f"history, {sessions} sessions",
+                    ExerciseSerializer(exercises, many=True).data,
+                )
+            )
+
+        user = User.objects.create_user(username="lifter", email="lifter@example.com")
+        workout = Workout.objects.create(user=user, name="Big", date=timezone.now())
+        for i in range(WORKOUT_EXERCISES):
+            exercise = Exercise.objects.create(
+                workout=workout, name=f"Lift {i}", rest_period=timedelta(seconds=90)
+            )
+            Set.objects.bulk_create(
+                Set(exercise=exercise, min_reps=8, max_reps=12, reps=10, weight=60.0)
+                for _ in range(SETS_PER_EXERCISE)
+            )
+        workout = prefetch_exercises(Workout.objects.filter(pk=workout.pk)).get()
+        payloads.append(
+            (
+                f"workout, {WORKOUT_EXERCISES} exercises",
+                WorkoutSerializer(workout, context={"request": request}).data,
+            )
+        )
+
+        rows = []
+        for name, data in payloads:
+            row = [name]
+            for renderer in renderers:
+                row.append(f"{median_time(lambda: renderer.render(data)):.3f}")
+                row.append(len(renderer.render(data)))
+            rows.append(row)
+
+        print("Median ms to render and size in bytes")
+        print_table(
+            [
+                "payload",
+                "json ms",
+                "bytes",
+                "orjson ms",
+                "bytes",
+                "msgpack ms",
+                "bytes",
+            ],
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+gunicorn settings for the Docker image. The number of workers is taken from
+WEB_CONCURRENCY (gunicorn's default, 1 if unset), and ASGI=1 serves the app
+from uvicorn workers, which the async views under /api/async/ need to not hold
+a worker while they wait.
+
+The app is loaded once in the master and the workers are forked from it, so a
+new worker starts with Django set up, the URLconf imported and the Supabase
+signing keys fetched rather than doing all of that before its first request.
+Migrations are not run here but by `manage.py release`, once per deploy.
+"""
+
+import os
+
+bind = "0.0.0.0:8000"
+
+if os.environ.get("ASGI") == "1":
+    wsgi_app = "liftinglog.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "liftinglog.wsgi:application"
+
+preload_app = True
+
+
+def when_ready(server):
+    from django.db import connections
+    from django.urls import get_resolver
+
+    # Django imports the URLconf, and with it the views, serializers and DRF,
+    # on the first request. Do it before forking so every worker shares it.
+    get_resolver().url_patterns
+
+    # A connection opened while loading must not be shared by the workers
+    connections.close_all()
@@ -87,19 +87,63 @@ WSGI_APPLICATION = "liftinglog.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connections are pooled per worker process (tracker/mysql_pool), and handed
+# back to the pool at the end of each request, so CONN_MAX_AGE stays 0.
 DATABASES = {
     "default": {
-        "ENGINE": "django_prometheus.db.backends.mysql",
+        "ENGINE": "tracker.mysql_pool",
         "NAME": env("MYSQL_DATABASE"),
         "USER": env("DATABASE_USER"),
         "PASSWORD": env("MYSQL_ROOT_PASSWORD"),
         "HOST": env("DATABASE_HOST"),
         "PORT": env("DATABASE_PORT"),
-        "OPTIONS": {"init_command": "SET sql_mode='STRICT_TRANS_TABLES'"},
+        "OPTIONS": {
+            "init_command": "SET sql_mode='STRICT_TRANS_TABLES'",
+            "pool": {
+                "min_size": env.int("DATABASE_POOL_MIN_SIZE", default=1),
+                "max_size": env.int("DATABASE_POOL_MAX_SIZE", default=4),
+                # Seconds, well under MySQL's default wait_timeout of 8 hours
+                "max_lifetime": env.int("DATABASE_POOL_MAX_LIFETIME", default=1800),
+                # Seconds to wait for a free connection
+                "timeout": env.int("DATABASE_POOL_TIMEOUT", default=10),
+            },
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Holds the response cache (tracker/response_cache.py). Local memory is per
+# process, so set CACHE_REDIS_URL once the API runs more than one worker. The
+# Redis server should be given a maxmemory with maxmemory-policy allkeys-lru.
+
+CACHE_REDIS_URL = env("CACHE_REDIS_URL", default=None)
+RESPONSE_CACHE_TIMEOUT = env.int("RESPONSE_CACHE_TIMEOUT", default=300)
+
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django_prometheus.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+            "TIMEOUT": RESPONSE_CACHE_TIMEOUT,
+            # Serve requests uncached rather than fail them if Redis is
+            # unreachable. Invalidations that fail are retried, see
+            # tracker/response_cache.py.
+            "OPTIONS": {"IGNORE_EXCEPTIONS": True},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django_prometheus.cache.backends.locmem.LocMemCache",
+            "TIMEOUT": RESPONSE_CACHE_TIMEOUT,
+            # Least recently used entries are evicted past this
+            "OPTIONS": {"MAX_ENTRIES": env.int("CACHE_MAX_ENTRIES", default=5000)},
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -155,15 +199,36 @@ REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "tracker.authentication.SupabaseAuthentication",
         "rest_framework.authentication.SessionAuthentication",
-    )
+    ),
+    # JSON unless the client asks for MessagePack in its Accept header
+    "DEFAULT_RENDERER_CLASSES": (
+        "tracker.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+        "tracker.renderers.MessagePackRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "tracker.parsers.ORJSONParser",
+        "tracker.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
+# Most requests a single /api/batch/ call may carry
+BATCH_MAX_REQUESTS = env.int("BATCH_MAX_REQUESTS", default=25)
+# Most workouts a single /api/workouts/ingest/ call may carry
+INGEST_MAX_WORKOUTS = env.int("INGEST_MAX_WORKOUTS", default=100)
+
 AUTH_USER_MODEL = "tracker.User"
 
 SUPABASE_URL = env("SUPABASE_URL")
 SUPABASE_AUDIENCE = env("SUPABASE_AUDIENCE")
 SUPABASE_SECRET_KEY = env("SUPABASE_SECRET_KEY")
 
+# Signing keys are cached per worker and refreshed in the background
+SUPABASE_JWKS_LIFESPAN = env.int("SUPABASE_JWKS_LIFESPAN", default=600)
+SUPABASE_JWKS_PREFETCH = env.bool("SUPABASE_JWKS_PREFETCH", default=not DEBUG)
+
 
 # PRODUCTION SECURITY SETTINGS
 if not DEBUG:
@@ -1,13 +1,17 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.utils import timezone
 from .models import (
     Workout,
     Exercise,
     Set,
+    ExerciseSummary,
     WorkoutTemplate,
+    WorkoutTemplateVersion,
     ExerciseTemplate,
     SetTemplate,
     User,
+    OutboxMessage,
 )
 
 
@@ -17,11 +21,24 @@ class WorkoutAdmin(
     list_display = ("name", "date", "notes")
 
 
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ("kind", "payload", "attempts", "available_at", "dead_at")
+    list_filter = ("kind", ("dead_at", admin.EmptyFieldListFilter))
+    actions = ["retry"]
+
+    @admin.action(description="Retry selected messages now")
+    def retry(self, request, queryset):
+        queryset.update(available_at=timezone.now(), attempts=0, dead_at=None)
+
+
 # Register your models here.
 admin.site.register(Workout, WorkoutAdmin)
 admin.site.register(Exercise)
 admin.site.register(Set)
+admin.site.register(ExerciseSummary)
 admin.site.register(WorkoutTemplate)
+admin.site.register(WorkoutTemplateVersion)
 admin.site.register(ExerciseTemplate)
 admin.site.register(SetTemplate)
 admin.site.register(User, UserAdmin)
+admin.site.register(OutboxMessage, OutboxMessageAdmin)
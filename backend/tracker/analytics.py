@@ -0,0 +1,222 @@
+"""
+Goal date predictions, ported from the mobile app's utils/prediction.ts.
+
+Every exercise's daily 1RM series is fitted against a linear (y = mx + b) and
+a logarithmic (y = a + b * ln(x)) model at once, using padded NumPy arrays
+instead of one regression per exercise. Coefficients, predictions and R² are
+rounded to 2 decimals half-up like the regression package the app uses, so
+results match what the app shows.
+"""
+
+import math
+from datetime import datetime, time
+
+import numpy as np
+from django.db.models import Max
+from django.db.models.functions import TruncDate
+
+from .models import Set, one_rep_max, valid_set_filter
+
+MODELS = ("linear", "logarithmic")
+
+# Predictions further out than this are reported as OUT_OF_BOUNDS
+PREDICTION_DAYS_CAP = {"linear": 30, "logarithmic": 360}
+
+SECONDS_PER_DAY = 60 * 60 * 24
+
+
+def load_daily_maxes(user, exercise_names, tz):
+    """
+    Returns {exercise name: [(day, max estimated 1RM), ...]} oldest day first,
+    for all of the given names in one query. Days without a positive 1RM are
+    left out, as in the app.
+    """
+    rows = (
+        Set.objects.filter(
+            valid_set_filter(),
+            exercise__user=user,
+            exercise__name__in=exercise_names,
+        )
+        .annotate(day=TruncDate("exercise__date", tzinfo=tz))
+        .values("exercise__name", "day")
+        .annotate(max_one_rep_max=Max(one_rep_max("weight", "reps")))
+        .filter(max_one_rep_max__gt=0)
+        .order_by("exercise__name", "day")
+        .values_list("exercise__name", "day", "max_one_rep_max")
+    )
+
+    daily_maxes = {}
+    for name, day, value in rows:
+        daily_maxes.setdefault(name, []).append((day, value))
+    return daily_maxes
+
+
+def js_round(values, precision=2):
+    # Math.round() rounds halves up, np.round() rounds them to even
+    factor = 10**precision
+    return np.floor(np.asarray(values) * factor + 0.5) / factor
+
+
+def fit_models(series):
+    """
+    Fits both models to every series (a list of [(day, value), ...] with at
+    least two days each). Returns a dict of arrays with one entry per series.
+    """
+    length = max(len(points) for points in series)
+    x = np.full((len(series), length), np.nan)
+    y = np.full((len(series), length), np.nan)
+    for i, points in enumerate(series):
+        first_day = points[0][0]
+        x[i, : len(points)] = [(day - first_day).days + 1 for day, _ in points]
+        y[i, : len(points)] = [value for _, value in points]
+
+    n = np.sum(~np.isnan(y), axis=1)
+    sum_x = np.nansum(x, axis=1)
+    sum_y = np.nansum(y, axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Linear least squares
+        run = n * np.nansum(x * x, axis=1) - sum_x**2
+        rise = n * np.nansum(x * y, axis=1) - sum_x * sum_y
+        gradient = np.where(run == 0, 0.0, js_round(rise / run))
+        intercept = js_round(sum_y / n - gradient * sum_x / n)
+        linear_fit = js_round(gradient[:, None] * x + intercept[:, None])
+
+        # Least squares against ln(x)
+        log_x = np.log(x)
+        sum_log_x = np.nansum(log_x, axis=1)
+        slope = js_round(
+            (n * np.nansum(y * log_x, axis=1) - sum_y * sum_log_x)
+            / (n * np.nansum(log_x**2, axis=1) - sum_log_x**2)
+        )
+        offset = js_round((sum_y - slope * sum_log_x) / n)
+        logarithmic_fit = js_round(offset[:, None] + slope[:, None] * log_x)
+
+        mean_y = sum_y / n
+        total = np.nansum((y - mean_y[:, None]) ** 2, axis=1)
+        linear_r2 = js_round(1 - np.nansum((y - linear_fit) ** 2, axis=1) / total)
+        logarithmic_r2 = js_round(
+            1 - np.nansum((y - logarithmic_fit) ** 2, axis=1) / total
+        )
+
+    return {
+        "linear": {"equation": (gradient, intercept), "r2": linear_r2},
+        "logarithmic": {"equation": (offset, slope), "r2": logarithmic_r2},
+        # NaN R² compares false, so the app falls back to logarithmic too
+        "recommended": np.where(linear_r2 > logarithmic_r2, "linear", "logarithmic"),
+    }
+
+
+def predict(model, equation, days):
+    first, second = equation
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if model == "linear":
+            return js_round(first * days + second)
+        return js_round(first + second * np.log(days))
+
+
+def days_from_start_to_goal(model, equation, goal_weight):
+    first, second = equation
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        if model == "linear":
+            return np.ceil((goal_weight - second) / first)
+        return np.ceil(np.exp((goal_weight - first) / second))
+
+
+def goal_statuses(model, equation, goal_weight, days_to_now):
+    """
+    Vectorized calculateDaysToGoal() for one model. Returns (statuses, days
+    remaining) arrays.
+    """
+    today = predict(model, equation, days_to_now)
+    tomorrow = predict(model, equation, days_to_now + 1)
+    days_to_goal = days_from_start_to_goal(model, equation, goal_weight)
+    days_remaining = days_to_goal - days_to_now
+
+    out_of_bounds = ~np.isfinite(days_to_goal) | (
+        days_to_goal > days_to_now + PREDICTION_DAYS_CAP[model]
+    )
+    statuses = np.select(
+        [tomorrow <= today, out_of_bounds, days_remaining <= 0],
+        ["PLATEAUED", "OUT_OF_BOUNDS", "ACHIEVABLE_NOW"],
+        default="PREDICTED",
+    )
+    return statuses, days_remaining
+
+
+def as_number(value):
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+
+def predict_goals(goals, daily_maxes, now, tz):
+    """
+    Prediction for every goal. daily_maxes is the output of load_daily_maxes().
+    """
+    results = {}
+    fitted = []
+    for goal in goals:
+        series = daily_maxes.get(goal.exercise_name, [])
+        result = {
+            "id": goal.id,
+            "exercise_name": goal.exercise_name,
+            "goal_weight": goal.goal_weight,
+            "current_max": max((value for _, value in series), default=None),
+            "status": None,
+            "days_remaining": None,
+            "recommended_model": None,
+            "models": None,
+        }
+        results[goal.id] = result
+
+        if goal.goal_weight <= 0:
+            continue
+        if len(series) < 2:
+            result["status"] = "INSUFFICIENT_DATA"
+        elif result["current_max"] >= goal.goal_weight:
+            result["status"] = "ACHIEVED"
+        else:
+            fitted.append((goal, series))
+
+    if not fitted:
+        return list(results.values())
+
+    models = fit_models([series for _, series in fitted])
+    goal_weights = np.array([goal.goal_weight for goal, _ in fitted])
+    days_to_now = np.array(
+        [
+            math.floor(
+                (
+                    now - datetime.combine(series[0][0], time(), tzinfo=tz)
+                ).total_seconds()
+                / SECONDS_PER_DAY
+            )
+            + 1
+            for _, series in fitted
+        ]
+    )
+    statuses = {}
+    for model in MODELS:
+        statuses[model] = goal_statuses(
+            model, models[model]["equation"], goal_weights, days_to_now
+        )
+
+    for i, (goal, _) in enumerate(fitted):
+        result = results[goal.id]
+        result["models"] = {}
+        for model in MODELS:
+            status, days_remaining = statuses[model]
+            result["models"][model] = {
+                "equation": [as_number(c[i]) for c in models[model]["equation"]],
+                "r2": as_number(models[model]["r2"][i]),
+                "status": str(status[i]),
+                "days_remaining": (
+                    int(days_remaining[i]) if status[i] == "PREDICTED" else None
+                ),
+            }
+        recommended = str(models["recommended"][i])
+        result["recommended_model"] = recommended
+        result["status"] = result["models"][recommended]["status"]
+        result["days_remaining"] = result["models"][recommended]["days_remaining"]
+
+    return list(results.values())
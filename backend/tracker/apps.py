@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class TrackerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tracker'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if settings.SUPABASE_JWKS_PREFETCH:
+            from .jwks import get_key_store
+
+            # Warm the signing keys so the first requests don't wait on Supabase
+            get_key_store().start()
@@ -0,0 +1,183 @@
+"""
+Async versions of the read-heavy endpoints, served under /api/async/ with the
+same query parameters and responses as their DRF counterparts.
+
+They are plain Django async views rather than DRF views, which are sync only:
+under ASGI a request waiting on the database, the cache or Supabase's JWKS
+endpoint (fetched with httpx) gives the event loop to other requests instead
+of holding a worker thread. AsyncAPIView does what DRF does for the sync
+views: Supabase authentication, ETags (etags.py), rendering to JSON or
+MessagePack, and APIExceptions as error responses.
+"""
+
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, status
+
+from . import fast_reads
+from .authentication import SupabaseAuthentication
+from .etags import etag_matches, make_etag
+from .models import (
+    DataVersion,
+    Exercise,
+    ExerciseGoal,
+    ExerciseNameTrigram,
+    ExerciseSummary,
+    Workout,
+)
+from .renderers import MessagePackRenderer, ORJSONRenderer
+from .response_cache import cache_response
+from .serializers import ExerciseGoalSerializer
+
+
+def get_renderer(request):
+    if MessagePackRenderer.media_type in request.headers.get("Accept", ""):
+        return MessagePackRenderer()
+    return ORJSONRenderer()
+
+
+class AsyncAPIView(View):
+    """
+    Base for the async views. Handlers are async methods taking the Django
+    request, with the authenticated user as request.user, and returning the
+    response data.
+    """
+
+    http_method_names = ["get", "head", "options"]
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            auth = await SupabaseAuthentication().aauthenticate(request)
+            if auth is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = auth
+
+            # As ConditionalGetMixin does for the sync views
+            etag = make_etag(request, await DataVersion.acurrent(request.user.pk))
+            if etag_matches(request, etag):
+                response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+                response["ETag"] = etag
+                return response
+
+            data = await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(request, exc)
+
+        if isinstance(data, HttpResponse):
+            # e.g. 405 Method Not Allowed
+            return data
+        response = self.render(request, data)
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+    def handle_exception(self, request, exc):
+        # As DRF's exception handler
+        if isinstance(exc.detail, (list, dict)):
+            data = exc.detail
+        else:
+            data = {"detail": exc.detail}
+        status_code = exc.status_code
+        if isinstance(
+            exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            # SupabaseAuthentication has no WWW-Authenticate challenge, so DRF
+            # answers 403 rather than 401
+            status_code = status.HTTP_403_FORBIDDEN
+        return self.render(request, data, status_code)
+
+    def render(self, request, data, status_code=status.HTTP_200_OK):
+        renderer = get_renderer(request)
+        return HttpResponse(
+            renderer.render(data),
+            content_type=renderer.media_type,
+            status=status_code,
+        )
+
+
+def bad_request(error):
+    return exceptions.ValidationError({"error": error})
+
+
+class ExerciseDirectoryView(AsyncAPIView):
+    @cache_response("exercises")
+    async def get(self, request):
+        """
+        Names of the exercises the user has performed, most recently
+        performed first, optionally matching ?search=.
+        """
+        search_query = request.GET.get("search")
+        if search_query:
+            return await ExerciseNameTrigram.asearch(
+                request.user, search_query, performed_only=True
+            )
+
+        exercises = (
+            ExerciseSummary.objects.filter(user=request.user)
+            .order_by("-last_performed")
+            .values_list("name", flat=True)
+        )
+        return [name async for name in exercises]
+
+
+class LastPerformanceView(AsyncAPIView):
+    async def get(self, request):
+        """
+        The last time ?name= was performed before the ?workout_id= workout,
+        null if never.
+        """
+        exercise_name = request.GET.get("name")
+        current_workout_id = request.GET.get("workout_id")
+        if not exercise_name or not current_workout_id:
+            raise bad_request("Missing 'name' or 'workout_id' query parameters")
+
+        try:
+            current_workout = await Workout.objects.only("id", "date").aget(
+                id=current_workout_id, user=request.user
+            )
+        except (Workout.DoesNotExist, ValueError):
+            raise exceptions.NotFound({"error": "Workout not found"})
+
+        exercises = await fast_reads.aexercise_history(
+            Exercise.objects.filter(
+                user=request.user,
+                name=exercise_name,
+                date__lt=current_workout.date,
+            ).order_by("-date", "-id")[:1]
+        )
+        return exercises[0] if exercises else None
+
+
+class SingleExerciseHistoryView(AsyncAPIView):
+    @cache_response("exercises")
+    async def get(self, request):
+        """
+        Every performance of ?exercise_name= with logged sets, oldest first.
+        """
+        exercise_name = request.GET.get("exercise_name")
+        if not exercise_name:
+            raise bad_request("Missing 'exercise_name' in query parameters")
+
+        return await fast_reads.aexercise_history(
+            Exercise.objects.filter(
+                user=request.user,
+                name=exercise_name,
+                sets__reps__isnull=False,
+                sets__weight__isnull=False,
+            )
+            .distinct()
+            .order_by("date")
+        )
+
+
+class ExerciseGoalListView(AsyncAPIView):
+    @cache_response("goals")
+    async def get(self, request):
+        """
+        The user's goals, optionally only those for ?exercise_name=.
+        """
+        goals = ExerciseGoal.objects.filter(user=request.user)
+        name = request.GET.get("exercise_name")
+        if name is not None:
+            goals = goals.filter(exercise_name=name)
+        return ExerciseGoalSerializer([goal async for goal in goals], many=True).data
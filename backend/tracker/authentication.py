@@ -1,64 +1,169 @@
 from rest_framework import authentication, exceptions
+import contextlib
+import copy
+import hashlib
+import logging
 import jwt
-from jwt import PyJWKClient
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from .jwks import get_key_store
+from .lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Decoded claims of already verified tokens, kept until the token expires
+verified_tokens = LRUCache(maxsize=4096, ttl=3600)
+
+# Users by supabase_id. Entries are dropped when the user is saved or deleted
+# (see signals.py), the TTL bounds staleness for changes made by other workers.
+cached_users = LRUCache(maxsize=4096, ttl=300)
+
+
+def decode_token(token):
+    """
+    Verifies the token's signature and audience and returns its claims. Claims
+    are cached by token digest, so repeat requests skip the signature check.
+    """
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    payload = verified_tokens.get(digest)
+    if payload is not None:
+        return payload
+
+    signing_key = get_key_store().get_signing_key_from_jwt(token)
+    return verify_token(token, digest, signing_key)
+
+
+async def adecode_token(token):
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    payload = verified_tokens.get(digest)
+    if payload is not None:
+        return payload
+
+    signing_key = await get_key_store().aget_signing_key_from_jwt(token)
+    return verify_token(token, digest, signing_key)
+
+
+def verify_token(token, digest, signing_key):
+    payload = jwt.decode(
+        token,
+        signing_key.key,
+        algorithms=["ES256"],
+        audience=settings.SUPABASE_AUDIENCE,
+    )
+    verified_tokens.set(digest, payload, expires_at=payload.get("exp"))
+    return payload
+
+
+def get_supabase_id(payload):
+    supabase_id = payload.get("sub")
+    if not supabase_id:
+        raise exceptions.AuthenticationFailed(
+            "Invalid token: User ID ('sub') not found."
+        )
+    return supabase_id
+
+
+def get_user_for_payload(payload):
+    # Get or create user based on Supabase user ID
+    supabase_id = get_supabase_id(payload)
+    user = cached_users.get(supabase_id)
+    if user is None:
+        User = get_user_model()
+        email = payload.get("email")
+
+        user, created = User.objects.get_or_create(
+            supabase_id=supabase_id,
+            defaults={
+                "email": email,
+                "username": email,
+            },
+        )
+        cached_users.set(supabase_id, user)
+
+    # Each request gets its own instance so changes to it don't leak
+    return copy.copy(user)
+
+
+async def aget_user_for_payload(payload):
+    supabase_id = get_supabase_id(payload)
+    user = cached_users.get(supabase_id)
+    if user is None:
+        User = get_user_model()
+        email = payload.get("email")
+
+        user, created = await User.objects.aget_or_create(
+            supabase_id=supabase_id,
+            defaults={
+                "email": email,
+                "username": email,
+            },
+        )
+        cached_users.set(supabase_id, user)
+    return copy.copy(user)
+
+
+def get_bearer_token(request):
+    """
+    The token of an "Authorization: Bearer <token>" header, None if the
+    request has no such header.
+    """
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        return None
+    try:
+        auth_type, token = auth_header.split()
+        if auth_type.lower() != "bearer":
+            return None
+    except ValueError:
+        raise exceptions.AuthenticationFailed(
+            "Invalid Authorization header format. Expected 'Bearer <token>'."
+        )
+    return token
+
+
+@contextlib.contextmanager
+def token_errors():
+    """
+    Turns whatever verifying a token raised into AuthenticationFailed.
+    """
+    try:
+        yield
+    except jwt.ExpiredSignatureError:
+        raise exceptions.AuthenticationFailed("Token has expired.")
+    except jwt.InvalidTokenError as e:
+        raise exceptions.AuthenticationFailed(f"Invalid token: {str(e)}")
+    except jwt.PyJWKClientError as e:
+        # No key for the token's kid, which the client picks, or the JWKS
+        # endpoint is unreachable (jwks.py logs that itself)
+        logger.info(f"No signing key for token: {e}")
+        raise exceptions.AuthenticationFailed("Could not authenticate token.")
+    except Exception:
+        logger.exception("Unexpected error while authenticating a token")
+        raise exceptions.AuthenticationFailed("Could not authenticate token.")
 
 
 class SupabaseAuthentication(authentication.BaseAuthentication):
 
     def authenticate(self, request):
+        token = get_bearer_token(request)
+        if token is None:
+            return None
+
+        # Verify JWT token using the cached keys from Supabase's JWKS endpoint
+        with token_errors():
+            payload = decode_token(token)
+            user = get_user_for_payload(payload)
+        return (user, token)
 
-        # Check if auth header is in format "Bearer <token>"
-        auth_header = request.headers.get("Authorization")
-        if not auth_header:
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views, which pass the plain Django request.
+        """
+        token = get_bearer_token(request)
+        if token is None:
             return None
-        try:
-            auth_type, token = auth_header.split()
-            if auth_type.lower() != "bearer":
-                return None
-        except ValueError:
-            raise exceptions.AuthenticationFailed(
-                "Invalid Authorization header format. Expected 'Bearer <token>'."
-            )
-
-        # Verify JWT token using Supabase's JWKS endpoint
-        try:
-            jwks_url = f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json"
-            jwks_client = PyJWKClient(uri=jwks_url, cache_jwk_set=True, lifespan=600)
-            signing_key = jwks_client.get_signing_key_from_jwt(token)
-
-            payload = jwt.decode(
-                token,
-                signing_key.key,
-                algorithms=["ES256"],
-                audience=settings.SUPABASE_AUDIENCE,
-            )
-
-            # Get or create user based on Supabase user ID
-            supabase_id = payload.get("sub")
-            if not supabase_id:
-                raise exceptions.AuthenticationFailed(
-                    "Invalid token: User ID ('sub') not found."
-                )
-
-            User = get_user_model()
-            email = payload.get("email")
-
-            user, created = User.objects.get_or_create(
-                supabase_id=supabase_id,
-                defaults={
-                    "email": email,
-                    "username": email,
-                },
-            )
-
-            return (user, token)
-
-        except jwt.ExpiredSignatureError:
-            raise exceptions.AuthenticationFailed("Token has expired.")
-        except jwt.InvalidTokenError as e:
-            raise exceptions.AuthenticationFailed(f"Invalid token: {str(e)}")
-        except Exception as e:
-            print(str(e))  # For debugging purposes
-            raise exceptions.AuthenticationFailed("Could not authenticate token.")
+
+        with token_errors():
+            payload = await adecode_token(token)
+            user = await aget_user_for_payload(payload)
+        return (user, token)
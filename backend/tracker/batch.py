@@ -0,0 +1,149 @@
+"""
+Runs the operations of a /api/batch/ request.
+
+Each operation is dispatched straight to the view its path resolves to, in
+the same thread and so on the same database connection as the batch itself.
+The batch request has already been authenticated, so the sub-requests carry
+its user and token instead of verifying the Authorization header again, and
+they skip the middleware stack.
+"""
+
+import io
+import json
+import logging
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework import status
+
+from .models import DataVersion
+from .response_cache import invalidate, track_invalidations
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/api/"
+
+# Conditional and content negotiation headers are up to each operation
+PER_REQUEST_HEADERS = ("HTTP_IF_NONE_MATCH", "HTTP_IF_MATCH")
+
+
+def build_request(parent, method, path, body=None, headers=None):
+    """
+    A WSGIRequest for one operation, with the parent's server and client
+    details and its authentication.
+    """
+    url = urlsplit(path)
+    content = b"" if body is None else json.dumps(body).encode()
+    environ = {
+        key: value
+        for key, value in parent.META.items()
+        if isinstance(value, str) and key not in PER_REQUEST_HEADERS
+    }
+    environ.update(
+        {
+            "REQUEST_METHOD": method,
+            "PATH_INFO": url.path,
+            "QUERY_STRING": url.query,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(content)),
+            "wsgi.input": io.BytesIO(content),
+            "wsgi.url_scheme": parent.scheme,
+        }
+    )
+    for name, value in (headers or {}).items():
+        environ["HTTP_" + name.upper().replace("-", "_")] = value
+
+    request = WSGIRequest(environ)
+    request._force_auth_user = parent.user
+    request._force_auth_token = parent.auth
+    return request
+
+
+def error(status_code, message):
+    return {"status": status_code, "body": {"error": message}}
+
+
+def api_path(path):
+    """
+    Paths may be given in full or, as the app's API client writes them,
+    relative to /api/. Either way they cannot leave the API.
+    """
+    if path.startswith(API_PREFIX):
+        return path
+    return API_PREFIX + path.lstrip("/")
+
+
+def run_operation(parent, operation, batch_view):
+    path = api_path(operation["path"])
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return error(status.HTTP_404_NOT_FOUND, f"'{path}' was not found")
+    if getattr(match.func, "view_class", None) is batch_view:
+        return error(status.HTTP_400_BAD_REQUEST, "Batches cannot be nested")
+    if iscoroutinefunction(match.func):
+        return error(
+            status.HTTP_400_BAD_REQUEST,
+            f"'{path}' is async, batch its sync counterpart instead",
+        )
+
+    request = build_request(
+        parent,
+        operation["method"],
+        path,
+        operation.get("body"),
+        operation.get("headers"),
+    )
+    response = match.func(request, *match.args, **match.kwargs)
+    result = {"status": response.status_code, "body": getattr(response, "data", None)}
+    if response.has_header("ETag"):
+        result["headers"] = {"ETag": response["ETag"]}
+    return result
+
+
+def run_batch(parent, operations, atomic, batch_view):
+    """
+    Runs the operations in order and returns their results. With atomic, they
+    share one transaction that is rolled back if any of them fails, and the
+    operations after the failing one are not run.
+    """
+    if not atomic:
+        return [safe_run_operation(parent, op, batch_view) for op in operations]
+
+    results = []
+    rolled_back = False
+    # The version the latest ETag was made from, read while the transaction
+    # can still be queried
+    etag_version = None
+    with track_invalidations() as invalidated, transaction.atomic():
+        for operation in operations:
+            result = safe_run_operation(parent, operation, batch_view)
+            results.append(result)
+            if result["status"] >= 400:
+                transaction.set_rollback(True)
+                rolled_back = True
+                break
+            if "headers" in result:
+                etag_version = DataVersion.current(parent.user.pk)
+
+    if rolled_back:
+        # The rollback leaves behind what the operations before the failing
+        # one did outside the database: ETags of versions that would be
+        # handed out again, and responses cached under generations set for
+        # writes that never happened
+        if etag_version is not None:
+            DataVersion.skip_past(parent.user.pk, etag_version)
+        for user_id, scope in invalidated:
+            invalidate(user_id, scope)
+    return results
+
+
+def safe_run_operation(parent, operation, batch_view):
+    try:
+        return run_operation(parent, operation, batch_view)
+    except Exception:
+        logger.exception(f"Batch operation {operation['method']} {operation['path']}")
+        return error(status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal server error")
@@ -0,0 +1,261 @@
+"""
+Process-local pool of database connections, for backends Django does not pool
+itself (it only pools PostgreSQL). Used by the mysql_pool database backend.
+
+Idle connections are health-checked when checked out and closed once older
+than max_lifetime. Forking (gunicorn workers are forked from a master that has
+loaded the app) closes the parent's idle connections first and leaves the
+child with an empty pool, so that no two processes share a connection's
+socket. Pool size, checkout wait time, checkout failures and discarded
+connections are exported under tracker_db_pool_*.
+"""
+
+import logging
+import os
+import threading
+import time
+import weakref
+
+from django.db import OperationalError
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+pool_connections = Gauge(
+    "tracker_db_pool_connections",
+    "Open connections in the database connection pool, by state.",
+    ["alias", "state"],
+)
+pool_wait_seconds = Histogram(
+    "tracker_db_pool_wait_seconds",
+    "Time taken to check a connection out of the pool, including waiting for "
+    "one to be returned and opening a new one.",
+    ["alias"],
+)
+pool_checkout_failures = Counter(
+    "tracker_db_pool_checkout_failures_total",
+    "Connection checkouts that failed, by reason.",
+    ["alias", "reason"],
+)
+pool_discards = Counter(
+    "tracker_db_pool_discards_total",
+    "Connections closed by the pool rather than reused, by reason.",
+    ["alias", "reason"],
+)
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """
+    Holds up to max_size connections opened by connect(). check(connection)
+    should raise if the connection is no longer usable, and close(connection)
+    close it. Checked out connections must be handed back with release().
+    """
+
+    def __init__(
+        self,
+        connect,
+        check,
+        close,
+        alias="default",
+        min_size=0,
+        max_size=10,
+        max_lifetime=1800,
+        timeout=10,
+    ):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size")
+        self.connect = connect
+        self.check = check
+        self.close = close
+        self.alias = alias
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self._reset()
+        _pools.add(self)
+
+    def _reset(self):
+        self._condition = threading.Condition()
+        # Most recently returned last, so that the connections beyond what is
+        # needed sit idle and age out
+        self._idle = []
+        # id(connection) -> [connection, opened_at, checkouts]
+        self._info = {}
+        # Open connections plus the ones being opened
+        self._size = 0
+
+    def acquire(self):
+        """
+        Checks a connection out. Returns (connection, reused), where reused is
+        True if the connection has been checked out before. Raises PoolTimeout
+        if none is free after timeout seconds.
+        """
+        start = time.monotonic()
+        try:
+            self.fill()
+            return self._acquire(start + self.timeout)
+        finally:
+            pool_wait_seconds.labels(self.alias).observe(time.monotonic() - start)
+
+    def _acquire(self, deadline):
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        pool_checkout_failures.labels(self.alias, "timeout").inc()
+                        raise PoolTimeout(
+                            f"No database connection free after {self.timeout}s "
+                            f"({self.max_size} in use)"
+                        )
+                    self._condition.wait(remaining)
+                connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    self._size += 1
+                self._update_gauges()
+
+            if connection is None:
+                connection = self._open()
+            elif self._expired(connection):
+                self._discard(connection, "expired")
+                continue
+            else:
+                try:
+                    self.check(connection)
+                except Exception as e:
+                    logger.info(f"Discarding unusable pooled connection: {e}")
+                    self._discard(connection, "unhealthy")
+                    continue
+
+            with self._condition:
+                info = self._info[id(connection)]
+                info[2] += 1
+                return connection, info[2] > 1
+
+    def release(self, connection, reusable=True):
+        """
+        Returns a checked out connection, closing it instead if it is not
+        reusable (e.g. closed in the middle of a transaction) or too old.
+        """
+        if id(connection) not in self._info:
+            # Checked out before a fork, by a parent process thread
+            return
+        if not reusable:
+            self._discard(connection, "unusable")
+        elif self._expired(connection):
+            self._discard(connection, "expired")
+        else:
+            with self._condition:
+                self._idle.append(connection)
+                self._update_gauges()
+                self._condition.notify()
+
+    def fill(self):
+        """
+        Opens connections until min_size are open.
+        """
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            connection = self._open()
+            self.release(connection)
+
+    def _open(self):
+        """
+        Opens a connection in a slot already counted in _size.
+        """
+        try:
+            connection = self.connect()
+        except Exception:
+            pool_checkout_failures.labels(self.alias, "connect").inc()
+            with self._condition:
+                self._size -= 1
+                self._update_gauges()
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._info[id(connection)] = [connection, time.monotonic(), 0]
+        return connection
+
+    def _expired(self, connection):
+        opened_at = self._info[id(connection)][1]
+        return time.monotonic() - opened_at >= self.max_lifetime
+
+    def _discard(self, connection, reason):
+        pool_discards.labels(self.alias, reason).inc()
+        with self._condition:
+            del self._info[id(connection)]
+            self._size -= 1
+            self._update_gauges()
+            self._condition.notify()
+        self._close_quietly(connection)
+
+    def _close_quietly(self, connection):
+        try:
+            self.close(connection)
+        except Exception as e:
+            logger.info(f"Error closing pooled connection: {e}")
+
+    def _update_gauges(self):
+        idle = len(self._idle)
+        pool_connections.labels(self.alias, "idle").set(idle)
+        pool_connections.labels(self.alias, "in_use").set(self._size - idle)
+
+    def _before_fork(self):
+        # Held until the fork is over, so that the child gets consistent state.
+        # Idle connections would be shared with the child, so close them.
+        self._condition.acquire()
+        for connection in self._idle:
+            del self._info[id(connection)]
+            self._size -= 1
+            self._close_quietly(connection)
+        self._idle = []
+        self._update_gauges()
+
+    def _after_fork_in_parent(self):
+        self._condition.release()
+
+    def _after_fork_in_child(self):
+        # The connections still checked out belong to the parent's threads.
+        # Closing them, even by letting them be garbage collected, would close
+        # them for the parent too, so they are kept but never used.
+        _orphans.extend(info[0] for info in self._info.values())
+        self._reset()
+        self._update_gauges()
+
+
+_pools = weakref.WeakSet()
+_forking = []
+_orphans = []
+
+
+def _before_fork():
+    _forking[:] = list(_pools)
+    for pool in _forking:
+        pool._before_fork()
+
+
+def _after_fork_in_parent():
+    for pool in _forking:
+        pool._after_fork_in_parent()
+    _forking.clear()
+
+
+def _after_fork_in_child():
+    for pool in _forking:
+        pool._after_fork_in_child()
+    _forking.clear()
+
+
+os.register_at_fork(
+    before=_before_fork,
+    after_in_parent=_after_fork_in_parent,
+    after_in_child=_after_fork_in_child,
+)
@@ -0,0 +1,164 @@
+"""
+Streams a user's whole log as CSV (one row per set) or NDJSON (one workout per
+line).
+
+Workouts are read in keyset pages of CHUNK_SIZE, oldest first, each page as
+two flat values queries with no model instances. Only one page is held at a
+time, so memory stays flat however long the history is. This matters on MySQL
+in particular, where the driver buffers whole result sets and
+QuerySet.iterator() alone would not keep it down.
+"""
+
+import csv
+import json
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.utils.duration import duration_string
+
+from .models import Workout
+
+CHUNK_SIZE = 500
+
+# (CSV header, lookup from Workout)
+COLUMNS = [
+    ("workout_id", "id"),
+    ("workout_name", "name"),
+    ("date", "date"),
+    ("workout_notes", "notes"),
+    ("exercise_id", "exercises__id"),
+    ("exercise_name", "exercises__name"),
+    ("rest_period", "exercises__rest_period"),
+    ("exercise_notes", "exercises__notes"),
+    ("set_id", "exercises__sets__id"),
+    ("reps", "exercises__sets__reps"),
+    ("min_reps", "exercises__sets__min_reps"),
+    ("max_reps", "exercises__sets__max_reps"),
+    ("weight", "exercises__sets__weight"),
+    ("set_notes", "exercises__sets__notes"),
+]
+
+
+def workout_pages(user, chunk_size=None):
+    """
+    Yields lists of rows, one row per set as a dict keyed by the CSV headers.
+    Workouts without exercises and exercises without sets get one row with
+    the missing columns left None. A workout never spans two pages.
+    """
+    chunk_size = chunk_size or CHUNK_SIZE
+    workouts = Workout.objects.filter(user=user).order_by("date", "id")
+    after = Q()
+    while True:
+        page = list(workouts.filter(after).values_list("date", "id")[:chunk_size])
+        if not page:
+            return
+        rows = (
+            Workout.objects.filter(pk__in=[pk for _, pk in page])
+            .order_by("date", "id", "exercises__id", "exercises__sets__id")
+            .values_list(*(lookup for _, lookup in COLUMNS))
+        )
+        yield [dict(zip((header for header, _ in COLUMNS), row)) for row in rows]
+
+        last_date, last_id = page[-1]
+        after = Q(date__gt=last_date) | Q(date=last_date, id__gt=last_id)
+
+
+def as_text(header, value):
+    if value is None:
+        return ""
+    if header == "date":
+        return value.isoformat()
+    if header == "rest_period":
+        return duration_string(value)
+    return value
+
+
+class Echo:
+    """
+    File-like object for csv.writer that returns each line instead of
+    buffering it.
+    """
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(user, chunk_size=None):
+    writer = csv.writer(Echo())
+    yield writer.writerow([header for header, _ in COLUMNS])
+    for rows in workout_pages(user, chunk_size):
+        yield "".join(
+            writer.writerow([as_text(header, value) for header, value in row.items()])
+            for row in rows
+        )
+
+
+def group_workouts(rows):
+    """
+    Nests a page's rows into workouts shaped like the workout API's.
+    """
+    workouts = {}
+    for row in rows:
+        workout = workouts.get(row["workout_id"])
+        if workout is None:
+            workout = workouts[row["workout_id"]] = {
+                "id": row["workout_id"],
+                "name": row["workout_name"],
+                "date": row["date"].isoformat(),
+                "notes": row["workout_notes"],
+                "exercises": [],
+            }
+        if row["exercise_id"] is None:
+            continue
+
+        exercises = workout["exercises"]
+        if not exercises or exercises[-1]["id"] != row["exercise_id"]:
+            exercises.append(
+                {
+                    "id": row["exercise_id"],
+                    "name": row["exercise_name"],
+                    "rest_period": duration_string(row["rest_period"]),
+                    "notes": row["exercise_notes"],
+                    "sets": [],
+                }
+            )
+        if row["set_id"] is not None:
+            exercises[-1]["sets"].append(
+                {
+                    "id": row["set_id"],
+                    "reps": row["reps"],
+                    "min_reps": row["min_reps"],
+                    "max_reps": row["max_reps"],
+                    "weight": row["weight"],
+                    "notes": row["set_notes"],
+                }
+            )
+    return workouts.values()
+
+
+def stream_ndjson(user, chunk_size=None):
+    for rows in workout_pages(user, chunk_size):
+        yield "".join(json.dumps(workout) + "\n" for workout in group_workouts(rows))
+
+
+async def aiterate(chunks):
+    """
+    Async iterator over a stream above, for StreamingHttpResponse under ASGI,
+    which would otherwise read a sync iterator into a list before sending
+    any of it. Each chunk, with the page of queries behind it, is made in
+    the sync thread.
+    """
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next)
+    done = object()
+    while True:
+        chunk = await next_chunk(chunks, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+FORMATS = {
+    "csv": (stream_csv, "text/csv"),
+    "ndjson": (stream_ndjson, "application/x-ndjson"),
+}
@@ -0,0 +1,136 @@
+"""
+Serializer-free versions of the hottest reads: the workout list and single
+exercise history.
+
+Rows come from values_list() and are turned straight into the dicts the
+serializers would have produced, field for field (the serializers stay the
+reference, see test_fast_reads.py). Hyperlinks are formatted from a URL
+template reversed once per request instead of reverse() per row.
+aexercise_history() is exercise_history() for the async views.
+"""
+
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.duration import duration_string
+
+from .models import Set
+
+# Stands in for the pk when reversing a detail URL into a template
+PK_PLACEHOLDER = "8" * 12
+
+
+class URLTemplate:
+    """
+    A detail route's absolute URL, reversed once and formatted per row.
+    """
+
+    def __init__(self, request, view_name):
+        url = reverse(view_name, kwargs={"pk": PK_PLACEHOLDER})
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        self.prefix, self.suffix = url.split(PK_PLACEHOLDER)
+
+    def format(self, pk):
+        return f"{self.prefix}{pk}{self.suffix}"
+
+
+def datetime_string(value, tz):
+    # As DRF's DateTimeField renders it in the current time zone
+    value = value.astimezone(tz).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+    return value
+
+
+def optional_float(value):
+    return None if value is None else float(value)
+
+
+def workout_list(request, queryset):
+    """
+    WorkoutListSerializer's output for the queryset of the user's workouts.
+    """
+    tz = timezone.get_current_timezone()
+    workout_url = URLTemplate(request, "workout-detail")
+    template_url = URLTemplate(request, "workouttemplate-detail")
+    username = request.user.username
+    return [
+        {
+            "id": pk,
+            "url": workout_url.format(pk),
+            "user": username,
+            "name": name,
+            "date": datetime_string(date, tz),
+            "notes": notes,
+            "template": (
+                None if template_id is None else template_url.format(template_id)
+            ),
+        }
+        for pk, name, date, notes, template_id in queryset.values_list(
+            "pk", "name", "date", "notes", "template_id"
+        )
+    ]
+
+
+EXERCISE_FIELDS = ("pk", "workout_id", "name", "rest_period", "notes", "date")
+SET_FIELDS = ("exercise_id", "pk", "reps", "min_reps", "max_reps", "weight", "notes")
+
+
+def exercise_history(queryset):
+    """
+    ExerciseSerializer's output for a queryset of exercises, in 2 queries.
+    Sets are ordered by id like prefetch_sets() orders them.
+    """
+    tz = timezone.get_current_timezone()
+    exercises = [
+        exercise_data(row, tz) for row in queryset.values_list(*EXERCISE_FIELDS)
+    ]
+    if exercises:
+        add_sets(exercises, sets_of(exercises))
+    return exercises
+
+
+async def aexercise_history(queryset):
+    tz = timezone.get_current_timezone()
+    exercises = [
+        exercise_data(row, tz) async for row in queryset.values_list(*EXERCISE_FIELDS)
+    ]
+    if exercises:
+        add_sets(exercises, [row async for row in sets_of(exercises)])
+    return exercises
+
+
+def exercise_data(row, tz):
+    pk, workout_id, name, rest_period, notes, date = row
+    return {
+        "id": pk,
+        "workout_id": workout_id,
+        "name": name,
+        "rest_period": duration_string(rest_period),
+        "notes": notes,
+        "date": datetime_string(date, tz),
+        "sets": [],
+    }
+
+
+def sets_of(exercises):
+    return (
+        Set.objects.filter(exercise_id__in=[exercise["id"] for exercise in exercises])
+        .order_by("id")
+        .values_list(*SET_FIELDS)
+    )
+
+
+def add_sets(exercises, set_rows):
+    by_id = {exercise["id"]: exercise["sets"] for exercise in exercises}
+    for exercise_id, pk, reps, min_reps, max_reps, weight, notes in set_rows:
+        by_id[exercise_id].append(
+            {
+                "id": pk,
+                "reps": optional_float(reps),
+                "min_reps": min_reps,
+                "max_reps": max_reps,
+                "weight": optional_float(weight),
+                "notes": notes,
+            }
+        )
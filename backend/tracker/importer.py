@@ -0,0 +1,371 @@
+"""
+Imports workout history from CSV exports of other lifting apps, and from this
+app's own export (export.py).
+
+The file is read a line at a time and consecutive rows of the same workout are
+grouped, so only the current chunk of workouts is ever held in memory. Every
+CHUNK_SIZE workouts are written by Workout.ingest() in one transaction of bulk
+inserts. Each workout's client_key is derived from the source file's identity
+for it, so importing the same file again skips what is already there, and an
+import that failed part way can simply be rerun.
+
+Exercise names that are neither one of the app's default exercises (a copy of
+mobile/assets/data/defaultExercises.json) nor already one of the user's custom
+names are added as custom names, so they show up in the app's exercise picker.
+"""
+
+import abc
+import codecs
+import csv
+import hashlib
+import itertools
+import json
+import logging
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import cache
+from pathlib import Path
+
+from django.utils.dateparse import parse_datetime, parse_duration
+
+from .models import CustomExerciseName, Workout
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 200
+
+# max_length of Workout.name and Exercise.name
+NAME_LENGTH = 100
+
+DEFAULT_EXERCISES_PATH = Path(__file__).parent / "data" / "default_exercises.json"
+
+
+class CSVImportError(ValueError):
+    pass
+
+
+@cache
+def default_exercise_names():
+    return frozenset(json.loads(DEFAULT_EXERCISES_PATH.read_text()))
+
+
+def parse_number(value, negative=True):
+    value = (value or "").strip()
+    if not value:
+        return None
+    number = float(value)
+    # float() also reads "nan" and "inf"
+    if not math.isfinite(number):
+        raise ValueError(f"'{value}' is not a number")
+    if number < 0 and not negative:
+        raise ValueError(f"'{value}' can't be negative")
+    return number
+
+
+def parse_date(value, fmt, tz):
+    date = datetime.strptime(value.strip(), fmt)
+    return date.replace(tzinfo=tz)
+
+
+class Profile(abc.ABC):
+    """
+    How one app's export maps to workouts, exercises and sets. Subclasses
+    read one CSV row (a dict) at a time.
+    """
+
+    name = None
+    # Enough of the header to recognise the export by
+    columns = ()
+    exercise_column = None
+
+    @abc.abstractmethod
+    def workout_key(self, row):
+        """
+        Identifies the row's workout. Consecutive rows with the same key are
+        one workout.
+        """
+
+    @abc.abstractmethod
+    def workout(self, row, tz):
+        """
+        {"name", "date", "notes"} of the row's workout.
+        """
+
+    def exercise_key(self, row):
+        return row[self.exercise_column]
+
+    @abc.abstractmethod
+    def exercise(self, row):
+        """
+        {"name", "rest_period", "notes"} of the row's exercise.
+        """
+
+    @abc.abstractmethod
+    def set(self, row):
+        """
+        {"reps", "weight", "notes"} of the row's set, None if the row is not
+        a set.
+        """
+
+
+class StrongProfile(Profile):
+    name = "strong"
+    columns = ("Date", "Workout Name", "Exercise Name", "Set Order", "Weight", "Reps")
+    exercise_column = "Exercise Name"
+
+    def workout_key(self, row):
+        return (row["Date"], row["Workout Name"])
+
+    def workout(self, row, tz):
+        return {
+            "name": row["Workout Name"],
+            "date": parse_date(row["Date"], "%Y-%m-%d %H:%M:%S", tz),
+            "notes": row.get("Workout Notes") or "",
+        }
+
+    def exercise(self, row):
+        return {"name": row["Exercise Name"], "rest_period": timedelta(0), "notes": ""}
+
+    def set(self, row):
+        # Rest timer entries share the set rows
+        if not row["Set Order"].strip().isdigit():
+            return None
+        return {
+            "reps": parse_number(row["Reps"], negative=False),
+            "weight": parse_number(row["Weight"]),
+            "notes": row.get("Notes") or "",
+        }
+
+
+class HevyProfile(Profile):
+    name = "hevy"
+    columns = ("title", "start_time", "exercise_title", "set_index", "weight_kg")
+    exercise_column = "exercise_title"
+
+    def workout_key(self, row):
+        return (row["start_time"], row["title"])
+
+    def workout(self, row, tz):
+        return {
+            "name": row["title"],
+            "date": parse_date(row["start_time"], "%d %b %Y, %H:%M", tz),
+            "notes": row.get("description") or "",
+        }
+
+    def exercise(self, row):
+        return {
+            "name": row["exercise_title"],
+            "rest_period": timedelta(0),
+            "notes": row.get("exercise_notes") or "",
+        }
+
+    def set(self, row):
+        set_type = row.get("set_type") or "normal"
+        return {
+            "reps": parse_number(row["reps"], negative=False),
+            "weight": parse_number(row["weight_kg"]),
+            "notes": "" if set_type == "normal" else set_type,
+        }
+
+
+class LiftingLogProfile(Profile):
+    """
+    This app's own CSV export, see export.py.
+    """
+
+    name = "liftinglog"
+    columns = ("workout_id", "workout_name", "date", "exercise_id", "set_id")
+
+    def workout_key(self, row):
+        return row["workout_id"]
+
+    def workout(self, row, tz):
+        date = parse_datetime(row["date"])
+        if date is None:
+            raise ValueError(f"'{row['date']}' is not a date")
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=tz)
+        return {
+            "name": row["workout_name"],
+            "date": date,
+            "notes": row["workout_notes"],
+        }
+
+    def exercise_key(self, row):
+        return row["exercise_id"]
+
+    def exercise(self, row):
+        if not row["exercise_id"]:
+            return None
+        return {
+            "name": row["exercise_name"],
+            "rest_period": parse_duration(row["rest_period"]) or timedelta(0),
+            "notes": row["exercise_notes"],
+        }
+
+    def set(self, row):
+        if not row["set_id"]:
+            return None
+        return {
+            "reps": parse_number(row["reps"], negative=False),
+            "weight": parse_number(row["weight"]),
+            "min_reps": int(parse_number(row["min_reps"], negative=False) or 0),
+            "max_reps": int(parse_number(row["max_reps"], negative=False) or 0),
+            "notes": row["set_notes"],
+        }
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in (StrongProfile(), HevyProfile(), LiftingLogProfile())
+}
+
+
+def detect_profile(header):
+    for profile in PROFILES.values():
+        if set(profile.columns) <= set(header):
+            return profile
+    raise CSVImportError(
+        "Unrecognised CSV. Exports from Strong, Hevy and this app are supported."
+    )
+
+
+def read_error(error, line_num):
+    """
+    CSVImportError for an error raised while reading a file's lines: bytes
+    that aren't UTF-8 or malformed CSV.
+    """
+    if isinstance(error, UnicodeDecodeError):
+        # Decoded ahead of the line being parsed, so its number isn't known
+        return CSVImportError("The file is not UTF-8 encoded text.")
+    return CSVImportError(f"Line {line_num}: {error}")
+
+
+def iter_rows(rows):
+    """
+    The rows of a csv.DictReader, with reading errors raised as
+    CSVImportError.
+    """
+    while True:
+        try:
+            row = next(rows)
+        except StopIteration:
+            return
+        except (UnicodeDecodeError, csv.Error) as e:
+            # The line that failed isn't counted yet
+            raise read_error(e, rows.line_num + 1) from e
+        yield row
+
+
+def open_rows(lines):
+    """
+    csv.DictReader over an iterable of text lines, with the delimiter taken
+    from the header (Strong uses ';' in some locales).
+    """
+    lines = iter(lines)
+    header = next(lines, "")
+    delimiter = max(",;\t", key=header.count)
+    return csv.DictReader(itertools.chain([header], lines), delimiter=delimiter)
+
+
+def read_workouts(rows, profile, tz):
+    """
+    Yields workouts in Workout.ingest()'s format from the rows of an export,
+    which lists each workout's rows together.
+    """
+    workout = None
+    workout_key = exercise_key = None
+    for row in iter_rows(rows):
+        try:
+            key = profile.workout_key(row)
+            if workout is None or key != workout_key:
+                if workout is not None:
+                    yield workout
+                workout_key, exercise_key = key, None
+                workout = {
+                    "client_key": client_key(profile, key),
+                    **profile.workout(row, tz),
+                    "exercises": [],
+                }
+                workout["name"] = workout["name"][:NAME_LENGTH]
+
+            exercise = profile.exercise(row)
+            if exercise is None:
+                continue
+            if profile.exercise_key(row) != exercise_key:
+                exercise_key = profile.exercise_key(row)
+                exercise["name"] = exercise["name"][:NAME_LENGTH]
+                workout["exercises"].append({**exercise, "sets": []})
+
+            set_data = profile.set(row)
+            if set_data is not None:
+                reps = int(set_data["reps"] or 0)
+                workout["exercises"][-1]["sets"].append(
+                    {"min_reps": reps, "max_reps": reps, **set_data}
+                )
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise CSVImportError(f"Line {rows.line_num}: {e}") from e
+    if workout is not None:
+        yield workout
+
+
+def client_key(profile, workout_key):
+    digest = hashlib.sha256(repr(workout_key).encode()).hexdigest()[:40]
+    return f"import:{profile.name}:{digest}"
+
+
+def import_csv(user, lines, profile=None, tz=dt_timezone.utc, progress=None):
+    """
+    Imports an export given as an iterable of text lines, e.g. a file opened
+    in text mode. profile is one of PROFILES' names, detected from the header
+    if left out. progress is called with the running totals after every
+    chunk. Returns those totals.
+    """
+    try:
+        rows = open_rows(lines)
+        header = rows.fieldnames or []
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise read_error(e, 1) from e
+    profile = PROFILES[profile] if profile else detect_profile(header)
+    totals = {
+        "workouts": 0,
+        "already_imported": 0,
+        "sets": 0,
+        "custom_exercise_names": 0,
+    }
+    known_names = set(default_exercise_names())
+
+    workouts = read_workouts(rows, profile, tz)
+    while chunk := list(itertools.islice(workouts, CHUNK_SIZE)):
+        # A workout listed twice in the file is imported once
+        unique = {}
+        for workout in chunk:
+            unique.setdefault(workout["client_key"], workout)
+        chunk = list(unique.values())
+        names = {e["name"] for w in chunk for e in w["exercises"]} - known_names
+        if names:
+            added = CustomExerciseName.add_names(user.pk, names)
+            totals["custom_exercise_names"] += len(added)
+            known_names |= names
+
+        _, created = Workout.ingest(user, chunk)
+        created = set(created)
+        totals["workouts"] += len(created)
+        totals["already_imported"] += len(chunk) - len(created)
+        totals["sets"] += sum(
+            len(e["sets"])
+            for w in chunk
+            if w["client_key"] in created
+            for e in w["exercises"]
+        )
+        logger.info(f"Importing {profile.name} CSV for user {user.pk}: {totals}")
+        if progress is not None:
+            progress(totals)
+    return totals
+
+
+def decode_upload(upload):
+    """
+    Text lines of an uploaded file, decoded as it is read.
+    """
+    return codecs.getreader("utf-8-sig")(upload)
@@ -0,0 +1,244 @@
+import logging
+import os
+import threading
+import time
+
+import jwt
+from django.conf import settings
+from jwt import PyJWKClient, PyJWKSet
+from jwt.exceptions import PyJWKClientError
+from prometheus_client import Counter
+
+logger = logging.getLogger(__name__)
+
+jwks_cache_hits = Counter(
+    "tracker_jwks_cache_hits_total",
+    "Signing key lookups served from the in-process JWKS cache.",
+)
+jwks_cache_misses = Counter(
+    "tracker_jwks_cache_misses_total",
+    "Signing key lookups for a kid that was not in the JWKS cache.",
+)
+jwks_refreshes = Counter(
+    "tracker_jwks_refreshes_total",
+    "JWKS fetches from the Supabase endpoint, by outcome.",
+    ["result"],
+)
+
+
+class JWKSKeyStore:
+    """
+    Process-wide cache of the Supabase signing keys.
+
+    Keys are fetched once, refreshed by a background thread shortly before
+    they go stale, and kept when a refresh fails so that a slow or unavailable
+    JWKS endpoint does not take authentication down with it.
+
+    The a-prefixed methods are for async views: they fetch with httpx instead,
+    so a slow endpoint holds up only the requests waiting on it.
+    """
+
+    def __init__(
+        self,
+        url,
+        lifespan=600,
+        refresh_margin=60,
+        timeout=5,
+        miss_cooldown=30,
+        background=True,
+    ):
+        self.url = url
+        self.background = background
+        self.lifespan = lifespan
+        self.refresh_margin = refresh_margin
+        self.miss_cooldown = miss_cooldown
+        self.timeout = timeout
+        self._client = PyJWKClient(uri=url, cache_jwk_set=False, timeout=timeout)
+        self._keys = {}
+        self._fetched_at = None
+        self._last_miss_refresh = None
+        self._lock = threading.Lock()
+        self._refresher_pid = None
+        self._stop = threading.Event()
+
+    def refresh(self):
+        """
+        Fetches the JWKS endpoint and replaces the cached keys. On failure the
+        previous keys are kept and False is returned.
+        """
+        try:
+            keys = self._client.get_signing_keys(refresh=True)
+        except Exception as e:
+            return self._refresh_failed(e)
+        return self._set_keys(keys)
+
+    async def arefresh(self):
+        try:
+            keys = signing_keys(await self.afetch_data())
+        except Exception as e:
+            return self._refresh_failed(e)
+        return self._set_keys(keys)
+
+    async def afetch_data(self):
+        # Only the async views use httpx, so sync workers never import it
+        import httpx
+
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+            return response.json()
+
+    def _set_keys(self, keys):
+        with self._lock:
+            self._keys = {key.key_id: key for key in keys}
+            self._fetched_at = time.monotonic()
+        jwks_refreshes.labels(result="success").inc()
+        return True
+
+    def _refresh_failed(self, error):
+        jwks_refreshes.labels(result="failure").inc()
+        logger.warning(f"JWKS refresh from {self.url} failed: {error}")
+        with self._lock:
+            if self._fetched_at is None:
+                # Requests wait out the cooldown too rather than each trying
+                # an endpoint that is down
+                self._last_miss_refresh = time.monotonic()
+        return False
+
+    def get_signing_key(self, kid):
+        key = self._cached_key(kid)
+        if key is None:
+            if self._should_refresh_for_miss():
+                self.refresh()
+            key = self._found_key(kid)
+        return key
+
+    async def aget_signing_key(self, kid):
+        key = self._cached_key(kid)
+        if key is None:
+            if self._should_refresh_for_miss():
+                await self.arefresh()
+            key = self._found_key(kid)
+        return key
+
+    def _cached_key(self, kid):
+        self._ensure_refresher()
+
+        key = self._keys.get(kid)
+        if key is not None:
+            jwks_cache_hits.inc()
+            return key
+
+        jwks_cache_misses.inc()
+        return None
+
+    def _should_refresh_for_miss(self):
+        # An unknown kid usually means Supabase rotated its keys, so refetch
+        # once. The cooldown stops tokens with made up kids forcing a fetch on
+        # every request. With nothing cached yet, e.g. the refresher hasn't
+        # finished warming up, every request fetches until a fetch fails.
+        now = time.monotonic()
+        with self._lock:
+            cooling_down = (
+                self._last_miss_refresh is not None
+                and now - self._last_miss_refresh < self.miss_cooldown
+            )
+            if not cooling_down and self._fetched_at is not None:
+                self._last_miss_refresh = now
+        return not cooling_down
+
+    def _found_key(self, kid):
+        key = self._keys.get(kid)
+        if key is None:
+            raise PyJWKClientError(
+                f'Unable to find a signing key that matches: "{kid}"'
+            )
+        return key
+
+    def get_signing_key_from_jwt(self, token):
+        header = jwt.get_unverified_header(token)
+        return self.get_signing_key(header.get("kid"))
+
+    async def aget_signing_key_from_jwt(self, token):
+        header = jwt.get_unverified_header(token)
+        return await self.aget_signing_key(header.get("kid"))
+
+    def start(self):
+        """
+        Starts the background refresher, which also performs the initial fetch.
+        """
+        self._ensure_refresher()
+
+    def _ensure_refresher(self):
+        # Threads do not survive a fork, so each worker process starts its own
+        pid = os.getpid()
+        if not self.background or self._refresher_pid == pid:
+            return
+        with self._lock:
+            if self._refresher_pid == pid:
+                return
+            self._refresher_pid = pid
+            self._stop = threading.Event()
+            thread = threading.Thread(
+                target=self._refresh_loop,
+                args=(self._stop,),
+                name="jwks-refresher",
+                daemon=True,
+            )
+            thread.start()
+
+    def _refresh_loop(self, stop):
+        retry_delay = 5
+        while not stop.is_set():
+            if self.refresh():
+                retry_delay = 5
+                delay = max(self.lifespan - self.refresh_margin, 1)
+            else:
+                delay = retry_delay
+                retry_delay = min(retry_delay * 2, self.refresh_margin)
+            stop.wait(delay)
+
+    def stop(self):
+        self._stop.set()
+        self._refresher_pid = None
+
+
+def signing_keys(data):
+    """
+    The signing keys of a JWKS document, picked as PyJWKClient picks them.
+    """
+    keys = [
+        key
+        for key in PyJWKSet.from_dict(data).keys
+        if key.public_key_use in ("sig", None) and key.key_id
+    ]
+    if not keys:
+        raise PyJWKClientError("The JWKS endpoint did not contain any signing keys")
+    return keys
+
+
+_key_store = None
+_key_store_lock = threading.Lock()
+
+
+def _reset_lock_after_fork():
+    # With preload_app, gunicorn forks its workers from a master that may be
+    # running the refresher. A fork copies the lock in whatever state that
+    # thread left it in, so a worker could otherwise start with it held.
+    if _key_store is not None:
+        _key_store._lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_lock_after_fork)
+
+
+def get_key_store():
+    global _key_store
+    if _key_store is None:
+        with _key_store_lock:
+            if _key_store is None:
+                _key_store = JWKSKeyStore(
+                    url=f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json",
+                    lifespan=settings.SUPABASE_JWKS_LIFESPAN,
+                )
+    return _key_store
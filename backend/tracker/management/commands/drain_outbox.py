@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from tracker.outbox import OutboxWorker
+
+
+class Command(BaseCommand):
+    help = (
+        "Makes the external calls queued in the outbox, such as deleting "
+        "Supabase users, polling for new ones until stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Messages claimed at a time (default 100).",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Seconds to wait when no message is due (default 5).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no message is due instead of polling.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        worker = OutboxWorker()
+        while True:
+            # As the request cycle does, so that a connection the database
+            # dropped while the worker slept is replaced rather than failing
+            close_old_connections()
+            outcomes = worker.drain(batch_size)
+            if outcomes:
+                self.stdout.write(
+                    f"Delivered {outcomes['delivered']}, retrying "
+                    f"{outcomes['retried']}, dead-lettered {outcomes['dead']}."
+                )
+            if outcomes.total() < batch_size:
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
@@ -0,0 +1,65 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from tracker import importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports a user's workout history from a CSV export of Strong, Hevy or "
+        "this app. Workouts already imported from the file are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The CSV file to import.")
+        parser.add_argument(
+            "--user", type=int, required=True, dest="user_id", help="User id."
+        )
+        parser.add_argument(
+            "--profile",
+            choices=sorted(importer.PROFILES),
+            help="The app the file was exported from, detected if left out.",
+        )
+        parser.add_argument(
+            "--tz",
+            default="UTC",
+            help="Time zone of dates without one in the file (default UTC).",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(pk=options["user_id"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user_id']} does not exist.")
+        try:
+            tz = ZoneInfo(options["tz"])
+        except (ZoneInfoNotFoundError, ValueError):
+            raise CommandError(f"Unknown time zone '{options['tz']}'.")
+
+        def progress(totals):
+            self.stdout.write(
+                f"Imported {totals['workouts']} workouts " f"({totals['sets']} sets)..."
+            )
+
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as lines:
+                totals = importer.import_csv(
+                    user,
+                    lines,
+                    profile=options["profile"],
+                    tz=tz,
+                    progress=progress,
+                )
+        except (OSError, importer.CSVImportError) as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {totals['workouts']} workouts with {totals['sets']} "
+                f"sets, skipped {totals['already_imported']} already imported "
+                f"and added {totals['custom_exercise_names']} custom exercise "
+                f"names."
+            )
+        )
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from tracker.models import ExerciseSummary
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the per-user exercise summaries and exercise name search index "
+        "from workout history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Only rebuild the given user id (can be repeated).",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options["user_ids"]
+        if not user_ids:
+            User = get_user_model()
+            user_ids = User.objects.values_list("pk", flat=True).iterator()
+
+        rebuilt = 0
+        for user_id in user_ids:
+            ExerciseSummary.rebuild(user_id)
+            rebuilt += 1
+            if rebuilt % 100 == 0:
+                self.stdout.write(f"Rebuilt summaries for {rebuilt} users...")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt exercise summaries for {rebuilt} users.")
+        )
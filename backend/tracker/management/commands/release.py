@@ -0,0 +1,13 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Applies pending migrations. Run once per deploy, as a one-off container "
+        "from the new image, before its web containers start."
+    )
+
+    def handle(self, *args, **options):
+        call_command("migrate", interactive=False, verbosity=options["verbosity"])
+        self.stdout.write(self.style.SUCCESS("Release complete."))
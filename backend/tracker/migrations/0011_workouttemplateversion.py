@@ -0,0 +1,108 @@
+# Generated by Django 5.2 on 2026-10-18 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    WorkoutTemplate = apps.get_model("tracker", "WorkoutTemplate")
+    WorkoutTemplateVersion = apps.get_model("tracker", "WorkoutTemplateVersion")
+    ExerciseTemplate = apps.get_model("tracker", "ExerciseTemplate")
+
+    for template in WorkoutTemplate.objects.all().iterator():
+        version = WorkoutTemplateVersion.objects.create()
+        ExerciseTemplate.objects.filter(workout_template=template).update(
+            version=version
+        )
+        template.current_version = version
+        template.save(update_fields=["current_version"])
+
+
+def restore_templates(apps, schema_editor):
+    WorkoutTemplate = apps.get_model("tracker", "WorkoutTemplate")
+    ExerciseTemplate = apps.get_model("tracker", "ExerciseTemplate")
+    SetTemplate = apps.get_model("tracker", "SetTemplate")
+
+    # Versions replaced by an edit are only kept for the workouts started from
+    # them, and have no template to go back to
+    current_versions = WorkoutTemplate.objects.exclude(
+        current_version=None
+    ).values("current_version_id")
+    ExerciseTemplate.objects.exclude(version_id__in=current_versions).delete()
+
+    # A version shared by duplicated templates goes back to the first of them,
+    # and the others get a copy of its contents
+    owners = {}
+    templates = WorkoutTemplate.objects.exclude(current_version=None).order_by("pk")
+    for template in templates.iterator():
+        version_id = template.current_version_id
+        if version_id not in owners:
+            ExerciseTemplate.objects.filter(version_id=version_id).update(
+                workout_template=template
+            )
+            owners[version_id] = template
+            continue
+
+        exercise_templates = ExerciseTemplate.objects.filter(
+            version_id=version_id, workout_template=owners[version_id]
+        ).order_by("pk")
+        for exercise_template in exercise_templates:
+            set_templates = list(
+                SetTemplate.objects.filter(
+                    exercise_template=exercise_template
+                ).order_by("pk")
+            )
+            exercise_template.pk = None
+            exercise_template.workout_template = template
+            exercise_template.save()
+            for set_template in set_templates:
+                set_template.pk = None
+                set_template.exercise_template = exercise_template
+            SetTemplate.objects.bulk_create(set_templates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0010_exercise_increment_step'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkoutTemplateVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='exercisetemplate',
+            name='version',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='exercise_templates', to='tracker.workouttemplateversion'),
+        ),
+        migrations.AddField(
+            model_name='workouttemplate',
+            name='current_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='templates', to='tracker.workouttemplateversion'),
+        ),
+        migrations.AddField(
+            model_name='workout',
+            name='template_version',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='workouts', to='tracker.workouttemplateversion'),
+        ),
+        migrations.AlterField(
+            model_name='exercisetemplate',
+            name='workout_template',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='exercise_templates', to='tracker.workouttemplate'),
+        ),
+        migrations.RunPython(create_versions, restore_templates),
+        migrations.RemoveField(
+            model_name='exercisetemplate',
+            name='workout_template',
+        ),
+        migrations.AlterField(
+            model_name='exercisetemplate',
+            name='version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exercise_templates', to='tracker.workouttemplateversion'),
+        ),
+    ]
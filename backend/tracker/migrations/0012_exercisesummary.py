@@ -0,0 +1,69 @@
+# Generated by Django 5.2 on 2026-10-18 16:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Coalesce, Floor
+
+
+def populate_summaries(apps, schema_editor):
+    Exercise = apps.get_model("tracker", "Exercise")
+    ExerciseSummary = apps.get_model("tracker", "ExerciseSummary")
+
+    valid_set = Q(
+        sets__weight__isnull=False, sets__reps__gt=0, sets__reps__lt=37
+    )
+    rows = (
+        Exercise.objects.values("workout__user", "name")
+        .annotate(
+            last_performed=Max("workout__date"),
+            session_count=Count("workout", distinct=True),
+            best_weight=Max("sets__weight", filter=valid_set),
+            best_one_rep_max=Max(
+                Floor(F("sets__weight") * 36.0 / (37.0 - F("sets__reps"))),
+                filter=valid_set,
+            ),
+            total_volume=Coalesce(
+                Sum(F("sets__weight") * F("sets__reps"), filter=valid_set), 0.0
+            ),
+        )
+        .order_by()
+    )
+
+    batch = []
+    for row in rows.iterator():
+        row["user_id"] = row.pop("workout__user")
+        batch.append(ExerciseSummary(**row))
+        if len(batch) == 1000:
+            ExerciseSummary.objects.bulk_create(batch)
+            batch = []
+    ExerciseSummary.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0011_workouttemplateversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('last_performed', models.DateTimeField()),
+                ('session_count', models.PositiveIntegerField(default=0)),
+                ('best_weight', models.FloatField(blank=True, null=True)),
+                ('best_one_rep_max', models.FloatField(blank=True, null=True)),
+                ('total_volume', models.FloatField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exercise_summaries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-last_performed'], name='tracker_exe_user_id_03d06c_idx')],
+                'unique_together': {('user', 'name')},
+            },
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
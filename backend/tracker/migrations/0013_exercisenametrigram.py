@@ -0,0 +1,57 @@
+# Generated by Django 5.2 on 2026-10-18 16:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+import re
+
+
+def trigrams(text):
+    grams = set()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def populate_trigrams(apps, schema_editor):
+    ExerciseSummary = apps.get_model("tracker", "ExerciseSummary")
+    CustomExerciseName = apps.get_model("tracker", "CustomExerciseName")
+    ExerciseNameTrigram = apps.get_model("tracker", "ExerciseNameTrigram")
+
+    names = set(ExerciseSummary.objects.values_list("user_id", "name"))
+    names.update(CustomExerciseName.objects.values_list("user_id", "name"))
+
+    batch = []
+    for user_id, name in names:
+        for trigram in trigrams(name):
+            batch.append(
+                ExerciseNameTrigram(user_id=user_id, trigram=trigram, name=name)
+            )
+        if len(batch) >= 1000:
+            ExerciseNameTrigram.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    ExerciseNameTrigram.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0012_exercisesummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseNameTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('name', models.CharField(max_length=255)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exercise_name_trigrams', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'trigram', 'name')},
+            },
+        ),
+        migrations.RunPython(populate_trigrams, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2 on 2026-10-18 16:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+
+def copy_workout_user_and_date(apps, schema_editor):
+    Exercise = apps.get_model("tracker", "Exercise")
+    Workout = apps.get_model("tracker", "Workout")
+
+    workout = Workout.objects.filter(pk=OuterRef("workout_id"))
+    last_id = Exercise.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+    # Non-atomic migration, so every batch commits on its own and the table
+    # isn't locked for the whole backfill
+    for start in range(0, last_id + 1, BATCH_SIZE):
+        Exercise.objects.filter(
+            pk__gte=start, pk__lt=start + BATCH_SIZE, user__isnull=True
+        ).update(
+            user_id=Subquery(workout.values("user_id")[:1]),
+            date=Subquery(workout.values("date")[:1]),
+        )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('tracker', '0013_exercisenametrigram'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercise',
+            name='user',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='date',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(copy_workout_user_and_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='exercise',
+            name='user',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='exercise',
+            name='date',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(fields=['user', 'name', 'date'], name='tracker_exe_user_id_2c832b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(fields=['user', 'date'], name='tracker_exe_user_id_f1f193_idx'),
+        ),
+    ]
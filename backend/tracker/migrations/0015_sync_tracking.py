@@ -0,0 +1,91 @@
+# Generated by Django 5.2 on 2026-10-18 16:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def stamp_existing_rows(apps, schema_editor):
+    """
+    Gives every existing workout and template its own version, so that a
+    client's first sync can be paged by version like any other.
+    """
+    User = apps.get_model("tracker", "User")
+    DataVersion = apps.get_model("tracker", "DataVersion")
+    Workout = apps.get_model("tracker", "Workout")
+    WorkoutTemplate = apps.get_model("tracker", "WorkoutTemplate")
+
+    for user_id in User.objects.values_list("pk", flat=True).iterator():
+        version = 0
+        for model in (Workout, WorkoutTemplate):
+            rows = list(model.objects.filter(user_id=user_id).order_by("pk").only("pk"))
+            for row in rows:
+                version += 1
+                row.sync_version = version
+            model.objects.bulk_update(rows, ["sync_version"], batch_size=1000)
+        DataVersion.objects.create(user_id=user_id, version=version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0014_exercise_user_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='data_version', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('workout', 'Workout'), ('workout_template', 'Workout template')], max_length=32)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('sync_version', models.PositiveBigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='workout',
+            name='sync_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='workout',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='workouttemplate',
+            name='sync_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='workouttemplate',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['user', 'sync_version'], name='tracker_wor_user_id_b6f111_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workouttemplate',
+            index=models.Index(fields=['user', 'sync_version'], name='tracker_wor_user_id_3d2d51_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'sync_version'], name='tracker_tom_user_id_19d781_idx'),
+        ),
+        migrations.RunPython(stamp_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0015_sync_tracking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='workout',
+            name='client_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='workout',
+            constraint=models.UniqueConstraint(fields=('user', 'client_key'), name='unique_workout_client_key'),
+        ),
+    ]
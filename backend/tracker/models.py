@@ -1,38 +1,66 @@
 from django.conf import settings
-from django.db import models, transaction
+from django.db import IntegrityError, connection, models, transaction
+from django.db.models import (
+    Count,
+    F,
+    Max,
+    OuterRef,
+    Prefetch,
+    Q,
+    Subquery,
+    Sum,
+    Window,
+)
+from django.db.models.functions import Coalesce, Floor, RowNumber
 from django.contrib.auth.models import AbstractUser
-from supabase import create_client
-from django.forms.models import model_to_dict
+from django.utils import timezone
 import logging
+import math
+import re
+from prometheus_client import Counter
+from .response_cache import invalidate as invalidate_responses
 
 logger = logging.getLogger(__name__)
 
+workout_update_rows = Counter(
+    "tracker_workout_update_rows_total",
+    "Rows written by Workout.update_with_exercises, by model and operation.",
+    ["model", "operation"],
+)
+
+
+def bulk_create_with_pks(objs, created_rows):
+    """
+    bulk_create() that always leaves primary keys set on the objects. MySQL
+    can't return them from a multi-row insert, so they are read back from
+    created_rows (a queryset matching exactly the inserted rows) in id order.
+    """
+    if not objs:
+        return objs
+    model = type(objs[0])
+    model.objects.bulk_create(objs)
+    if objs[0].pk is None:
+        pks = created_rows.order_by("pk").values_list("pk", flat=True)
+        for obj, pk in zip(objs, pks):
+            obj.pk = pk
+    return objs
+
 
 class User(AbstractUser):
     supabase_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
     email = models.EmailField(("email address"), unique=True, null=True, blank=True)
 
+    @transaction.atomic
     def delete(self, *args, **kwargs):
         """
-        Overrides the default delete method to also delete the user from Supabase.
+        Also deletes the user from Supabase, through the outbox so that the
+        request does not wait on Supabase and a failed call is retried.
         """
         if self.supabase_id:
-            try:
-                supabaseAdmin = create_client(
-                    settings.SUPABASE_URL, settings.SUPABASE_SECRET_KEY
-                )
-
-                supabaseAdmin.auth.admin.delete_user(self.supabase_id)
-
-                logger.info(
-                    f"Successfully deleted user {self.supabase_id} from Supabase."
-                )
-            except Exception as e:
-                logger.error(
-                    f"Failed to delete user {self.supabase_id} from Supabase: {e}"
-                )
-
-        super().delete(*args, **kwargs)
+            OutboxMessage.enqueue(
+                OutboxMessage.DELETE_SUPABASE_USER, {"supabase_id": self.supabase_id}
+            )
+        return super().delete(*args, **kwargs)
 
 
 class CustomExerciseName(models.Model):
@@ -44,6 +72,28 @@ class CustomExerciseName(models.Model):
     class Meta:
         unique_together = ["user", "name"]
 
+    @classmethod
+    def add_names(cls, user_id, names):
+        """
+        Bulk creates the names the user doesn't have yet. bulk_create() skips
+        the save signals, so this indexes them and bumps the data version
+        itself. Returns the names created.
+        """
+        existing = set(
+            cls.objects.filter(user_id=user_id, name__in=names).values_list(
+                "name", flat=True
+            )
+        )
+        new = sorted(set(names) - existing)
+        if not new:
+            return []
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, name=name) for name in new], ignore_conflicts=True
+        )
+        ExerciseNameTrigram.index_names(user_id, new)
+        DataVersion.bump(user_id)
+        return new
+
 
 class ExerciseGoal(models.Model):
     user = models.ForeignKey(
@@ -67,10 +117,291 @@ class ExerciseGoal(models.Model):
         return f"{self.user.username} - {self.exercise_name}: {self.goal_weight}"
 
 
+# --- Sync Models ---
+
+
+class DataVersion(models.Model):
+    """
+    Per-user counter that goes up with every change to the user's synced data.
+    Changed rows are stamped with the new version, so clients can ask for
+    everything after the last version they saw. Bumping holds a lock on the
+    counter row until the transaction commits, so a user's versions become
+    visible in order.
+    """
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="data_version",
+    )
+    version = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    @transaction.atomic(savepoint=False)
+    def bump(cls, user_id, count=1):
+        """
+        Returns the new version. With count, that many versions are reserved
+        and the new one is the last of them.
+        """
+        versions = cls.objects.filter(user_id=user_id)
+        if not versions.update(version=F("version") + count):
+            try:
+                with transaction.atomic():
+                    cls.objects.create(user_id=user_id, version=count)
+                return count
+            except IntegrityError:
+                # Created by a concurrent first write
+                versions.update(version=F("version") + count)
+        return cls.current(user_id)
+
+    @classmethod
+    @transaction.atomic(savepoint=False)
+    def skip_past(cls, user_id, version):
+        """
+        Moves the user's version above version, for when a rollback has
+        discarded versions that were already handed out, e.g. in ETags.
+        """
+        skipped = cls.objects.filter(user_id=user_id, version__lte=version).update(
+            version=version + 1
+        )
+        if not skipped:
+            cls.objects.get_or_create(
+                user_id=user_id, defaults={"version": version + 1}
+            )
+
+    @classmethod
+    def current(cls, user_id):
+        version = (
+            cls.objects.filter(user_id=user_id)
+            .values_list("version", flat=True)
+            .first()
+        )
+        return version or 0
+
+    @classmethod
+    async def acurrent(cls, user_id):
+        version = (
+            await cls.objects.filter(user_id=user_id)
+            .values_list("version", flat=True)
+            .afirst()
+        )
+        return version or 0
+
+    def __str__(self):
+        return f"{self.user_id} - v{self.version}"
+
+
+class SyncedModel(models.Model):
+    """
+    Rows that clients sync incrementally. Every save stamps the row with a new
+    DataVersion of its user.
+    """
+
+    sync_version = models.PositiveBigIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @transaction.atomic(savepoint=False)
+    def save(self, *args, **kwargs):
+        self.sync_version = DataVersion.bump(self.user_id)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "sync_version", "updated_at"}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def touch(cls, pk, user_id):
+        """
+        Marks a row as changed without loading it, for when one of its child
+        rows changes.
+        """
+        cls.objects.filter(pk=pk).update(
+            sync_version=DataVersion.bump(user_id), updated_at=timezone.now()
+        )
+
+    @classmethod
+    def touch_many(cls, pks, user_id):
+        """
+        touch() for several rows of a user, each getting its own version.
+        """
+        pks = sorted(pks)
+        if not pks:
+            return
+        last_version = DataVersion.bump(user_id, count=len(pks))
+        now = timezone.now()
+        cls.objects.bulk_update(
+            [
+                cls(pk=pk, sync_version=last_version - len(pks) + i + 1, updated_at=now)
+                for i, pk in enumerate(pks)
+            ],
+            ["sync_version", "updated_at"],
+        )
+
+
+class Tombstone(models.Model):
+    """
+    Left behind by a deleted workout or template so that syncing clients find
+    out about the deletion.
+    """
+
+    WORKOUT = "workout"
+    WORKOUT_TEMPLATE = "workout_template"
+    MODEL_CHOICES = [(WORKOUT, "Workout"), (WORKOUT_TEMPLATE, "Workout template")]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="tombstones"
+    )
+    model = models.CharField(max_length=32, choices=MODEL_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    sync_version = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "sync_version"]),
+        ]
+
+    @classmethod
+    def record(cls, instance):
+        model = cls.WORKOUT if isinstance(instance, Workout) else cls.WORKOUT_TEMPLATE
+        return cls.objects.create(
+            user_id=instance.user_id,
+            model=model,
+            object_id=instance.pk,
+            sync_version=DataVersion.bump(instance.user_id),
+        )
+
+    def __str__(self):
+        return f"{self.model} {self.object_id} deleted at {self.deleted_at}"
+
+
+class OutboxMessage(models.Model):
+    """
+    A call to an external service, written in the same transaction as the
+    change that needs it and made afterwards by the drain_outbox command
+    (outbox.py). Delivered messages are deleted; ones that keep failing are
+    kept with dead_at set.
+    """
+
+    DELETE_SUPABASE_USER = "delete_supabase_user"
+    KIND_CHOICES = [(DELETE_SUPABASE_USER, "Delete Supabase user")]
+
+    kind = models.CharField(max_length=64, choices=KIND_CHOICES)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    # When the message is next due: backed off after a failure, and pushed
+    # back while a worker is delivering it
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    dead_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["dead_at", "available_at"]),
+        ]
+
+    @classmethod
+    def enqueue(cls, kind, payload):
+        return cls.objects.create(kind=kind, payload=payload)
+
+    @classmethod
+    @transaction.atomic
+    def claim(cls, limit, lease):
+        """
+        Up to limit due messages, oldest first, made unavailable to other
+        workers for lease (a timedelta). A worker that dies while delivering
+        leaves its messages to be claimed again once the lease runs out.
+        """
+        now = timezone.now()
+        messages = list(
+            cls.objects.select_for_update(skip_locked=True)
+            .filter(dead_at__isnull=True, available_at__lte=now)
+            .order_by("available_at", "id")[:limit]
+        )
+        cls.objects.filter(pk__in=[message.pk for message in messages]).update(
+            available_at=now + lease
+        )
+        for message in messages:
+            message.available_at = now + lease
+        return messages
+
+    def renew(self, lease):
+        """
+        Extends the lease on a claimed message, so that it runs from now.
+        Returns False, leaving the message alone, if the lease ran out and
+        another worker claimed the message in the meantime.
+        """
+        available_at = timezone.now() + lease
+        renewed = (
+            type(self)
+            .objects.filter(pk=self.pk, available_at=self.available_at)
+            .update(available_at=available_at)
+        )
+        if renewed:
+            self.available_at = available_at
+        return bool(renewed)
+
+    def __str__(self):
+        return f"{self.kind} {self.payload} ({self.attempts} attempts)"
+
+
 # --- Workout Models ---
 
 
-class Workout(models.Model):
+def match_by_id(items, existing):
+    """
+    Pairs incoming dicts with existing objects (a dict of pk -> object) by
+    their "id". Returns (matched pairs, unmatched items, pks of objects that
+    are no longer present).
+
+    Rows have no explicit ordering, they are listed in id order. If keeping
+    the matched rows would change the order the client sent, nothing is
+    matched so that every row is recreated in the new order.
+    """
+    matched = []
+    new = []
+    last_pk = None
+    for item in items:
+        obj = existing.get(item.get("id"))
+        if obj is None:
+            new.append(item)
+            continue
+        if new or (last_pk is not None and obj.pk <= last_pk):
+            return [], list(items), list(existing)
+        matched.append((obj, item))
+        last_pk = obj.pk
+
+    matched_pks = {obj.pk for obj, _ in matched}
+    removed = [pk for pk in existing if pk not in matched_pks]
+    return matched, new, removed
+
+
+def assign_changed_fields(obj, data, exclude=()):
+    """
+    Copies data onto obj and returns the names of the fields whose value changed.
+    """
+    changed = []
+    for field, value in data.items():
+        if field == "id" or field in exclude:
+            continue
+        if getattr(obj, field) != value:
+            setattr(obj, field, value)
+            changed.append(field)
+    return changed
+
+
+def with_set_defaults(set_data, drop_id=False):
+    set_data = {"reps": 0, "weight": 0, **set_data}
+    if drop_id:
+        set_data.pop("id", None)
+    return set_data
+
+
+class Workout(SyncedModel):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
     date = models.DateTimeField()
@@ -78,6 +409,47 @@ class Workout(models.Model):
     template = models.ForeignKey(
         "WorkoutTemplate", on_delete=models.SET_NULL, null=True, blank=True
     )
+    # The exact template contents the workout was started from
+    template_version = models.ForeignKey(
+        "WorkoutTemplateVersion",
+        related_name="workouts",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    # Generated by the app for workouts logged offline, see ingest()
+    client_key = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "sync_version"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "client_key"], name="unique_workout_client_key"
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the exercises' copy of the date was last synced to
+        instance._saved_date = instance.__dict__.get("date")
+        return instance
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding and self.date != getattr(self, "_saved_date", None):
+            self.exercises.exclude(date=self.date).update(date=self.date)
+        self._saved_date = self.date
+
+    def build_exercise(self, **fields):
+        """
+        An unsaved Exercise of this workout, for bulk_create(), which skips
+        Exercise.save() and so the copying of the workout's user and date.
+        """
+        return Exercise(workout=self, user_id=self.user_id, date=self.date, **fields)
 
     @classmethod
     @transaction.atomic
@@ -88,82 +460,320 @@ class Workout(models.Model):
             notes=template.notes,
             date=date,
             template=template,
+            template_version_id=template.current_version_id,
         )
 
-        # Copy exercises and sets from the template
-        for exercise_template in template.exercise_templates.all():
-            new_exercise = new_workout.exercises.create(
-                name=exercise_template.name,
-                rest_period=exercise_template.rest_period,
-                notes=exercise_template.notes,
+        exercise_templates = list(
+            template.exercise_templates.order_by("id").prefetch_related(
+                Prefetch("set_templates", queryset=SetTemplate.objects.order_by("id"))
             )
+        )
+        if not exercise_templates:
+            return new_workout
 
-            autofilled_weight = None
-            ExerciseModel = new_workout.exercises.model
+        # Most recent previous performance of every exercise, for autofilling
+        previous_exercises = {
+            exercise.name: exercise
+            for exercise in Exercise.objects.latest_per_name(
+                user, {et.name for et in exercise_templates}, before=date
+            ).prefetch_related(Prefetch("sets", queryset=Set.objects.order_by("id")))
+        }
 
-            previous_exercise = (
-                ExerciseModel.objects.filter(
-                    workout__user=user,
+        # Copy exercises and sets from the template
+        new_exercises = bulk_create_with_pks(
+            [
+                new_workout.build_exercise(
                     name=exercise_template.name,
-                    workout__date__lt=date,
+                    rest_period=exercise_template.rest_period,
+                    notes=exercise_template.notes,
                 )
-                .order_by("-workout__date")
-                .first()
-            )
-
-            if previous_exercise:
-                previous_sets = previous_exercise.sets.all()
-                if previous_sets.exists():
-                    first_weight = previous_sets.first().weight
-
-                    if first_weight is not None:
-                        all_same_weight = all(
-                            s.weight == first_weight for s in previous_sets
-                        )
-                        all_hit_top_reps = all(
-                            s.reps is not None and s.reps >= s.max_reps
-                            for s in previous_sets
-                        )
-
-                        if all_same_weight and all_hit_top_reps:
-                            autofilled_weight = (
-                                first_weight + exercise_template.increment_step
-                            )
-                        else:
-                            autofilled_weight = first_weight
+                for exercise_template in exercise_templates
+            ],
+            created_rows=new_workout.exercises.all(),
+        )
 
+        new_sets = []
+        for exercise_template, new_exercise in zip(exercise_templates, new_exercises):
+            autofilled_weight = cls._autofill_weight(
+                previous_exercises.get(exercise_template.name),
+                exercise_template.increment_step,
+            )
             for set_template in exercise_template.set_templates.all():
-                new_exercise.sets.create(
-                    notes=set_template.notes,
-                    min_reps=set_template.min_reps,
-                    max_reps=set_template.max_reps,
-                    weight=autofilled_weight,
+                new_sets.append(
+                    Set(
+                        exercise=new_exercise,
+                        notes=set_template.notes,
+                        min_reps=set_template.min_reps,
+                        max_reps=set_template.max_reps,
+                        weight=autofilled_weight,
+                    )
                 )
+        Set.objects.bulk_create(new_sets)
+        ExerciseSummary.refresh_for(user.pk, {et.name for et in exercise_templates})
         return new_workout
 
+    @classmethod
+    def ingest(cls, user, workouts_data):
+        """
+        Creates complete workouts logged offline, each identified by the
+        client_key the app generated for it. Workouts whose key already exists
+        are left as they are, so replaying a batch changes nothing. Returns
+        ({client key: workout id} for every workout, keys created just now).
+        """
+        keys = [data["client_key"] for data in workouts_data]
+        ids = cls._ids_for_keys(user, keys)
+        if len(ids) == len(keys):
+            # A replay, answered without starting a transaction
+            return ids, []
+        try:
+            return cls._ingest(user, workouts_data)
+        except IntegrityError:
+            # A concurrent replay created some of the keys first
+            return cls._ingest(user, workouts_data)
+
+    @classmethod
+    def _ids_for_keys(cls, user, keys):
+        return dict(
+            cls.objects.filter(user=user, client_key__in=keys).values_list(
+                "client_key", "pk"
+            )
+        )
+
+    @classmethod
+    @transaction.atomic
+    def _ingest(cls, user, workouts_data):
+        ids = cls._ids_for_keys(user, [data["client_key"] for data in workouts_data])
+        new = [data for data in workouts_data if data["client_key"] not in ids]
+        if not new:
+            return ids, []
+
+        # Every new workout gets its own version, in the order given
+        last_version = DataVersion.bump(user.pk, count=len(new))
+        workouts = bulk_create_with_pks(
+            [
+                cls(
+                    user=user,
+                    sync_version=last_version - len(new) + i + 1,
+                    **{k: v for k, v in data.items() if k != "exercises"},
+                )
+                for i, data in enumerate(new)
+            ],
+            created_rows=cls.objects.filter(
+                user=user, client_key__in=[data["client_key"] for data in new]
+            ),
+        )
+
+        exercises = []
+        sets_data = []
+        for workout, data in zip(workouts, new):
+            for exercise_data in data.get("exercises", []):
+                exercises.append(
+                    workout.build_exercise(
+                        **{
+                            k: v
+                            for k, v in exercise_data.items()
+                            if k not in ("id", "sets")
+                        }
+                    )
+                )
+                sets_data.append(exercise_data.get("sets", []))
+        bulk_create_with_pks(
+            exercises,
+            created_rows=Exercise.objects.filter(
+                workout__in=[workout.pk for workout in workouts]
+            ),
+        )
+        Set.objects.bulk_create(
+            Set(exercise=exercise, **with_set_defaults(set_data, drop_id=True))
+            for exercise, exercise_sets in zip(exercises, sets_data)
+            for set_data in exercise_sets
+        )
+
+        # Bulk inserts skip the signals that keep these up to date
+        ExerciseSummary.refresh_for(user.pk, {e.name for e in exercises})
+        invalidate_responses(user.pk, "exercises")
+
+        ids.update((workout.client_key, workout.pk) for workout in workouts)
+        return ids, [workout.client_key for workout in workouts]
+
+    @staticmethod
+    def _autofill_weight(previous_exercise, increment_step):
+        """
+        Weight for the next session: the previous weight, plus the increment
+        step if every set was done at the same weight and hit the top of its
+        rep range.
+        """
+        if previous_exercise is None:
+            return None
+        previous_sets = previous_exercise.sets.all()
+        if not previous_sets:
+            return None
+
+        first_weight = previous_sets[0].weight
+        if first_weight is None:
+            return None
+
+        all_same_weight = all(s.weight == first_weight for s in previous_sets)
+        all_hit_top_reps = all(
+            s.reps is not None and s.reps >= s.max_reps for s in previous_sets
+        )
+
+        if all_same_weight and all_hit_top_reps:
+            return first_weight + increment_step
+        return first_weight
+
     @transaction.atomic
     def update_with_exercises(self, workout_data):
+        """
+        Applies an edit of the whole workout. Incoming exercises and sets are
+        matched to the existing rows by id, so only rows that actually changed
+        are written. The number of rows touched is left in self.write_counts.
+        """
+        previous_date = self.date
         self.name = workout_data.get("name", self.name)
         self.date = workout_data.get("date", self.date)
         self.notes = workout_data.get("notes", self.notes)
         self.save()
 
+        self.write_counts = {
+            "exercises": {"created": 0, "updated": 0, "deleted": 0},
+            "sets": {"created": 0, "updated": 0, "deleted": 0},
+        }
+        touched_names = set()
+        if self.date != previous_date:
+            touched_names.update(self.exercises.values_list("name", flat=True))
         if "exercises" in workout_data:
-            self.exercises.all().delete()
-            exercises_data = workout_data.get("exercises")
-            for exercise_data in exercises_data:
-                sets_data = exercise_data.pop("sets")
-                exercise = self.exercises.create(**exercise_data)
-                for set_data in sets_data:
-                    set_data.setdefault("reps", 0)
-                    set_data.setdefault("weight", 0)
-                    exercise.sets.create(**set_data)
+            touched_names.update(self._sync_exercises(workout_data.get("exercises")))
+        ExerciseSummary.refresh_for(self.user_id, touched_names)
+
+        for model_name, counts in self.write_counts.items():
+            for operation, count in counts.items():
+                if count:
+                    workout_update_rows.labels(model_name, operation).inc(count)
+        logger.debug(f"Updated workout {self.pk}: {self.write_counts}")
         return self
 
+    def _sync_exercises(self, exercises_data):
+        existing = {
+            exercise.pk: exercise
+            for exercise in self.exercises.prefetch_related(
+                Prefetch("sets", queryset=Set.objects.order_by("id"))
+            )
+        }
+        matched, new, removed = match_by_id(exercises_data, existing)
+
+        # Names whose history changed, for refreshing their summaries
+        touched_names = {existing[pk].name for pk in removed}
+        touched_names.update(exercise_data["name"] for exercise_data in new)
+
+        sets_to_create = []
+        sets_to_update = []
+        set_fields = set()
+        sets_to_delete = []
+        exercises_to_update = []
+        exercise_fields = set()
+
+        for exercise, exercise_data in matched:
+            sets_data = exercise_data.get("sets", [])
+            previous_name = exercise.name
+            changed = assign_changed_fields(exercise, exercise_data, exclude={"sets"})
+            if changed:
+                exercises_to_update.append(exercise)
+                exercise_fields.update(changed)
+                touched_names.update([previous_name, exercise.name])
+
+            set_matched, set_new, set_removed = match_by_id(
+                sets_data, {s.pk: s for s in exercise.sets.all()}
+            )
+            for set_obj, set_data in set_matched:
+                changed = assign_changed_fields(set_obj, with_set_defaults(set_data))
+                if changed:
+                    sets_to_update.append(set_obj)
+                    set_fields.update(changed)
+                    touched_names.add(exercise.name)
+            sets_to_create.extend(
+                Set(exercise=exercise, **with_set_defaults(set_data, drop_id=True))
+                for set_data in set_new
+            )
+            sets_to_delete.extend(set_removed)
+            if set_new or set_removed:
+                touched_names.add(exercise.name)
+
+        # Removing an exercise cascades to its sets
+        if removed:
+            deleted, per_model = Exercise.objects.filter(pk__in=removed).delete()
+            self.write_counts["exercises"]["deleted"] += per_model.get(
+                Exercise._meta.label, 0
+            )
+            self.write_counts["sets"]["deleted"] += per_model.get(Set._meta.label, 0)
+
+        if new:
+            new_exercises = bulk_create_with_pks(
+                [
+                    self.build_exercise(
+                        **{
+                            k: v
+                            for k, v in exercise_data.items()
+                            if k not in ("id", "sets")
+                        },
+                    )
+                    for exercise_data in new
+                ],
+                created_rows=self.exercises.exclude(
+                    pk__in=[exercise.pk for exercise, _ in matched]
+                ),
+            )
+            self.write_counts["exercises"]["created"] += len(new_exercises)
+            for exercise, exercise_data in zip(new_exercises, new):
+                sets_to_create.extend(
+                    Set(exercise=exercise, **with_set_defaults(set_data, drop_id=True))
+                    for set_data in exercise_data.get("sets", [])
+                )
+
+        if exercises_to_update:
+            Exercise.objects.bulk_update(exercises_to_update, sorted(exercise_fields))
+            self.write_counts["exercises"]["updated"] += len(exercises_to_update)
+        if sets_to_delete:
+            self.write_counts["sets"]["deleted"] += Set.objects.filter(
+                pk__in=sets_to_delete
+            ).delete()[0]
+        if sets_to_update:
+            Set.objects.bulk_update(sets_to_update, sorted(set_fields))
+            self.write_counts["sets"]["updated"] += len(sets_to_update)
+        if sets_to_create:
+            Set.objects.bulk_create(sets_to_create)
+            self.write_counts["sets"]["created"] += len(sets_to_create)
+        return touched_names
+
+    def delete(self, *args, **kwargs):
+        names = list(self.exercises.values_list("name", flat=True).distinct())
+        result = super().delete(*args, **kwargs)
+        ExerciseSummary.refresh_for(self.user_id, names)
+        return result
+
     def __str__(self):
         return f"{self.name} on {self.date}"
 
 
+class ExerciseQuerySet(models.QuerySet):
+    def latest_per_name(self, user, names, before):
+        """
+        The user's most recent exercise for each of the given names performed
+        before the given date, in a single windowed query.
+        """
+        return (
+            self.filter(user=user, name__in=names, date__lt=before)
+            .annotate(
+                recency=Window(
+                    RowNumber(),
+                    partition_by=F("name"),
+                    order_by=[F("date").desc(), F("id").desc()],
+                )
+            )
+            .filter(recency=1)
+        )
+
+
 class Exercise(models.Model):
     workout = models.ForeignKey(
         "Workout", related_name="exercises", on_delete=models.CASCADE
@@ -173,6 +783,27 @@ class Exercise(models.Model):
     notes = models.TextField(blank=True)
     increment_step = models.FloatField(default=2.5)
 
+    # Copies of the workout's user and date, so that history lookups are range
+    # scans of the (user, name, date) index instead of joins through Workout.
+    # Workout.save() keeps the date in sync.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, editable=False
+    )
+    date = models.DateTimeField(editable=False)
+
+    objects = ExerciseQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "name", "date"]),
+            models.Index(fields=["user", "date"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.user_id = self.workout.user_id
+        self.date = self.workout.date
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
@@ -191,40 +822,331 @@ class Set(models.Model):
         return self.name
 
 
+def one_rep_max(weight, reps):
+    """
+    Brzycki estimate, rounded down like the mobile app's calculateOneRepMax.
+    """
+    return Floor(F(weight) * 36.0 / (37.0 - F(reps)))
+
+
+def valid_set_filter(prefix=""):
+    """
+    Sets that count towards analytics: a weight and between 1 and 36 reps (the
+    Brzycki formula breaks down at 37).
+    """
+    return Q(
+        **{
+            f"{prefix}weight__isnull": False,
+            f"{prefix}reps__gt": 0,
+            f"{prefix}reps__lt": 37,
+        }
+    )
+
+
+class ExerciseSummary(models.Model):
+    """
+    Denormalized per-user, per-exercise statistics, kept up to date by the
+    workout write paths so readers don't have to aggregate the whole history.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="exercise_summaries",
+    )
+    name = models.CharField(max_length=100)
+    last_performed = models.DateTimeField()
+    session_count = models.PositiveIntegerField(default=0)
+    best_weight = models.FloatField(null=True, blank=True)
+    best_one_rep_max = models.FloatField(null=True, blank=True)
+    total_volume = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ["user", "name"]
+        indexes = [
+            models.Index(fields=["user", "-last_performed"]),
+        ]
+
+    @classmethod
+    def refresh_for(cls, user_id, names):
+        """
+        Recomputes the summaries of the given exercise names from their history
+        and removes those that no longer have any.
+        """
+        names = set(names)
+        if not names:
+            return
+
+        valid_set = valid_set_filter("sets__")
+        rows = (
+            Exercise.objects.filter(user_id=user_id, name__in=names)
+            .values("name")
+            .annotate(
+                last_performed=Max("date"),
+                session_count=Count("workout", distinct=True),
+                best_weight=Max("sets__weight", filter=valid_set),
+                best_one_rep_max=Max(
+                    one_rep_max("sets__weight", "sets__reps"), filter=valid_set
+                ),
+                total_volume=Coalesce(
+                    Sum(F("sets__weight") * F("sets__reps"), filter=valid_set), 0.0
+                ),
+            )
+        )
+        summaries = [cls(user_id=user_id, **row) for row in rows]
+
+        performed = {summary.name for summary in summaries}
+        cls.objects.filter(user_id=user_id, name__in=names).exclude(
+            name__in=performed
+        ).delete()
+        cls.upsert(summaries)
+
+        ExerciseNameTrigram.index_names(user_id, performed)
+        if names - performed:
+            ExerciseNameTrigram.unindex_names(user_id, names - performed)
+
+    @classmethod
+    def upsert(cls, summaries):
+        options = {
+            "update_conflicts": True,
+            "update_fields": [
+                "last_performed",
+                "session_count",
+                "best_weight",
+                "best_one_rep_max",
+                "total_volume",
+            ],
+        }
+        # MySQL's ON DUPLICATE KEY UPDATE can't name the conflicting columns
+        if connection.features.supports_update_conflicts_with_target:
+            options["unique_fields"] = ["user", "name"]
+        cls.objects.bulk_create(summaries, **options)
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls, user_id):
+        cls.objects.filter(user_id=user_id).delete()
+        ExerciseNameTrigram.objects.filter(user_id=user_id).delete()
+        names = (
+            Exercise.objects.filter(user_id=user_id)
+            .values_list("name", flat=True)
+            .distinct()
+        )
+        cls.refresh_for(user_id, names)
+        ExerciseNameTrigram.index_names(
+            user_id,
+            CustomExerciseName.objects.filter(user_id=user_id).values_list(
+                "name", flat=True
+            ),
+        )
+        # Invalidates ETags and cached responses built from the old rows
+        DataVersion.bump(user_id)
+        invalidate_responses(user_id, "exercises")
+
+    def __str__(self):
+        return f"{self.name} - Summary"
+
+
+def trigrams(text):
+    """
+    The set of trigrams in text, built like PostgreSQL's pg_trgm: lowercased
+    words padded with two spaces in front and one behind, so word starts get
+    their own trigrams and short prefixes still match.
+    """
+    grams = set()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class ExerciseNameTrigram(models.Model):
+    """
+    Search index over the exercise names a user has performed or created. A
+    search only reads the rows for the query's trigrams, so it costs the same
+    however long the user's history is, unlike LIKE '%x%' over Exercise.
+    """
+
+    # Share of the query's trigrams a name needs to match, low enough for a
+    # typo or a short prefix to still find it
+    MIN_SIMILARITY = 0.5
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="exercise_name_trigrams",
+    )
+    trigram = models.CharField(max_length=3)
+    name = models.CharField(max_length=255)
+
+    class Meta:
+        unique_together = ["user", "trigram", "name"]
+
+    @classmethod
+    def index_names(cls, user_id, names):
+        names = set(names)
+        if not names:
+            return
+        indexed = set(
+            cls.objects.filter(user_id=user_id, name__in=names)
+            .values_list("name", flat=True)
+            .distinct()
+        )
+        # ignore_conflicts since MySQL's accent insensitive collation can treat
+        # two of a name's trigrams as duplicates
+        cls.objects.bulk_create(
+            [
+                cls(user_id=user_id, trigram=trigram, name=name)
+                for name in names - indexed
+                for trigram in trigrams(name)
+            ],
+            ignore_conflicts=True,
+        )
+
+    @classmethod
+    def unindex_names(cls, user_id, names):
+        """
+        Drops the given names from the index unless they are still performed
+        or saved as custom names.
+        """
+        cls.objects.filter(user_id=user_id, name__in=set(names)).exclude(
+            name__in=ExerciseSummary.objects.filter(user_id=user_id).values("name")
+        ).exclude(
+            name__in=CustomExerciseName.objects.filter(user_id=user_id).values("name")
+        ).delete()
+
+    @classmethod
+    def search(cls, user, query, performed_only=False, limit=None):
+        """
+        Names matching the query, best match first and most recently performed
+        first among equally good matches.
+        """
+        return list(cls.matching_names(user, query, performed_only, limit))
+
+    @classmethod
+    async def asearch(cls, user, query, performed_only=False, limit=None):
+        names = cls.matching_names(user, query, performed_only, limit)
+        return [name async for name in names]
+
+    @classmethod
+    def matching_names(cls, user, query, performed_only=False, limit=None):
+        """
+        search()'s names as a queryset.
+        """
+        grams = trigrams(query)
+        if not grams:
+            return cls.objects.none().values_list("name", flat=True)
+
+        last_performed = ExerciseSummary.objects.filter(
+            user=user, name=OuterRef("name")
+        ).values("last_performed")[:1]
+        matches = (
+            cls.objects.filter(user=user, trigram__in=grams)
+            .values("name")
+            .annotate(
+                matched=Count("trigram"),
+                last_performed=Subquery(last_performed),
+            )
+            .filter(matched__gte=math.ceil(len(grams) * cls.MIN_SIMILARITY))
+        )
+        if performed_only:
+            matches = matches.filter(last_performed__isnull=False)
+
+        names = matches.order_by(
+            "-matched", F("last_performed").desc(nulls_last=True), "name"
+        ).values_list("name", flat=True)
+        return names[:limit] if limit else names
+
+    def __str__(self):
+        return f"{self.name} - {self.trigram!r}"
+
+
 # --- Template Models ---
 
 
-class WorkoutTemplate(models.Model):
+class WorkoutTemplateVersion(models.Model):
+    """
+    Immutable snapshot of a template's exercises and sets. Templates point at
+    their current version and duplicates share it, an edit writes a new one.
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @classmethod
+    def create_with_exercises(cls, exercise_data):
+        version = cls.objects.create()
+        exercises = bulk_create_with_pks(
+            [
+                ExerciseTemplate(
+                    version=version,
+                    **{k: v for k, v in data.items() if k != "set_templates"},
+                )
+                for data in exercise_data
+            ],
+            created_rows=version.exercise_templates.all(),
+        )
+        SetTemplate.objects.bulk_create(
+            SetTemplate(exercise_template=exercise, **set_template_data)
+            for exercise, data in zip(exercises, exercise_data)
+            for set_template_data in data.get("set_templates", [])
+        )
+        return version
+
+    def delete_if_unused(self):
+        """
+        Deletes the version once no template or workout refers to it.
+        """
+        if not self.templates.exists() and not self.workouts.exists():
+            self.delete()
+
+    def __str__(self):
+        return f"Template version {self.pk}"
+
+
+class WorkoutTemplate(SyncedModel):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
     notes = models.TextField(blank=True)
+    current_version = models.ForeignKey(
+        WorkoutTemplateVersion,
+        related_name="templates",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "sync_version"]),
+        ]
+
+    @property
+    def exercise_templates(self):
+        if self.current_version_id is None:
+            return ExerciseTemplate.objects.none()
+        return self.current_version.exercise_templates
 
     @classmethod
     @transaction.atomic
     def create_with_exercises(cls, user, template_data):
         exercise_data = template_data.pop("exercise_templates")
-        template = cls.objects.create(user=user, **template_data)
-        for exercise_template_data in exercise_data:
-            set_data = exercise_template_data.pop("set_templates")
-            exercise = template.exercise_templates.create(**exercise_template_data)
-            for set_template_data in set_data:
-                exercise.set_templates.create(**set_template_data)
-        return template
+        version = WorkoutTemplateVersion.create_with_exercises(exercise_data)
+        return cls.objects.create(user=user, current_version=version, **template_data)
 
     @transaction.atomic
     def update_with_exercises(self, template_data):
         self.name = template_data.get("name", self.name)
         self.notes = template_data.get("notes", self.notes)
-        self.save()
 
+        previous_version = self.current_version
         if "exercise_templates" in template_data:
-            self.exercise_templates.all().delete()
-            exercise_data = template_data.get("exercise_templates", [])
-            for exercise_template_data in exercise_data:
-                set_data = exercise_template_data.pop("set_templates")
-                exercise = self.exercise_templates.create(**exercise_template_data)
-                for set_template_data in set_data:
-                    exercise.set_templates.create(**set_template_data)
+            self.current_version = WorkoutTemplateVersion.create_with_exercises(
+                template_data.get("exercise_templates", [])
+            )
+        self.save()
+
+        if previous_version and previous_version != self.current_version:
+            previous_version.delete_if_unused()
         return self
 
     @classmethod
@@ -235,33 +1157,23 @@ class WorkoutTemplate(models.Model):
         except cls.DoesNotExist:
             return None
 
-        template_data = {
-            "name": f"{template_to_duplicate.name} (Copy)",
-            "notes": template_to_duplicate.notes,
-            "exercise_templates": [],
-        }
-
-        for ex in template_to_duplicate.exercise_templates.all():
-            exercise_dict = model_to_dict(ex, exclude=["id", "workout_template"])
-            exercise_dict["set_templates"] = []
-
-            for s in ex.set_templates.all():
-                set_dict = model_to_dict(s, exclude=["id", "exercise_template"])
-                exercise_dict["set_templates"].append(set_dict)
-
-            template_data["exercise_templates"].append(exercise_dict)
-
-        new_template = cls.create_with_exercises(user=user, template_data=template_data)
-
-        return new_template
+        # The copy shares the version until one of them is edited
+        return cls.objects.create(
+            user=user,
+            name=f"{template_to_duplicate.name} (Copy)",
+            notes=template_to_duplicate.notes,
+            current_version_id=template_to_duplicate.current_version_id,
+        )
 
     def __str__(self):
         return f"{self.name} - Template"
 
 
 class ExerciseTemplate(models.Model):
-    workout_template = models.ForeignKey(
-        WorkoutTemplate, related_name="exercise_templates", on_delete=models.CASCADE
+    version = models.ForeignKey(
+        WorkoutTemplateVersion,
+        related_name="exercise_templates",
+        on_delete=models.CASCADE,
     )
     name = models.CharField(max_length=100)
     rest_period = models.DurationField()
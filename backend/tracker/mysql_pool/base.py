@@ -0,0 +1,69 @@
+"""
+django_prometheus' MySQL backend with a connection pool (db_pool.py), so that
+requests reuse connections rather than each paying for the TCP, TLS and
+authentication handshake of a new one. The pool is configured with
+OPTIONS["pool"], as Django's PostgreSQL pool is:
+
+    "OPTIONS": {
+        "pool": {"min_size": 1, "max_size": 4, "max_lifetime": 1800, "timeout": 10},
+    }
+
+CONN_MAX_AGE should be left at 0: closing the connection at the end of a
+request is what hands it back to the pool.
+"""
+
+import threading
+from functools import partial
+
+from django_prometheus.db.backends.mysql import base
+
+from ..db_pool import ConnectionPool
+
+# One pool per alias and server, shared by the connections of every thread
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop("pool", None)
+        return params
+
+    def get_pool(self, conn_params):
+        settings_dict = self.settings_dict
+        key = (
+            self.alias,
+            *(settings_dict[name] for name in ("HOST", "PORT", "NAME", "USER")),
+        )
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(
+                    connect=partial(super().get_new_connection, conn_params),
+                    check=lambda connection: connection.ping(),
+                    close=lambda connection: connection.close(),
+                    alias=self.alias,
+                    **settings_dict["OPTIONS"].get("pool", {}),
+                )
+        return pool
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        connection, self.reused_connection = self.pool.acquire()
+        return connection
+
+    def init_connection_state(self):
+        # Every connection of a pool gets the same session settings, which a
+        # reused connection still has
+        if not self.reused_connection:
+            super().init_connection_state()
+
+    def _close(self):
+        # A connection closed in a transaction, after an error or with
+        # autocommit turned off would carry that state over to its next user
+        reusable = not (
+            self.in_atomic_block or self.errors_occurred or not self.autocommit
+        )
+        with self.wrap_database_errors:
+            self.pool.release(self.connection, reusable)
@@ -0,0 +1,132 @@
+"""
+Delivery of OutboxMessages, run by the drain_outbox command.
+
+Messages are claimed in batches and delivered through one client per service,
+created on first use and reused for every later message. A failed message is
+retried with exponential backoff and dead-lettered (dead_at set) after
+max_attempts, keeping its last error for whoever looks into it. Each message's
+lease is renewed just before its call, so the lease only has to outlast one
+call (the client's timeout), not a whole batch of them. Delivery is at
+least once: a worker that dies after a call but before deleting the message
+leaves it to be made again, so every handler must be safe to repeat.
+"""
+
+import logging
+from collections import Counter as Outcomes
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from prometheus_client import Counter
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+outbox_deliveries = Counter(
+    "tracker_outbox_deliveries_total",
+    "Outbox message delivery attempts, by kind and outcome.",
+    ["kind", "result"],
+)
+
+
+def create_client(supabase_url, supabase_key):
+    """
+    supabase.create_client, imported on first use: the supabase package pulls
+    in httpx, pydantic and the realtime and storage clients, roughly half a
+    second of boot that only this worker needs.
+    """
+    from supabase import create_client
+
+    return create_client(supabase_url, supabase_key)
+
+
+def backoff(attempts, base_delay, max_delay):
+    """
+    Seconds to wait before retrying a message that has failed attempts times.
+    """
+    return min(base_delay * 2 ** (attempts - 1), max_delay)
+
+
+class OutboxWorker:
+    def __init__(
+        self,
+        supabase=None,
+        max_attempts=8,
+        base_delay=30,
+        max_delay=3600,
+        lease=300,
+    ):
+        self._supabase = supabase
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lease = timedelta(seconds=lease)
+        self.handlers = {
+            OutboxMessage.DELETE_SUPABASE_USER: self.delete_supabase_user,
+        }
+
+    @property
+    def supabase(self):
+        if self._supabase is None:
+            self._supabase = create_client(
+                settings.SUPABASE_URL, settings.SUPABASE_SECRET_KEY
+            )
+        return self._supabase
+
+    def delete_supabase_user(self, payload):
+        try:
+            self.supabase.auth.admin.delete_user(payload["supabase_id"])
+        except Exception as e:
+            # Already deleted, e.g. by an attempt whose message outlived it
+            if getattr(e, "status", None) != 404:
+                raise
+
+    def drain(self, batch_size=100):
+        """
+        Delivers up to batch_size due messages. Returns how many were
+        "delivered", "retried" and "dead" (dead-lettered).
+        """
+        outcomes = Outcomes()
+        for message in OutboxMessage.claim(batch_size, self.lease):
+            # The calls before this one may have taken most of the lease
+            if not message.renew(self.lease):
+                logger.info(
+                    f"Outbox message {message.pk} was claimed by another worker"
+                )
+                continue
+            try:
+                self.handlers[message.kind](message.payload)
+            except Exception as e:
+                result = self.failed(message, e)
+            else:
+                # Straight away, as its lease may run out during later calls
+                OutboxMessage.objects.filter(pk=message.pk).delete()
+                result = "delivered"
+            outcomes[result] += 1
+            outbox_deliveries.labels(kind=message.kind, result=result).inc()
+        return outcomes
+
+    def failed(self, message, error):
+        now = timezone.now()
+        message.attempts += 1
+        message.last_error = f"{type(error).__name__}: {error}"
+        if message.attempts >= self.max_attempts:
+            message.dead_at = now
+            result = "dead"
+            logger.error(
+                f"Outbox message {message.pk} ({message.kind}) failed "
+                f"{message.attempts} times, giving up: {error}"
+            )
+        else:
+            delay = backoff(message.attempts, self.base_delay, self.max_delay)
+            message.available_at = now + timedelta(seconds=delay)
+            result = "retried"
+            logger.warning(
+                f"Outbox message {message.pk} ({message.kind}) failed, "
+                f"retrying in {delay}s: {error}"
+            )
+        message.save(
+            update_fields=["attempts", "last_error", "available_at", "dead_at"]
+        )
+        return result
@@ -0,0 +1,39 @@
+"""
+Response renderers. JSON is rendered with orjson, which is several times
+faster than the json module DRF uses, mostly on the many floats and datetimes
+of set-heavy responses. MessagePack is available to clients that ask for it
+with Accept: application/msgpack.
+"""
+
+import msgpack
+import orjson
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+# Types neither orjson nor MessagePack handle (Decimal, lazy strings, ...) are
+# converted like DRF's JSON renderer does
+encoder = JSONEncoder()
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        # Indented output (e.g. in the browsable API) is left to DRF
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=encoder.default, option=ORJSON_OPTIONS)
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=encoder.default, datetime=False)
@@ -0,0 +1,218 @@
+"""
+Per-user cache of read endpoint responses.
+
+Responses are cached under a scope (e.g. "exercises", or "template:12" for a
+single template) together with the scope's current generation, the URL and the
+Accept header. Writes invalidate a scope by giving it a new generation (see
+signals.py), which strands its old entries until the cache evicts them. The
+scope's hit ratio is exported as tracker_response_cache_requests_total.
+
+The Redis cache ignores connection errors, so an invalidation can fail
+without raising, and the old entries would be served again once Redis is
+back. Failed invalidations are logged and retried before their scope is next
+read in this process, and until one succeeds the scope bypasses the cache.
+"""
+
+import hashlib
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from prometheus_client import Counter
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+response_cache_requests = Counter(
+    "tracker_response_cache_requests_total",
+    "Requests to cached read endpoints, by scope and cache result.",
+    ["scope", "result"],
+)
+
+# (user id, scope) pairs whose last invalidation failed
+_failed_invalidations = set()
+_failed_invalidations_lock = threading.Lock()
+
+# The (user id, scope) pairs invalidated inside track_invalidations()
+_tracked_invalidations = ContextVar("tracked_invalidations", default=None)
+
+
+def generation_key(user_id, scope):
+    return f"tracker:generation:{user_id}:{scope}"
+
+
+def new_generations(user_id, scopes):
+    return {generation_key(user_id, scope): time.time_ns() for scope in scopes}
+
+
+def record_invalidations(user_id, scopes, generations, stored):
+    """
+    Records which of the scopes' new generations were stored, reading them
+    back being the only way to tell when the cache ignores errors. Returns
+    whether all were. A generation that a concurrent invalidation replaced
+    counts as failed too, which only costs a retry.
+    """
+    keys = {scope: generation_key(user_id, scope) for scope in scopes}
+    failed = {
+        (user_id, scope)
+        for scope, key in keys.items()
+        if stored.get(key) != generations[key]
+    }
+    with _failed_invalidations_lock:
+        _failed_invalidations.difference_update((user_id, scope) for scope in scopes)
+        _failed_invalidations.update(failed)
+    if failed:
+        logger.error(
+            f"Could not invalidate cached responses of user {user_id} "
+            f"({', '.join(scope for _, scope in sorted(failed))}), bypassing "
+            f"the cache for them until it can"
+        )
+    return not failed
+
+
+def store_generations(user_id, scopes):
+    generations = new_generations(user_id, scopes)
+    cache.set_many(generations, timeout=None)
+    stored = cache.get_many(list(generations))
+    return record_invalidations(user_id, scopes, generations, stored)
+
+
+async def astore_generations(user_id, scopes):
+    generations = new_generations(user_id, scopes)
+    await cache.aset_many(generations, timeout=None)
+    stored = await cache.aget_many(list(generations))
+    return record_invalidations(user_id, scopes, generations, stored)
+
+
+def get_generation(user_id, scope):
+    """
+    The scope's current generation, or None if the cache can't be used for
+    it, e.g. because its invalidation failed and still does.
+    """
+    if (user_id, scope) in _failed_invalidations and not store_generations(
+        user_id, [scope]
+    ):
+        return None
+    key = generation_key(user_id, scope)
+    generation = cache.get(key)
+    if generation is None:
+        # Never reuses a generation, even when this key had been evicted
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+async def aget_generation(user_id, scope):
+    if (user_id, scope) in _failed_invalidations and not await astore_generations(
+        user_id, [scope]
+    ):
+        return None
+    key = generation_key(user_id, scope)
+    generation = await cache.aget(key)
+    if generation is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        generation = await cache.aget(key)
+    return generation
+
+
+def invalidate(user_id, *scopes):
+    def invalidate_scopes():
+        store_generations(user_id, scopes)
+
+    tracked = _tracked_invalidations.get()
+    if tracked is not None:
+        tracked.update((user_id, scope) for scope in scopes)
+    invalidate_scopes()
+    # Again on commit, as a concurrent request may have cached the data as it
+    # was before this transaction in the meantime
+    transaction.on_commit(invalidate_scopes)
+
+
+@contextmanager
+def track_invalidations():
+    """
+    Collects the (user id, scope) pairs invalidated inside the block into the
+    set it yields, e.g. to invalidate them again after a rollback, which
+    leaves the generations set in the meantime and the entries cached under
+    them behind.
+    """
+    tracked = set()
+    token = _tracked_invalidations.set(tracked)
+    try:
+        yield tracked
+    finally:
+        _tracked_invalidations.reset(token)
+
+
+def response_key(request, scope, generation):
+    url = f"{request.get_full_path()}:{request.META.get('HTTP_ACCEPT', '')}"
+    digest = hashlib.sha256(url.encode()).hexdigest()
+    return f"tracker:response:{request.user.pk}:{scope}:{generation}:{digest}"
+
+
+def cache_response(scope):
+    """
+    Caches a view method's 200 responses. scope is a name or a function of the
+    view method's arguments returning one. Async view methods (see
+    async_views.py) return their data rather than a response, and the data is
+    what is cached.
+    """
+
+    def decorator(view_method):
+        if inspect.iscoroutinefunction(view_method):
+            return async_wrapper(view_method)
+
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            name = scope(*args, **kwargs) if callable(scope) else scope
+            metric_name = name.split(":")[0]
+            generation = get_generation(request.user.pk, name)
+            if generation is None:
+                response_cache_requests.labels(metric_name, "bypass").inc()
+                return view_method(self, request, *args, **kwargs)
+            key = response_key(request, name, generation)
+
+            cached = cache.get(key)
+            if cached is not None:
+                response_cache_requests.labels(metric_name, "hit").inc()
+                return Response(cached["data"])
+
+            response_cache_requests.labels(metric_name, "miss").inc()
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, {"data": response.data})
+            return response
+
+        return wrapper
+
+    def async_wrapper(view_method):
+        @wraps(view_method)
+        async def wrapper(self, request, *args, **kwargs):
+            name = scope(*args, **kwargs) if callable(scope) else scope
+            metric_name = name.split(":")[0]
+            generation = await aget_generation(request.user.pk, name)
+            if generation is None:
+                response_cache_requests.labels(metric_name, "bypass").inc()
+                return await view_method(self, request, *args, **kwargs)
+            key = response_key(request, name, generation)
+
+            cached = await cache.aget(key)
+            if cached is not None:
+                response_cache_requests.labels(metric_name, "hit").inc()
+                return cached["data"]
+
+            response_cache_requests.labels(metric_name, "miss").inc()
+            data = await view_method(self, request, *args, **kwargs)
+            await cache.aset(key, {"data": data})
+            return data
+
+        return wrapper
+
+    return decorator
@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import *
 from django.utils import timezone
@@ -46,8 +47,25 @@ class ExerciseGoalSerializer(serializers.ModelSerializer):
         return ExerciseGoal.objects.create(user=user, **validated_data)
 
 
+class ExerciseSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExerciseSummary
+        fields = [
+            "id",
+            "name",
+            "last_performed",
+            "session_count",
+            "best_weight",
+            "best_one_rep_max",
+            "total_volume",
+        ]
+
+
 # --- Workout Serializers ---
 class SetSerializer(serializers.ModelSerializer):
+    # Writable so that updates can be matched to existing sets
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = Set
         fields = ["id", "reps", "min_reps", "max_reps", "weight", "notes"]
@@ -58,9 +76,10 @@ class SetSerializer(serializers.ModelSerializer):
 
 
 class ExerciseSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False)
     sets = SetSerializer(many=True)
-    date = serializers.DateTimeField(source="workout.date", read_only=True)
-    workout_id = serializers.ReadOnlyField(source="workout.id")
+    date = serializers.DateTimeField(read_only=True)
+    workout_id = serializers.ReadOnlyField()
 
     class Meta:
         model = Exercise
@@ -114,6 +133,47 @@ class WorkoutListSerializer(serializers.HyperlinkedModelSerializer):
         }
 
 
+class WorkoutIngestSerializer(serializers.ModelSerializer):
+    client_key = serializers.CharField(max_length=64)
+    template = serializers.IntegerField(required=False, allow_null=True)
+    exercises = ExerciseSerializer(many=True, required=False)
+
+    class Meta:
+        model = Workout
+        fields = ("client_key", "name", "date", "notes", "template", "exercises")
+
+
+class WorkoutIngestBatchSerializer(serializers.Serializer):
+    workouts = WorkoutIngestSerializer(many=True, allow_empty=False)
+
+    def validate_workouts(self, value):
+        if len(value) > settings.INGEST_MAX_WORKOUTS:
+            raise serializers.ValidationError(
+                f"At most {settings.INGEST_MAX_WORKOUTS} workouts can be sent at once."
+            )
+        keys = [workout["client_key"] for workout in value]
+        if len(set(keys)) != len(keys):
+            raise serializers.ValidationError("Client keys must be unique.")
+
+        # Check every template in one query
+        template_ids = {workout.get("template") for workout in value} - {None}
+        versions = dict(
+            WorkoutTemplate.objects.filter(
+                user=self.context["request"].user, pk__in=template_ids
+            ).values_list("pk", "current_version_id")
+        )
+        if template_ids - versions.keys():
+            raise serializers.ValidationError(
+                "You do not have permission to use this template."
+            )
+        for workout in value:
+            template_id = workout.pop("template", None)
+            if template_id is not None:
+                workout["template_id"] = template_id
+                workout["template_version_id"] = versions[template_id]
+        return value
+
+
 # --- Template Serializers ---
 class SetTemplateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -152,3 +212,30 @@ class WorkoutTemplateSerializer(serializers.HyperlinkedModelSerializer):
 
     def update(self, instance, validated_data):
         return instance.update_with_exercises(template_data=validated_data)
+
+
+class WorkoutTemplateListSerializer(serializers.HyperlinkedModelSerializer):
+    user = serializers.ReadOnlyField(source="user.username")
+
+    class Meta:
+        model = WorkoutTemplate
+        fields = ["url", "id", "user", "name", "notes"]
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False)
+    headers = serializers.DictField(child=serializers.CharField(), required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchOperationSerializer(many=True, allow_empty=False)
+    atomic = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f"A batch can hold at most {settings.BATCH_MAX_REQUESTS} requests."
+            )
+        return value
@@ -0,0 +1,206 @@
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from .authentication import cached_users
+from .response_cache import invalidate
+from .models import (
+    CustomExerciseName,
+    DataVersion,
+    ExerciseGoal,
+    Exercise,
+    ExerciseNameTrigram,
+    ExerciseSummary,
+    Set,
+    Tombstone,
+    Workout,
+    WorkoutTemplate,
+    WorkoutTemplateVersion,
+)
+
+
+def deleted_by(origin, model):
+    """
+    Whether a delete started from an instance or queryset of model.
+    """
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(origin_model, model)
+
+
+@receiver([post_save, post_delete], sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs):
+    if instance.supabase_id:
+        cached_users.delete(instance.supabase_id)
+
+
+@receiver(post_delete, sender=WorkoutTemplate)
+@receiver(post_delete, sender=Workout)
+def delete_unused_template_version(sender, instance, **kwargs):
+    version_id = (
+        instance.current_version_id
+        if sender is WorkoutTemplate
+        else instance.template_version_id
+    )
+    if version_id is None:
+        return
+    version = WorkoutTemplateVersion.objects.filter(pk=version_id).first()
+    if version:
+        version.delete_if_unused()
+
+
+# Names whose summaries are due a refresh when this thread's transaction
+# commits, by user id
+_pending_summaries = threading.local()
+
+
+def refresh_summary_on_commit(user_id, name):
+    """
+    Refreshes the summary of an exercise name once the transaction commits,
+    once however many of its rows are saved in the transaction.
+    """
+    pending = getattr(_pending_summaries, "names", None)
+    if pending is None:
+        pending = _pending_summaries.names = defaultdict(set)
+    pending[user_id].add(name)
+    # Every write registers the flush, so that one survives a rolled back
+    # savepoint. The first to run refreshes everything, the rest find nothing.
+    transaction.on_commit(flush_pending_summaries)
+
+
+def flush_pending_summaries():
+    pending = getattr(_pending_summaries, "names", None)
+    _pending_summaries.names = None
+    for user_id, names in (pending or {}).items():
+        # Reads between the commit and here got the old summaries, under the
+        # ETag and cache generation of the commit, so this is a write too
+        with transaction.atomic():
+            ExerciseSummary.refresh_for(user_id, names)
+            DataVersion.bump(user_id)
+            invalidate(user_id, "exercises")
+
+
+# Bulk write paths and Workout.delete() refresh summaries themselves, these
+# cover single row writes
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def refresh_exercise_summary(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and (origin is None or origin is instance):
+        refresh_summary_on_commit(instance.user_id, instance.name)
+
+
+@receiver(post_save, sender=Set)
+@receiver(post_delete, sender=Set)
+def refresh_set_exercise_summary(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and (origin is None or origin is instance):
+        exercise = instance.exercise
+        refresh_summary_on_commit(exercise.user_id, exercise.name)
+
+
+@receiver(pre_save, sender=CustomExerciseName)
+def remember_custom_exercise_name(sender, instance, raw=False, **kwargs):
+    instance._previous_name = None
+    if instance.pk and not raw:
+        instance._previous_name = (
+            sender.objects.filter(pk=instance.pk).values_list("name", flat=True).first()
+        )
+
+
+@receiver(post_save, sender=CustomExerciseName)
+def index_custom_exercise_name(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ExerciseNameTrigram.index_names(instance.user_id, [instance.name])
+    previous_name = getattr(instance, "_previous_name", None)
+    if previous_name and previous_name != instance.name:
+        ExerciseNameTrigram.unindex_names(instance.user_id, [previous_name])
+
+
+@receiver(post_delete, sender=CustomExerciseName)
+def unindex_custom_exercise_name(sender, instance, **kwargs):
+    ExerciseNameTrigram.unindex_names(instance.user_id, [instance.name])
+
+
+@receiver(post_delete, sender=WorkoutTemplate)
+@receiver(post_delete, sender=Workout)
+def record_tombstone(sender, instance, origin=None, **kwargs):
+    # Nobody is left to sync when the whole account is deleted
+    if not deleted_by(origin, get_user_model()):
+        Tombstone.record(instance)
+
+
+@receiver(pre_delete, sender=WorkoutTemplate)
+def touch_template_workouts(sender, instance, origin=None, **kwargs):
+    # Deleting the template sets their template to NULL, which clients have to
+    # sync like any other change
+    if not deleted_by(origin, get_user_model()):
+        Workout.touch_many(
+            Workout.objects.filter(template=instance).values_list("pk", flat=True),
+            instance.user_id,
+        )
+
+
+# Only single row writes, the bulk paths in Workout save the workout themselves
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def touch_exercise_workout(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and (origin is None or origin is instance):
+        Workout.touch(instance.workout_id, instance.user_id)
+
+
+@receiver(post_save, sender=Set)
+@receiver(post_delete, sender=Set)
+def touch_set_workout(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and (origin is None or origin is instance):
+        exercise = instance.exercise
+        Workout.touch(exercise.workout_id, exercise.user_id)
+
+
+@receiver([post_save, post_delete], sender=CustomExerciseName)
+@receiver([post_save, post_delete], sender=ExerciseGoal)
+def bump_data_version(sender, instance, raw=False, origin=None, **kwargs):
+    # Workouts and templates bump it in SyncedModel.save()
+    if not raw and not deleted_by(origin, get_user_model()):
+        DataVersion.bump(instance.user_id)
+
+
+# Response cache scopes, see response_cache.py
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def start_response_cache(sender, instance, created, raw=False, **kwargs):
+    # Strands anything left cached under a reused user id
+    if created and not raw:
+        invalidate(instance.pk, "exercises", "templates", "goals")
+
+
+@receiver([post_save, post_delete], sender=Workout)
+@receiver([post_save, post_delete], sender=Exercise)
+def invalidate_exercise_responses(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or deleted_by(origin, get_user_model()):
+        return
+    # Cascades from a workout are covered by the workout
+    if sender is Workout or origin is None or origin is instance:
+        invalidate(instance.user_id, "exercises")
+
+
+@receiver([post_save, post_delete], sender=Set)
+def invalidate_set_responses(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and (origin is None or origin is instance):
+        invalidate(instance.exercise.user_id, "exercises")
+
+
+@receiver([post_save, post_delete], sender=WorkoutTemplate)
+def invalidate_template_responses(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and not deleted_by(origin, get_user_model()):
+        invalidate(instance.user_id, "templates", f"template:{instance.pk}")
+
+
+@receiver([post_save, post_delete], sender=ExerciseGoal)
+def invalidate_goal_responses(sender, instance, raw=False, origin=None, **kwargs):
+    if not raw and not deleted_by(origin, get_user_model()):
+        invalidate(instance.user_id, "goals")
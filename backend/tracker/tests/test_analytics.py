@@ -0,0 +1,114 @@
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from tracker.analytics import predict_goals
+from tracker.models import Exercise, ExerciseGoal, Set, Workout
+
+User = get_user_model()
+
+UTC = dt_timezone.utc
+
+
+def daily_series(values, start=date(2025, 1, 1)):
+    return [(start + timedelta(days=i), value) for i, value in enumerate(values)]
+
+
+class GoalPredictionTests(APITestCase):
+    def setUp(self):
+        # Half way through the fourth day of the series
+        self.now = datetime(2025, 1, 4, 12, tzinfo=UTC)
+
+    def predict(self, goal_weight, values):
+        goal = ExerciseGoal(id=1, exercise_name="Squat", goal_weight=goal_weight)
+        series = {"Squat": daily_series(values)} if values else {}
+        return predict_goals([goal], series, self.now, UTC)[0]
+
+    def test_linear_progress_is_predicted(self):
+        result = self.predict(120, [100, 102, 104, 106])
+        self.assertEqual(result["recommended_model"], "linear")
+        self.assertEqual(result["models"]["linear"]["equation"], [2, 98])
+        self.assertEqual(result["models"]["linear"]["r2"], 1)
+        # 98 + 2x = 120 on day 11, seven days after day 4
+        self.assertEqual(result["status"], "PREDICTED")
+        self.assertEqual(result["days_remaining"], 7)
+
+    def test_declining_progress_has_plateaued(self):
+        result = self.predict(120, [110, 108, 105, 104])
+        self.assertEqual(result["models"]["linear"]["status"], "PLATEAUED")
+        self.assertEqual(result["models"]["logarithmic"]["status"], "PLATEAUED")
+
+    def test_goal_beyond_cap_is_out_of_bounds(self):
+        result = self.predict(500, [100, 102, 104, 106])
+        self.assertEqual(result["models"]["linear"]["status"], "OUT_OF_BOUNDS")
+
+    def test_achieved_and_insufficient_data(self):
+        self.assertEqual(self.predict(100, [90, 101])["status"], "ACHIEVED")
+        self.assertEqual(self.predict(100, [90])["status"], "INSUFFICIENT_DATA")
+        self.assertEqual(self.predict(100, [])["status"], "INSUFFICIENT_DATA")
+        self.assertIsNone(self.predict(0, [90, 95])["status"])
+
+    def test_flat_progress_matches_app_fallback(self):
+        # R² is NaN for both models, which the app resolves to logarithmic
+        result = self.predict(120, [100, 100, 100])
+        self.assertEqual(result["recommended_model"], "logarithmic")
+        self.assertIsNone(result["models"]["linear"]["r2"])
+        self.assertEqual(result["status"], "PLATEAUED")
+
+    def test_many_goals_are_fitted_together(self):
+        goals = [
+            ExerciseGoal(id=1, exercise_name="Squat", goal_weight=120),
+            ExerciseGoal(id=2, exercise_name="Bench Press", goal_weight=80),
+        ]
+        series = {
+            "Squat": daily_series([100, 102, 104, 106]),
+            "Bench Press": daily_series([60, 61, 62, 63, 64, 65]),
+        }
+        results = predict_goals(goals, series, self.now, UTC)
+        self.assertEqual(results[0]["days_remaining"], 7)
+        self.assertEqual(results[1]["models"]["linear"]["equation"], [1, 59])
+
+
+class GoalPredictionAPITests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_predictions_for_all_goals_in_one_call(self):
+        names = ["Squat", "Bench Press", "Deadlift"]
+        for days_ago in range(6, 0, -1):
+            workout = Workout.objects.create(
+                user=self.user,
+                name="Full Body",
+                date=timezone.now() - timedelta(days=days_ago),
+            )
+            for name in names:
+                exercise = Exercise.objects.create(
+                    workout=workout, name=name, rest_period=timedelta(seconds=90)
+                )
+                Set.objects.create(
+                    exercise=exercise,
+                    reps=5,
+                    min_reps=5,
+                    max_reps=5,
+                    weight=100 - days_ago * 2,
+                )
+        for name in names:
+            ExerciseGoal.objects.create(
+                user=self.user, exercise_name=name, goal_weight=150
+            )
+
+        url = reverse("exercisegoal-predictions")
+        # Goals, then every goal's daily maxes
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+        for result in response.data:
+            self.assertEqual(result["recommended_model"], "linear")
+            self.assertEqual(result["status"], "PREDICTED")
@@ -1,10 +1,21 @@
+import csv
+import io
+import json
+import warnings
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+
 from rest_framework.test import APITestCase
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 from django.utils.dateparse import parse_datetime
+from prometheus_client import REGISTRY
+from tracker import response_cache
 from tracker.models import (
     Workout,
     WorkoutTemplate,
@@ -12,6 +23,8 @@ from tracker.models import (
     Set,
     ExerciseGoal,
     CustomExerciseName,
+    DataVersion,
+    ExerciseSummary,
 )
 
 User = get_user_model()
@@ -24,19 +37,21 @@ class ProgressAndHistoryTests(APITestCase):
         )
         self.client.force_authenticate(user=self.user)
 
-        date1 = timezone.now() - timedelta(days=14)
-        self.w1 = Workout.objects.create(user=self.user, name="Back", date=date1)
-        e1 = Exercise.objects.create(
-            workout=self.w1, name="Deadlift", rest_period=timedelta(seconds=120)
-        )
-        Set.objects.create(exercise=e1, reps=5, min_reps=5, max_reps=5, weight=140)
+        # Summaries are refreshed on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            date1 = timezone.now() - timedelta(days=14)
+            self.w1 = Workout.objects.create(user=self.user, name="Back", date=date1)
+            e1 = Exercise.objects.create(
+                workout=self.w1, name="Deadlift", rest_period=timedelta(seconds=120)
+            )
+            Set.objects.create(exercise=e1, reps=5, min_reps=5, max_reps=5, weight=140)
 
-        date2 = timezone.now() - timedelta(days=7)
-        self.w2 = Workout.objects.create(user=self.user, name="Back", date=date2)
-        e2 = Exercise.objects.create(
-            workout=self.w2, name="Deadlift", rest_period=timedelta(seconds=120)
-        )
-        Set.objects.create(exercise=e2, reps=5, min_reps=5, max_reps=5, weight=145)
+            date2 = timezone.now() - timedelta(days=7)
+            self.w2 = Workout.objects.create(user=self.user, name="Back", date=date2)
+            e2 = Exercise.objects.create(
+                workout=self.w2, name="Deadlift", rest_period=timedelta(seconds=120)
+            )
+            Set.objects.create(exercise=e2, reps=5, min_reps=5, max_reps=5, weight=145)
 
         self.current_date = timezone.now()
         self.current_workout = Workout.objects.create(
@@ -57,13 +72,37 @@ class ProgressAndHistoryTests(APITestCase):
         response = self.client.get(url, {"name": "Deadlift"})
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
-    def test_exercise_directory_search(self):
-        w3 = Workout.objects.create(
-            user=self.user, name="Chest", date=self.current_date - timedelta(days=1)
-        )
-        Exercise.objects.create(
-            workout=w3, name="Dumbbell Press", rest_period=timedelta(seconds=60)
+    def test_getting_last_performances(self):
+        for name in ["Deadlift", "Pull Up"]:
+            Exercise.objects.create(
+                workout=self.current_workout,
+                name=name,
+                rest_period=timedelta(seconds=120),
+            )
+        url = reverse("exercise-last-performances")
+
+        response = self.client.get(url, {"workout_id": self.current_workout.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data), ["Deadlift"])
+        self.assertEqual(
+            parse_datetime(response.data["Deadlift"]["date"]), self.w2.date
         )
+        self.assertEqual(response.data["Deadlift"]["sets"][0]["weight"], 145)
+
+        response = self.client.get(url, {"workout_id": self.w1.id})
+        self.assertEqual(response.data, {})
+
+        response = self.client.get(url, {"workout_id": "nope"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_exercise_directory_search(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            w3 = Workout.objects.create(
+                user=self.user, name="Chest", date=self.current_date - timedelta(days=1)
+            )
+            Exercise.objects.create(
+                workout=w3, name="Dumbbell Press", rest_period=timedelta(seconds=60)
+            )
         url = reverse("exercise-directory")
 
         response_all = self.client.get(url)
@@ -75,6 +114,67 @@ class ProgressAndHistoryTests(APITestCase):
         self.assertEqual(len(response_search.data), 1)
         self.assertEqual(response_search.data[0], "Dumbbell Press")
 
+    def test_exercise_search(self):
+        CustomExerciseName.objects.create(user=self.user, name="Deficit Deadlift")
+        url = reverse("exercise-search")
+
+        response = self.client.get(url, {"q": "dedlift"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, ["Deadlift", "Deficit Deadlift"])
+
+        response = self.client.get(url, {"q": "dead", "limit": "nope"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_exercise_summaries(self):
+        url = reverse("exercisesummary-list")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response.data[0]["name"], "Deadlift")
+        self.assertEqual(response.data[0]["session_count"], 2)
+        self.assertEqual(response.data[0]["best_weight"], 145)
+
+    def test_one_rep_max_series(self):
+        e2 = self.w2.exercises.get()
+        Set.objects.create(exercise=e2, reps=3, min_reps=3, max_reps=5, weight=150)
+
+        url = reverse("exercise-one-rep-max-series")
+        response = self.client.get(url, {"exercise_name": "Deadlift"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["dates"],
+            [
+                self.w1.date.astimezone(dt_timezone.utc).date().isoformat(),
+                self.w2.date.astimezone(dt_timezone.utc).date().isoformat(),
+            ],
+        )
+        self.assertEqual(response.data["max_weight"], [140, 150])
+        # Brzycki, rounded down: 145 * 36 / 32 beats 150 * 36 / 34
+        self.assertEqual(response.data["max_one_rep_max"], [157, 163])
+        self.assertEqual(response.data["volume"], [700, 5 * 145 + 3 * 150])
+
+    def test_one_rep_max_series_buckets_days_in_time_zone(self):
+        workout = Workout.objects.create(
+            user=self.user,
+            name="Late Session",
+            date=datetime(2025, 6, 1, 23, 30, tzinfo=dt_timezone.utc),
+        )
+        exercise = Exercise.objects.create(
+            workout=workout, name="Curl", rest_period=timedelta(seconds=60)
+        )
+        Set.objects.create(
+            exercise=exercise, reps=10, min_reps=8, max_reps=12, weight=20
+        )
+
+        url = reverse("exercise-one-rep-max-series")
+        utc = self.client.get(url, {"exercise_name": "Curl"})
+        berlin = self.client.get(url, {"exercise_name": "Curl", "tz": "Europe/Berlin"})
+        self.assertEqual(utc.data["dates"], ["2025-06-01"])
+        self.assertEqual(berlin.data["dates"], ["2025-06-02"])
+
+        invalid = self.client.get(url, {"exercise_name": "Curl", "tz": "Mars/Base"})
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_single_exercise_history(self):
         e_null = Exercise.objects.create(
             workout=self.current_workout,
@@ -211,6 +311,780 @@ class WorkoutViewSetTests(APITestCase):
         # Make sure exercises are not included
         self.assertNotIn("exercises", response.data[0])
 
+    def test_update_workout_keeps_exercise_and_set_ids(self):
+        workout = Workout.objects.create(
+            user=self.user, name="Push", date=timezone.now()
+        )
+        exercise = Exercise.objects.create(
+            workout=workout, name="Bench Press", rest_period=timedelta(seconds=90)
+        )
+        set_obj = Set.objects.create(exercise=exercise, min_reps=8, max_reps=10)
+
+        url = reverse("workout-detail", args=[workout.id])
+        data = self.client.get(url).data
+        data["exercises"][0]["sets"][0]["reps"] = 9
+        data["exercises"][0]["sets"][0]["weight"] = 60
+        response = self.client.put(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["exercises"][0]["id"], exercise.id)
+        self.assertEqual(response.data["exercises"][0]["sets"][0]["id"], set_obj.id)
+        self.assertEqual(response.data["exercises"][0]["sets"][0]["reps"], 9)
+
+
+class SyncTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword", email="user@user.com"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.template = WorkoutTemplate.create_with_exercises(
+            user=self.user,
+            template_data={"name": "Push", "exercise_templates": []},
+        )
+        self.workouts = [
+            Workout.objects.create(
+                user=self.user, name=f"Session {i}", date=timezone.now()
+            )
+            for i in range(3)
+        ]
+
+    def sync(self, **params):
+        response = self.client.get(reverse("sync"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_first_sync_returns_everything(self):
+        data = self.sync()
+        self.assertEqual(
+            [w["id"] for w in data["workouts"]], [w.id for w in self.workouts]
+        )
+        self.assertEqual(
+            [t["id"] for t in data["workout_templates"]], [self.template.id]
+        )
+        self.assertFalse(data["has_more"])
+        self.assertEqual(self.sync(since=data["cursor"])["workouts"], [])
+
+    def test_only_changes_since_cursor_are_returned(self):
+        cursor = self.sync()["cursor"]
+        edited, deleted, _ = self.workouts
+        exercise = Exercise.objects.create(
+            workout=edited, name="Bench Press", rest_period=timedelta(seconds=90)
+        )
+        deleted_id = deleted.id
+        deleted.delete()
+
+        data = self.sync(since=cursor)
+        self.assertEqual([w["id"] for w in data["workouts"]], [edited.id])
+        self.assertEqual(data["workouts"][0]["exercises"][0]["id"], exercise.id)
+        self.assertEqual(data["workout_templates"], [])
+        self.assertEqual(
+            data["deleted"], {"workouts": [deleted_id], "workout_templates": []}
+        )
+
+        cursor = data["cursor"]
+        Set.objects.create(exercise=exercise, min_reps=8, max_reps=10)
+        self.template.update_with_exercises({"name": "Push A"})
+        data = self.sync(since=cursor)
+        self.assertEqual([w["id"] for w in data["workouts"]], [edited.id])
+        self.assertEqual(data["workout_templates"][0]["name"], "Push A")
+
+    def test_deleting_a_template_syncs_its_workouts(self):
+        started = [
+            Workout.create_from_template(
+                user=self.user, template=self.template, date=timezone.now()
+            )
+            for _ in range(2)
+        ]
+        cursor = self.sync()["cursor"]
+        template_id = self.template.id
+        self.template.delete()
+
+        data = self.sync(since=cursor)
+        self.assertEqual(
+            sorted(w["id"] for w in data["workouts"]), [w.id for w in started]
+        )
+        self.assertEqual([w["template"] for w in data["workouts"]], [None, None])
+        self.assertEqual(data["deleted"]["workout_templates"], [template_id])
+        versions = Workout.objects.filter(pk__in=[w.id for w in started])
+        self.assertEqual(len({w.sync_version for w in versions}), 2)
+
+    def test_paging(self):
+        synced = []
+        cursor = 0
+        while True:
+            data = self.sync(since=cursor, limit=2)
+            synced += [w["id"] for w in data["workouts"]]
+            synced += [t["id"] for t in data["workout_templates"]]
+            cursor = data["cursor"]
+            if not data["has_more"]:
+                break
+        self.assertEqual(
+            sorted(synced), sorted([self.template.id] + [w.id for w in self.workouts])
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("sync"), {"since": "yesterday"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_changes_are_not_synced(self):
+        other_user = User.objects.create_user(
+            username="otheruser", password="testpassword", email="other@other.com"
+        )
+        cursor = self.sync()["cursor"]
+        other_workout = Workout.objects.create(
+            user=other_user, name="Theirs", date=timezone.now()
+        )
+        other_workout.delete()
+        data = self.sync(since=cursor)
+        self.assertEqual(data["workouts"], [])
+        self.assertEqual(data["deleted"]["workouts"], [])
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword", email="user@user.com"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.workout = Workout.objects.create(
+            user=self.user, name="Push", date=timezone.now()
+        )
+
+    def test_unchanged_data_is_not_modified(self):
+        url = reverse("workout-list")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+
+        # Only the data version lookup
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get(reverse("exercise-directory"))
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_writes_change_the_etag(self):
+        url = reverse("workout-list")
+        etags = [self.client.get(url)["ETag"]]
+
+        self.workout.update_with_exercises({"name": "Push A"})
+        etags.append(self.client.get(url, HTTP_IF_NONE_MATCH=etags[-1])["ETag"])
+
+        ExerciseGoal.objects.create(
+            user=self.user, exercise_name="Bench Press", goal_weight=100
+        )
+        etags.append(self.client.get(url, HTTP_IF_NONE_MATCH=etags[-1])["ETag"])
+
+        CustomExerciseName.objects.get_or_create(user=self.user, name="Sled Push")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[-1])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etags.append(response["ETag"])
+
+        self.workout.delete()
+        etags.append(self.client.get(url, HTTP_IF_NONE_MATCH=etags[-1])["ETag"])
+
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_other_users_writes_keep_the_etag(self):
+        url = reverse("workout-list")
+        etag = self.client.get(url)["ETag"]
+        other_user = User.objects.create_user(
+            username="otheruser", password="testpassword", email="other@other.com"
+        )
+        Workout.objects.create(user=other_user, name="Pull", date=timezone.now())
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_predictions_are_not_cached(self):
+        response = self.client.get(reverse("exercisegoal-predictions"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("ETag", response)
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword", email="user@user.com"
+        )
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            workout = Workout.objects.create(
+                user=self.user, name="Legs", date=timezone.now()
+            )
+            self.exercise = Exercise.objects.create(
+                workout=workout, name="Squat", rest_period=timedelta(seconds=90)
+            )
+            Set.objects.create(
+                exercise=self.exercise, min_reps=5, max_reps=5, reps=5, weight=100
+            )
+
+    def assert_cached(self, url, params=None):
+        first = self.client.get(url, params)
+        # Only the ETag's data version lookup
+        with self.assertNumQueries(1):
+            second = self.client.get(url, params)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        return second
+
+    def test_exercise_history_is_invalidated_by_set_writes(self):
+        url = reverse("exercise-single-exercise-history")
+        params = {"exercise_name": "Squat"}
+        hits = REGISTRY.get_sample_value(
+            "tracker_response_cache_requests_total",
+            {"scope": "exercises", "result": "hit"},
+        )
+        self.assert_cached(url, params)
+        self.assertEqual(
+            REGISTRY.get_sample_value(
+                "tracker_response_cache_requests_total",
+                {"scope": "exercises", "result": "hit"},
+            ),
+            (hits or 0) + 1,
+        )
+
+        Set.objects.create(
+            exercise=self.exercise, min_reps=5, max_reps=5, reps=5, weight=105
+        )
+        response = self.assert_cached(url, params)
+        self.assertEqual(len(response.data[0]["sets"]), 2)
+
+    def test_directory_is_invalidated_by_workout_writes(self):
+        url = reverse("exercise-directory")
+        self.assert_cached(url)
+
+        workout = Workout.create_from_template(
+            user=self.user,
+            template=WorkoutTemplate.create_with_exercises(
+                user=self.user,
+                template_data={
+                    "name": "Pull",
+                    "exercise_templates": [
+                        {
+                            "name": "Row",
+                            "rest_period": timedelta(seconds=90),
+                            "set_templates": [],
+                        }
+                    ],
+                },
+            ),
+            date=timezone.now(),
+        )
+        self.assertEqual(self.assert_cached(url).data, ["Row", "Squat"])
+
+        workout.delete()
+        self.assertEqual(self.assert_cached(url).data, ["Squat"])
+
+    def test_templates_are_invalidated_one_by_one(self):
+        first, second = [
+            WorkoutTemplate.create_with_exercises(
+                user=self.user,
+                template_data={"name": name, "exercise_templates": []},
+            )
+            for name in ["Push", "Pull"]
+        ]
+        first_url = reverse("workouttemplate-detail", args=[first.id])
+        self.assert_cached(first_url)
+        self.assert_cached(reverse("workouttemplate-list"))
+
+        second.update_with_exercises({"name": "Pull A"})
+        with self.assertNumQueries(1):
+            self.client.get(first_url)
+
+        first.update_with_exercises({"name": "Push A"})
+        self.assertEqual(self.client.get(first_url).data["name"], "Push A")
+        names = [
+            t["name"] for t in self.client.get(reverse("workouttemplate-list")).data
+        ]
+        self.assertEqual(sorted(names), ["Pull A", "Push A"])
+
+    def test_goals_are_invalidated_by_goal_writes(self):
+        url = reverse("exercisegoal-list")
+        self.assertEqual(self.assert_cached(url).data, [])
+        ExerciseGoal.objects.create(
+            user=self.user, exercise_name="Squat", goal_weight=140
+        )
+        self.assertEqual(len(self.assert_cached(url).data), 1)
+
+    def test_failed_invalidation_bypasses_the_cache_until_retried(self):
+        url = reverse("exercisegoal-list")
+        self.assert_cached(url)
+
+        # As when Redis is unreachable and its errors are ignored
+        with (
+            patch("tracker.response_cache.cache.set_many"),
+            self.assertLogs("tracker.response_cache", "ERROR"),
+        ):
+            ExerciseGoal.objects.create(
+                user=self.user, exercise_name="Squat", goal_weight=140
+            )
+            self.assertEqual(len(self.client.get(url).data), 1)
+            self.assertEqual(len(self.client.get(url).data), 1)
+        self.assertIn((self.user.pk, "goals"), response_cache._failed_invalidations)
+
+        # Retried on the next read, which can be cached again
+        self.assertEqual(len(self.assert_cached(url).data), 1)
+        self.assertNotIn((self.user.pk, "goals"), response_cache._failed_invalidations)
+
+    def test_other_users_do_not_share_entries(self):
+        url = reverse("exercise-directory")
+        self.assert_cached(url)
+        other_user = User.objects.create_user(
+            username="otheruser", password="testpassword", email="other@other.com"
+        )
+        self.client.force_authenticate(user=other_user)
+        self.assertEqual(self.client.get(url).data, [])
+
+
+class WorkoutIngestTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword", email="user@user.com"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.template = WorkoutTemplate.create_with_exercises(
+            user=self.user,
+            template_data={"name": "Push", "exercise_templates": []},
+        )
+        self.url = reverse("workout-ingest")
+        self.workouts = [
+            {
+                "client_key": f"offline-{i}",
+                "name": f"Session {i}",
+                "date": (timezone.now() - timedelta(days=i)).isoformat(),
+                "template": self.template.id,
+                "exercises": [
+                    {
+                        "name": "Bench Press",
+                        "rest_period": "00:01:30",
+                        "sets": [
+                            {"reps": 5, "min_reps": 5, "max_reps": 8, "weight": 80},
+                            {"min_reps": 5, "max_reps": 8},
+                        ],
+                    }
+                ],
+            }
+            for i in range(3)
+        ]
+
+    def ingest(self, workouts):
+        return self.client.post(self.url, {"workouts": workouts}, format="json")
+
+    def test_workouts_are_created_with_their_contents(self):
+        response = self.ingest(self.workouts)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            response.data["created"], ["offline-0", "offline-1", "offline-2"]
+        )
+
+        workout = Workout.objects.get(pk=response.data["ids"]["offline-1"])
+        self.assertEqual(workout.name, "Session 1")
+        self.assertEqual(workout.template_version, self.template.current_version)
+        exercise = workout.exercises.get()
+        self.assertEqual((exercise.user, exercise.date), (self.user, workout.date))
+        self.assertEqual(
+            list(exercise.sets.order_by("id").values_list("reps", "weight")),
+            [(5, 80), (0, 0)],
+        )
+        self.assertEqual(ExerciseSummary.objects.get(user=self.user).session_count, 3)
+
+    def test_each_workout_gets_its_own_sync_version(self):
+        self.ingest(self.workouts)
+        versions = list(
+            Workout.objects.filter(user=self.user)
+            .order_by("sync_version")
+            .values_list("client_key", "sync_version")
+        )
+        self.assertEqual(
+            versions, [("offline-0", 2), ("offline-1", 3), ("offline-2", 4)]
+        )
+        self.assertEqual(DataVersion.current(self.user.pk), 4)
+
+    def test_replaying_changes_nothing(self):
+        first = self.ingest(self.workouts)
+        version = DataVersion.current(self.user.pk)
+        with self.assertNumQueries(2):
+            second = self.ingest(self.workouts)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, {"ids": first.data["ids"], "created": []})
+        self.assertEqual(Workout.objects.count(), 3)
+        self.assertEqual(DataVersion.current(self.user.pk), version)
+
+    def test_only_new_keys_are_written(self):
+        self.ingest(self.workouts[:2])
+        response = self.ingest(self.workouts)
+        self.assertEqual(response.data["created"], ["offline-2"])
+        self.assertEqual(len(response.data["ids"]), 3)
+        self.assertEqual(Exercise.objects.count(), 3)
+
+    def test_invalid_batch_writes_nothing(self):
+        self.workouts[2]["exercises"][0]["sets"][0]["reps"] = "lots"
+        response = self.ingest(self.workouts)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Workout.objects.exists())
+
+    def test_duplicate_keys_are_rejected(self):
+        response = self.ingest([self.workouts[0], self.workouts[0]])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_templates_are_rejected(self):
+        other_user = User.objects.create_user(
+            username="other", password="password", email="other@user.com"
+        )
+        other_template = WorkoutTemplate.create_with_exercises(
+            user=other_user,
+            template_data={"name": "Theirs", "exercise_templates": []},
+        )
+        self.workouts[0]["template"] = other_template.id
+        response = self.ingest(self.workouts)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Workout.objects.exists())
+
+    def test_keys_are_per_user(self):
+        other_user = User.objects.create_user(
+            username="other", password="password", email="other@user.com"
+        )
+        Workout.objects.create(
+            user=other_user, name="Theirs", date=timezone.now(), client_key="offline-0"
+        )
+        response = self.ingest(self.workouts[:1])
+        self.assertEqual(response.data["created"], ["offline-0"])
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword", email="user@user.com"
+        )
+        self.client.force_authenticate(user=self.user)
+        now = timezone.now()
+        self.workouts = [
+            Workout.objects.create(
+                user=self.user, name=f"Session {i}", date=now - timedelta(days=3 - i)
+            )
+            for i in range(3)
+        ]
+        bench = Exercise.objects.create(
+            workout=self.workouts[0],
+            name="Bench Press",
+            rest_period=timedelta(seconds=90),
+        )
+        Exercise.objects.create(
+            workout=self.workouts[0], name="Dips", rest_period=timedelta(seconds=60)
+        )
+        for weight in (80, 85):
+            Set.objects.create(
+                exercise=bench, min_reps=5, max_reps=8, reps=5, weight=weight
+            )
+        other_user = User.objects.create_user(
+            username="other", password="password", email="other@user.com"
+        )
+        Workout.objects.create(user=other_user, name="Theirs", date=now)
+
+    def export(self, file_format):
+        response = self.client.get(reverse("export", args=[file_format]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_has_a_row_per_set(self):
+        rows = list(csv.DictReader(io.StringIO(self.export("csv"))))
+        self.assertEqual(
+            [(r["workout_name"], r["exercise_name"], r["weight"]) for r in rows],
+            [
+                ("Session 0", "Bench Press", "80.0"),
+                ("Session 0", "Bench Press", "85.0"),
+                ("Session 0", "Dips", ""),
+                ("Session 1", "", ""),
+                ("Session 2", "", ""),
+            ],
+        )
+        self.assertEqual(rows[0]["rest_period"], "00:01:30")
+
+    def test_ndjson_has_a_workout_per_line(self):
+        lines = self.export("ndjson").splitlines()
+        workouts = [json.loads(line) for line in lines]
+        self.assertEqual([w["id"] for w in workouts], [w.id for w in self.workouts])
+        bench, dips = workouts[0]["exercises"]
+        self.assertEqual([s["weight"] for s in bench["sets"]], [80, 85])
+        self.assertEqual(dips["sets"], [])
+        self.assertEqual(workouts[1]["exercises"], [])
+
+    def test_pages_do_not_change_the_output(self):
+        expected = self.export("ndjson")
+        with patch("tracker.export.CHUNK_SIZE", 1):
+            # Two queries per page and one to find there are no more
+            with self.assertNumQueries(7):
+                paged = self.export("ndjson")
+        self.assertEqual(paged, expected)
+
+    async def test_streams_asynchronously_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("export", args=["ndjson"]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # A sync iterator would be read into a list first, with a warning
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            content = b"".join([chunk async for chunk in response.__aiter__()])
+        expected = await sync_to_async(self.export)("ndjson")
+        self.assertEqual(content.decode(), expected)
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse("export", args=["xlsx"]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BatchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword", email="user@user.com"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.workout = Workout.objects.create(
+            user=self.user, name="Session", date=timezone.now()
+        )
+
+    def batch(self, requests, **options):
+        return self.client.post(
+            reverse("batch"), {"requests": requests, **options}, format="json"
+        )
+
+    def test_requests_run_in_order_as_the_batch_user(self):
+        response = self.batch(
+            [
+                {
+                    "method": "POST",
+                    "path": reverse("exercisegoal-list"),
+                    "body": {"exercise_name": "Squat", "goal_weight": 140},
+                },
+                {"method": "GET", "path": "/exercise-goals/?exercise_name=Squat"},
+                {
+                    "method": "GET",
+                    "path": reverse("workout-detail", args=[self.workout.id]),
+                },
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        created, goals, workout = response.data["responses"]
+        self.assertEqual(created["status"], status.HTTP_201_CREATED)
+        self.assertEqual([goal["exercise_name"] for goal in goals["body"]], ["Squat"])
+        self.assertEqual(workout["body"]["name"], "Session")
+        self.assertIn("ETag", workout["headers"])
+        self.assertEqual(ExerciseGoal.objects.get().user, self.user)
+
+    def test_requests_can_be_conditional(self):
+        path = reverse("workout-detail", args=[self.workout.id])
+        first = self.batch([{"method": "GET", "path": path}])
+        etag = first.data["responses"][0]["headers"]["ETag"]
+        second = self.batch(
+            [{"method": "GET", "path": path, "headers": {"If-None-Match": etag}}]
+        )
+        self.assertEqual(
+            second.data["responses"][0]["status"], status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_failures_do_not_stop_a_non_atomic_batch(self):
+        other_user = User.objects.create_user(
+            username="other", password="password", email="other@user.com"
+        )
+        other_workout = Workout.objects.create(
+            user=other_user, name="Theirs", date=timezone.now()
+        )
+        response = self.batch(
+            [
+                {"method": "GET", "path": "/api/no-such-route/"},
+                {
+                    "method": "DELETE",
+                    "path": reverse("workout-detail", args=[other_workout.id]),
+                },
+                {
+                    "method": "DELETE",
+                    "path": reverse("workout-detail", args=[self.workout.id]),
+                },
+            ]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r["status"] for r in response.data["responses"]],
+            [
+                status.HTTP_404_NOT_FOUND,
+                status.HTTP_404_NOT_FOUND,
+                status.HTTP_204_NO_CONTENT,
+            ],
+        )
+        self.assertTrue(Workout.objects.filter(pk=other_workout.pk).exists())
+        self.assertFalse(Workout.objects.filter(pk=self.workout.pk).exists())
+
+    def test_failed_atomic_batch_is_rolled_back(self):
+        response = self.batch(
+            [
+                {
+                    "method": "DELETE",
+                    "path": reverse("workout-detail", args=[self.workout.id]),
+                },
+                {
+                    "method": "POST",
+                    "path": reverse("exercisegoal-list"),
+                    "body": {"exercise_name": "Squat"},
+                },
+                {"method": "GET", "path": reverse("workout-list")},
+            ],
+            atomic=True,
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [r["status"] for r in response.data["responses"]],
+            [status.HTTP_204_NO_CONTENT, status.HTTP_400_BAD_REQUEST],
+        )
+        self.assertTrue(Workout.objects.filter(pk=self.workout.pk).exists())
+
+    def test_rolled_back_batch_leaves_no_cached_responses_or_etags(self):
+        goal = ExerciseGoal.objects.create(
+            user=self.user, exercise_name="Squat", goal_weight=100
+        )
+        url = reverse("exercisegoal-list")
+        response = self.batch(
+            [
+                {
+                    "method": "PATCH",
+                    "path": reverse("exercisegoal-detail", args=[goal.id]),
+                    "body": {"goal_weight": 999},
+                },
+                {"method": "GET", "path": url},
+                {"method": "GET", "path": "/api/no-such-route/"},
+            ],
+            atomic=True,
+        )
+        listed = response.data["responses"][1]
+        self.assertEqual(listed["body"][0]["goal_weight"], 999)
+
+        self.assertEqual(self.client.get(url).data[0]["goal_weight"], 100)
+        # The next write must not make the rolled back ETag current again
+        CustomExerciseName.objects.create(user=self.user, name="Zercher Squat")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=listed["headers"]["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["goal_weight"], 100)
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_batch_size_is_limited(self):
+        request = {"method": "GET", "path": reverse("workout-list")}
+        response = self.batch([request] * 3)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batches_cannot_be_nested(self):
+        response = self.batch([{"method": "POST", "path": reverse("batch")}])
+        self.assertEqual(
+            response.data["responses"][0]["status"], status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.batch([{"method": "GET", "path": reverse("workout-list")}])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class QueryCountTests(APITestCase):
+    """
+    Query counts documented on the viewsets, which must not grow with the
+    number of rows returned.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def add_workouts(self, count):
+        template = WorkoutTemplate.create_with_exercises(
+            user=self.user,
+            template_data={
+                "name": "Full Body",
+                "exercise_templates": [
+                    {
+                        "name": name,
+                        "rest_period": timedelta(seconds=90),
+                        "set_templates": [{"min_reps": 8, "max_reps": 10}] * 3,
+                    }
+                    for name in ["Squat", "Bench Press", "Row"]
+                ],
+            },
+        )
+        for i in range(count):
+            workout = Workout.create_from_template(
+                user=self.user,
+                template=template,
+                date=timezone.now() - timedelta(days=count - i),
+            )
+            Set.objects.filter(exercise__workout=workout).update(reps=8, weight=60)
+        return template, workout
+
+    def assert_constant_queries(self, expected, url, params=None):
+        for count in (2, 5):
+            template, workout = self.add_workouts(count)
+            # Plus the data version lookup for the ETag
+            with self.assertNumQueries(expected + 1):
+                response = self.client.get(
+                    url(template, workout) if callable(url) else url, params
+                )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_workout_list(self):
+        self.assert_constant_queries(1, reverse("workout-list"))
+
+    def test_workout_retrieve(self):
+        self.assert_constant_queries(
+            3, lambda template, workout: reverse("workout-detail", args=[workout.id])
+        )
+
+    def test_template_list(self):
+        self.assert_constant_queries(1, reverse("workouttemplate-list"))
+
+    def test_template_retrieve(self):
+        self.assert_constant_queries(
+            3,
+            lambda template, workout: reverse(
+                "workouttemplate-detail", args=[template.id]
+            ),
+        )
+
+    def test_exercise_list(self):
+        self.assert_constant_queries(2, reverse("exercise-list"))
+
+    def test_single_exercise_history(self):
+        self.assert_constant_queries(
+            2,
+            reverse("exercise-single-exercise-history"),
+            {"exercise_name": "Squat"},
+        )
+
+    def test_last_performance(self):
+        self.assert_constant_queries(
+            3,
+            lambda template, workout: reverse("exercise-last-performance")
+            + f"?name=Squat&workout_id={workout.id}",
+        )
+
+    def test_last_performances(self):
+        self.assert_constant_queries(
+            3,
+            lambda template, workout: reverse("exercise-last-performances")
+            + f"?workout_id={workout.id}",
+        )
+
+    def test_directory(self):
+        self.assert_constant_queries(1, reverse("exercise-directory"))
+
+    def test_directory_search(self):
+        self.assert_constant_queries(
+            1, reverse("exercise-directory"), {"search": "squat"}
+        )
+
 
 class UserViewSetTests(APITestCase):
     def test_user_list_requires_auth(self):
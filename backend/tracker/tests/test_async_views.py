@@ -0,0 +1,200 @@
+from datetime import timedelta
+from unittest.mock import AsyncMock, patch
+
+import msgpack
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+from tracker.authentication import cached_users, verified_tokens
+from tracker.jwks import JWKSKeyStore
+from tracker.models import (
+    ExerciseGoal,
+    ExerciseSummary,
+    Set,
+    Workout,
+    WorkoutTemplate,
+)
+
+from .test_authentication import make_jwks, make_token
+
+User = get_user_model()
+
+
+@override_settings(SUPABASE_AUDIENCE="authenticated")
+class AsyncViewTests(APITestCase):
+    """
+    The async endpoints must answer exactly as their sync counterparts.
+    """
+
+    def setUp(self):
+        self.jwks, private_keys = make_jwks("key-1")
+        self.store = JWKSKeyStore(
+            url="https://placeholder.supabase.co/auth/v1/.well-known/jwks.json",
+            background=False,
+        )
+        patcher = patch("tracker.authentication.get_key_store", return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.fetch = patch.object(
+            self.store, "afetch_data", AsyncMock(return_value=self.jwks)
+        ).start()
+        self.addCleanup(patch.stopall)
+        verified_tokens.clear()
+        cached_users.clear()
+
+        self.user = User.objects.create_user(
+            username="lifter@test.com",
+            email="lifter@test.com",
+            supabase_id="supabase-user-1",
+        )
+        self.token = make_token(private_keys["key-1"], "key-1")
+        self.sync_client = APIClient()
+        self.sync_client.force_authenticate(user=self.user)
+
+        now = timezone.now()
+        for days_ago in (3, 2, 1):
+            workout = Workout.objects.create(
+                user=self.user, name="Legs", date=now - timedelta(days=days_ago)
+            )
+            for name in ("Squat", "Leg Press"):
+                exercise = workout.exercises.create(
+                    name=name, rest_period=timedelta(seconds=150)
+                )
+                Set.objects.create(
+                    exercise=exercise, min_reps=5, max_reps=8, reps=6, weight=100.0
+                )
+                Set.objects.create(exercise=exercise, min_reps=5, max_reps=8)
+        self.workout = workout
+        ExerciseSummary.refresh_for(self.user.pk, ["Squat", "Leg Press"])
+        ExerciseGoal.objects.create(
+            user=self.user, exercise_name="Squat", goal_weight=140
+        )
+
+    def get_async(self, name, params=None, **headers):
+        return self.client.get(
+            reverse(name),
+            params,
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+            **headers,
+        )
+
+    def assert_same_response(self, sync_name, async_name, params=None):
+        expected = self.sync_client.get(reverse(sync_name), params)
+        response = self.get_async(async_name, params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        return response
+
+    def test_same_responses_as_sync_views(self):
+        cases = [
+            ("exercise-directory", "async-exercise-directory", None),
+            ("exercise-directory", "async-exercise-directory", {"search": "squt"}),
+            (
+                "exercise-last-performance",
+                "async-exercise-last-performance",
+                {"name": "Squat", "workout_id": self.workout.pk},
+            ),
+            (
+                "exercise-last-performance",
+                "async-exercise-last-performance",
+                {"name": "Deadlift", "workout_id": self.workout.pk},
+            ),
+            (
+                "exercise-last-performance",
+                "async-exercise-last-performance",
+                {"name": "Squat", "workout_id": 0},
+            ),
+            (
+                "exercise-last-performance",
+                "async-exercise-last-performance",
+                {"name": "Squat"},
+            ),
+            (
+                "exercise-single-exercise-history",
+                "async-exercise-single-exercise-history",
+                {"exercise_name": "Squat"},
+            ),
+            (
+                "exercise-single-exercise-history",
+                "async-exercise-single-exercise-history",
+                None,
+            ),
+            ("exercisegoal-list", "async-exercisegoal-list", None),
+            (
+                "exercisegoal-list",
+                "async-exercisegoal-list",
+                {"exercise_name": "Bench Press"},
+            ),
+        ]
+        for sync_name, async_name, params in cases:
+            with self.subTest(async_name, params=params):
+                self.assert_same_response(sync_name, async_name, params)
+
+    def test_keys_are_fetched_asynchronously_once(self):
+        for _ in range(3):
+            response = self.get_async("async-exercisegoal-list")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.fetch.await_count, 1)
+
+    def test_unauthenticated(self):
+        response = self.client.get(reverse("async-exercisegoal-list"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(
+            reverse("async-exercisegoal-list"), HTTP_AUTHORIZATION="Bearer nonsense"
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_messagepack(self):
+        expected = self.sync_client.get(reverse("exercise-directory")).json()
+        response = self.get_async(
+            "async-exercise-directory", HTTP_ACCEPT="application/msgpack"
+        )
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+
+    def test_not_modified(self):
+        etag = self.get_async("async-exercisegoal-list")["ETag"]
+        response = self.get_async("async-exercisegoal-list", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.sync_client.post(
+            reverse("exercisegoal-list"),
+            {"exercise_name": "Leg Press", "goal_weight": 200},
+        )
+        response = self.get_async("async-exercisegoal-list", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_cached_responses_are_invalidated_by_writes(self):
+        self.assertCountEqual(
+            self.get_async("async-exercise-directory").json(), ["Squat", "Leg Press"]
+        )
+        Workout.create_from_template(
+            user=self.user,
+            template=WorkoutTemplate.create_with_exercises(
+                user=self.user,
+                template_data={
+                    "name": "Pull",
+                    "exercise_templates": [
+                        {
+                            "name": "Row",
+                            "rest_period": timedelta(seconds=90),
+                            "set_templates": [],
+                        }
+                    ],
+                },
+            ),
+            date=timezone.now(),
+        )
+        self.assertEqual(self.get_async("async-exercise-directory").json()[0], "Row")
+
+    def test_async_views_cannot_be_batched(self):
+        response = self.sync_client.post(
+            reverse("batch"),
+            {"requests": [{"method": "GET", "path": "async/exercise-goals/"}]},
+            format="json",
+        )
+        self.assertEqual(response.data["responses"][0]["status"], 400)
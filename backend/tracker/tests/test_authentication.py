@@ -0,0 +1,224 @@
+import json
+import time
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import jwt
+from asgiref.sync import async_to_sync
+from cryptography.hazmat.primitives.asymmetric import ec
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from jwt.algorithms import ECAlgorithm
+from jwt.exceptions import PyJWKClientConnectionError, PyJWKClientError
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory, APITestCase
+from tracker.authentication import (
+    SupabaseAuthentication,
+    cached_users,
+    verified_tokens,
+)
+from tracker.jwks import JWKSKeyStore
+
+User = get_user_model()
+
+
+def make_jwks(*kids):
+    private_keys = {}
+    keys = []
+    for kid in kids:
+        private_key = ec.generate_private_key(ec.SECP256R1())
+        jwk = json.loads(ECAlgorithm.to_jwk(private_key.public_key()))
+        jwk.update({"kid": kid, "use": "sig", "alg": "ES256"})
+        keys.append(jwk)
+        private_keys[kid] = private_key
+    return {"keys": keys}, private_keys
+
+
+def make_token(private_key, kid, sub="supabase-user-1", email="lifter@test.com"):
+    payload = {
+        "sub": sub,
+        "email": email,
+        "aud": "authenticated",
+        "exp": int(time.time()) + 3600,
+    }
+    return jwt.encode(payload, private_key, algorithm="ES256", headers={"kid": kid})
+
+
+class JWKSKeyStoreTests(APITestCase):
+    def setUp(self):
+        self.jwks, self.private_keys = make_jwks("key-1")
+        self.store = JWKSKeyStore(
+            url="https://placeholder.supabase.co/auth/v1/.well-known/jwks.json",
+            background=False,
+        )
+
+    def test_keys_are_fetched_once(self):
+        with patch.object(
+            self.store._client, "fetch_data", return_value=self.jwks
+        ) as fetch:
+            self.store.get_signing_key("key-1")
+            self.store.get_signing_key("key-1")
+            self.store.get_signing_key("key-1")
+        self.assertEqual(fetch.call_count, 1)
+
+    def test_unknown_kid_refetches_once(self):
+        rotated_jwks, _ = make_jwks("key-2")
+        with patch.object(
+            self.store._client, "fetch_data", side_effect=[self.jwks, rotated_jwks]
+        ) as fetch:
+            self.store.get_signing_key("key-1")
+            key = self.store.get_signing_key("key-2")
+        self.assertEqual(key.key_id, "key-2")
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_unknown_kid_refetch_is_rate_limited(self):
+        with patch.object(
+            self.store._client, "fetch_data", return_value=self.jwks
+        ) as fetch:
+            self.store.get_signing_key("key-1")
+            for _ in range(3):
+                with self.assertRaises(PyJWKClientError):
+                    self.store.get_signing_key("made-up")
+        # Initial fetch plus a single refetch for the unknown kids
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_cold_fetches_are_rate_limited_after_a_failure(self):
+        with patch.object(
+            self.store._client,
+            "fetch_data",
+            side_effect=PyJWKClientConnectionError("timed out"),
+        ) as fetch:
+            # E.g. the refresher's first fetch
+            self.assertFalse(self.store.refresh())
+            for _ in range(3):
+                with self.assertRaises(PyJWKClientError):
+                    self.store.get_signing_key("key-1")
+        self.assertEqual(fetch.call_count, 1)
+
+        self.store._last_miss_refresh -= self.store.miss_cooldown
+        with patch.object(self.store._client, "fetch_data", return_value=self.jwks):
+            self.assertEqual(self.store.get_signing_key("key-1").key_id, "key-1")
+
+    def test_last_known_keys_are_served_when_endpoint_is_down(self):
+        with patch.object(self.store._client, "fetch_data", return_value=self.jwks):
+            self.store.refresh()
+        with patch.object(
+            self.store._client,
+            "fetch_data",
+            side_effect=PyJWKClientConnectionError("timed out"),
+        ):
+            self.assertFalse(self.store.refresh())
+            key = self.store.get_signing_key("key-1")
+        self.assertEqual(key.key_id, "key-1")
+
+    def test_async_lookups_fetch_with_httpx_once(self):
+        with patch.object(
+            self.store, "afetch_data", AsyncMock(return_value=self.jwks)
+        ) as fetch:
+            for _ in range(3):
+                key = async_to_sync(self.store.aget_signing_key)("key-1")
+        self.assertEqual(key.key_id, "key-1")
+        self.assertEqual(fetch.await_count, 1)
+
+    def test_async_refresh_keeps_keys_when_endpoint_is_down(self):
+        with patch.object(self.store._client, "fetch_data", return_value=self.jwks):
+            self.store.refresh()
+        with patch.object(
+            self.store, "afetch_data", AsyncMock(side_effect=httpx.ConnectTimeout(""))
+        ):
+            self.assertFalse(async_to_sync(self.store.arefresh)())
+        self.assertEqual(self.store.get_signing_key("key-1").key_id, "key-1")
+
+
+@override_settings(SUPABASE_AUDIENCE="authenticated")
+class SupabaseAuthenticationTests(APITestCase):
+    def setUp(self):
+        self.jwks, self.private_keys = make_jwks("key-1")
+        self.store = JWKSKeyStore(
+            url="https://placeholder.supabase.co/auth/v1/.well-known/jwks.json",
+            background=False,
+        )
+        patcher = patch("tracker.authentication.get_key_store", return_value=self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        verified_tokens.clear()
+        cached_users.clear()
+        self.factory = APIRequestFactory()
+
+    def authenticate(self, token):
+        request = self.factory.get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return SupabaseAuthentication().authenticate(request)
+
+    def test_valid_token_creates_user(self):
+        token = make_token(self.private_keys["key-1"], "key-1")
+        with patch.object(self.store._client, "fetch_data", return_value=self.jwks):
+            user, _ = self.authenticate(token)
+        self.assertEqual(user.supabase_id, "supabase-user-1")
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_unknown_kid_is_not_logged_as_an_error(self):
+        token = make_token(self.private_keys["key-1"], "made-up")
+        with (
+            patch.object(self.store._client, "fetch_data", return_value=self.jwks),
+            self.assertNoLogs("tracker.authentication", "WARNING"),
+            self.assertRaisesMessage(
+                AuthenticationFailed, "Could not authenticate token."
+            ),
+        ):
+            self.authenticate(token)
+
+    def test_unexpected_errors_are_logged(self):
+        token = make_token(self.private_keys["key-1"], "key-1")
+        with (
+            patch.object(self.store._client, "fetch_data", return_value=self.jwks),
+            patch(
+                "tracker.authentication.get_user_for_payload",
+                side_effect=RuntimeError("boom"),
+            ),
+            self.assertLogs("tracker.authentication", "ERROR") as logs,
+            self.assertRaisesMessage(
+                AuthenticationFailed, "Could not authenticate token."
+            ),
+        ):
+            self.authenticate(token)
+        self.assertIn("Traceback", logs.output[0])
+
+    def test_jwks_is_not_refetched_per_request(self):
+        token = make_token(self.private_keys["key-1"], "key-1")
+        with patch.object(
+            self.store._client, "fetch_data", return_value=self.jwks
+        ) as fetch:
+            for _ in range(5):
+                self.authenticate(token)
+        self.assertEqual(fetch.call_count, 1)
+
+    def test_repeat_requests_skip_verification_and_queries(self):
+        token = make_token(self.private_keys["key-1"], "key-1")
+        with patch.object(self.store._client, "fetch_data", return_value=self.jwks):
+            first_user, _ = self.authenticate(token)
+
+        with patch("tracker.authentication.jwt.decode") as decode:
+            with self.assertNumQueries(0):
+                user, _ = self.authenticate(token)
+        decode.assert_not_called()
+        self.assertEqual(user.pk, first_user.pk)
+        self.assertIsNot(user, first_user)
+
+    def test_saving_user_invalidates_cached_user(self):
+        token = make_token(self.private_keys["key-1"], "key-1")
+        with patch.object(self.store._client, "fetch_data", return_value=self.jwks):
+            user, _ = self.authenticate(token)
+
+        user.first_name = "Updated"
+        user.save()
+
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate(token)
+        self.assertEqual(user.first_name, "Updated")
+
+    def test_deleted_user_is_not_served_from_cache(self):
+        token = make_token(self.private_keys["key-1"], "key-1")
+        with patch.object(self.store._client, "fetch_data", return_value=self.jwks):
+            user, _ = self.authenticate(token)
+        User.objects.filter(pk=user.pk).get().delete()
+        self.assertIsNone(cached_users.get("supabase-user-1"))
@@ -0,0 +1,29 @@
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+class LazyImportTests(SimpleTestCase):
+    def test_heavy_dependencies_are_not_imported_at_boot(self):
+        """
+        Loading the app and its URLconf, as every worker does, must not
+        import the dependencies only the outbox worker, goal predictions and
+        the async views need.
+        """
+        code = (
+            "import sys, django\n"
+            "django.setup()\n"
+            "import tracker.urls\n"
+            "print(' '.join(name for name in ('supabase', 'numpy', 'httpx') "
+            "if name in sys.modules))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        self.assertEqual(result.stdout.strip(), "")
@@ -0,0 +1,201 @@
+import os
+import threading
+import time
+
+from django.test import SimpleTestCase
+from prometheus_client import REGISTRY
+from tracker.db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.healthy = True
+        self.closed = False
+
+    def ping(self):
+        if not self.healthy:
+            raise ConnectionError("MySQL server has gone away")
+
+
+class FakeServer:
+    """
+    Opens FakeConnections, failing while down.
+    """
+
+    def __init__(self):
+        self.opened = []
+        self.down = False
+
+    def connect(self):
+        if self.down:
+            raise ConnectionError("Can't connect to MySQL server")
+        connection = FakeConnection(len(self.opened))
+        self.opened.append(connection)
+        return connection
+
+
+def close(connection):
+    connection.closed = True
+
+
+def sample(name, alias, **labels):
+    return REGISTRY.get_sample_value(name, {"alias": alias, **labels}) or 0
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def make_pool(self, alias, **kwargs):
+        self.server = FakeServer()
+        return ConnectionPool(
+            connect=self.server.connect,
+            check=FakeConnection.ping,
+            close=close,
+            alias=alias,
+            **kwargs,
+        )
+
+    def test_connections_are_reused(self):
+        pool = self.make_pool("reuse")
+        first, reused = pool.acquire()
+        self.assertFalse(reused)
+        pool.release(first)
+
+        second, reused = pool.acquire()
+        self.assertIs(second, first)
+        self.assertTrue(reused)
+        self.assertEqual(len(self.server.opened), 1)
+        self.assertEqual(
+            sample("tracker_db_pool_connections", "reuse", state="in_use"), 1
+        )
+        self.assertEqual(
+            sample("tracker_db_pool_connections", "reuse", state="idle"), 0
+        )
+
+    def test_min_size_is_opened_on_first_use(self):
+        pool = self.make_pool("min-size", min_size=2)
+        pool.acquire()
+        self.assertEqual(len(self.server.opened), 2)
+        self.assertEqual(
+            sample("tracker_db_pool_connections", "min-size", state="idle"), 1
+        )
+
+    def test_waits_for_a_connection_when_full(self):
+        pool = self.make_pool("full", max_size=1, timeout=5)
+        connection, _ = pool.acquire()
+        threading.Timer(0.05, pool.release, [connection]).start()
+
+        self.assertIs(pool.acquire()[0], connection)
+        self.assertEqual(len(self.server.opened), 1)
+        self.assertGreaterEqual(
+            sample("tracker_db_pool_wait_seconds_sum", "full"), 0.05
+        )
+
+    def test_times_out_when_full(self):
+        pool = self.make_pool("timeout", max_size=1, timeout=0.05)
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual(
+            sample(
+                "tracker_db_pool_checkout_failures_total", "timeout", reason="timeout"
+            ),
+            1,
+        )
+
+    def test_unhealthy_connections_are_replaced(self):
+        pool = self.make_pool("health")
+        connection, _ = pool.acquire()
+        pool.release(connection)
+        connection.healthy = False
+
+        replacement, reused = pool.acquire()
+        self.assertIsNot(replacement, connection)
+        self.assertFalse(reused)
+        self.assertTrue(connection.closed)
+        self.assertEqual(
+            sample("tracker_db_pool_discards_total", "health", reason="unhealthy"), 1
+        )
+
+    def test_connections_are_closed_after_max_lifetime(self):
+        pool = self.make_pool("lifetime", max_lifetime=0)
+        connection, _ = pool.acquire()
+        pool.release(connection)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.acquire()[0], connection)
+
+    def test_unusable_connections_are_closed(self):
+        pool = self.make_pool("unusable", max_size=1)
+        connection, _ = pool.acquire()
+        pool.release(connection, reusable=False)
+        self.assertTrue(connection.closed)
+        # Its slot is free again
+        self.assertIsNot(pool.acquire()[0], connection)
+
+    def test_connect_failures_free_their_slot(self):
+        pool = self.make_pool("connect", max_size=1, timeout=0.05)
+        self.server.down = True
+        with self.assertRaises(ConnectionError):
+            pool.acquire()
+        self.server.down = False
+        pool.acquire()
+        self.assertEqual(
+            sample(
+                "tracker_db_pool_checkout_failures_total", "connect", reason="connect"
+            ),
+            1,
+        )
+
+    def test_fork_leaves_the_child_an_empty_pool(self):
+        pool = self.make_pool("fork")
+        idle, _ = pool.acquire()
+        in_use, _ = pool.acquire()
+        pool.release(idle)
+
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            # Child: nothing inherited is reused or closed
+            try:
+                connection, reused = pool.acquire()
+                pool.release(in_use)
+                ok = connection not in (idle, in_use) and not in_use.closed
+                os.write(write_fd, b"1" if ok and not reused else b"0")
+            finally:
+                os._exit(0)
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+        result = os.read(read_fd, 1)
+        os.close(read_fd)
+
+        self.assertEqual(result, b"1")
+        # The parent closed its idle connection rather than share it
+        self.assertTrue(idle.closed)
+        self.assertFalse(in_use.closed)
+        pool.release(in_use)
+        self.assertIs(pool.acquire()[0], in_use)
+
+    def test_concurrent_checkouts_never_share_a_connection(self):
+        pool = self.make_pool("threads", max_size=3)
+        in_use = set()
+        errors = []
+        lock = threading.Lock()
+
+        def work():
+            for _ in range(50):
+                connection, _ = pool.acquire()
+                with lock:
+                    if connection in in_use:
+                        errors.append(connection)
+                    in_use.add(connection)
+                time.sleep(0.0005)
+                with lock:
+                    in_use.discard(connection)
+                pool.release(connection)
+
+        threads = [threading.Thread(target=work) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(self.server.opened), 3)
@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, APITestCase
+from tracker import fast_reads
+from tracker.models import Exercise, Set, Workout, WorkoutTemplate
+from tracker.serializers import ExerciseSerializer, WorkoutListSerializer
+from tracker.views import prefetch_sets
+
+User = get_user_model()
+
+
+class FastReadTests(APITestCase):
+    """
+    The fast paths must give exactly what the serializers give.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword", email="user@user.com"
+        )
+        self.client.force_authenticate(user=self.user)
+        template = WorkoutTemplate.objects.create(user=self.user, name="Push")
+        dates = [
+            datetime(2024, 3, 4, 18, 0, 0, 123456, tzinfo=dt_timezone.utc),
+            datetime(2024, 3, 6, 7, 30, tzinfo=ZoneInfo("Europe/London")),
+            datetime(2024, 7, 1, 23, 59, 59, tzinfo=ZoneInfo("America/New_York")),
+        ]
+        for i, date in enumerate(dates):
+            workout = Workout.objects.create(
+                user=self.user,
+                name=f"Workout {i}",
+                date=date,
+                notes="Felt good ✓" if i else "",
+                template=template if i % 2 else None,
+            )
+            exercise = Exercise.objects.create(
+                workout=workout,
+                name="Bench Press",
+                rest_period=timedelta(minutes=2, seconds=30, microseconds=500 * i),
+                notes=f"Note {i}",
+            )
+            Set.objects.create(
+                exercise=exercise, min_reps=5, max_reps=8, reps=6, weight=82.5
+            )
+            Set.objects.create(
+                exercise=exercise, min_reps=5, max_reps=8, reps=5.5, weight=85
+            )
+            Set.objects.create(exercise=exercise, min_reps=5, max_reps=8)
+        # Other users' workouts stay out
+        other = User.objects.create_user(username="other", password="password")
+        Workout.objects.create(user=other, name="Other", date=timezone.now())
+
+    def request(self, path):
+        request = APIRequestFactory().get(path, HTTP_HOST="api.example.com")
+        request.user = self.user
+        return request
+
+    def test_workout_list(self):
+        queryset = Workout.objects.filter(user=self.user).order_by("-date")
+        request = self.request("/api/workouts/")
+        expected = WorkoutListSerializer(
+            queryset, many=True, context={"request": request}
+        ).data
+        self.assertEqual(fast_reads.workout_list(request, queryset), expected)
+        self.assertTrue(expected[1]["template"].startswith("http://api.example.com/"))
+
+    def test_workout_list_endpoint(self):
+        response = self.client.get(reverse("workout-list"))
+        self.assertEqual(len(response.data), 3)
+        queryset = Workout.objects.filter(user=self.user).order_by("-date")
+        expected = WorkoutListSerializer(
+            queryset, many=True, context={"request": response.wsgi_request}
+        ).data
+        self.assertEqual(response.json(), expected)
+
+    def test_exercise_history(self):
+        queryset = Exercise.objects.filter(user=self.user).order_by("date")
+        expected = ExerciseSerializer(prefetch_sets(queryset), many=True).data
+        self.assertEqual(fast_reads.exercise_history(queryset), expected)
+        self.assertIsNone(expected[0]["sets"][2]["reps"])
+
+    def test_exercise_history_in_another_time_zone(self):
+        queryset = Exercise.objects.filter(user=self.user).order_by("date")
+        with timezone.override(ZoneInfo("Asia/Kolkata")):
+            expected = ExerciseSerializer(prefetch_sets(queryset), many=True).data
+            self.assertEqual(fast_reads.exercise_history(queryset), expected)
+        self.assertTrue(expected[0]["date"].endswith("+05:30"))
+
+    def test_empty_exercise_history(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                fast_reads.exercise_history(Exercise.objects.filter(name="Squat")), []
+            )
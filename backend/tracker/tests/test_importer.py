@@ -0,0 +1,204 @@
+import csv
+import io
+import tempfile
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from tracker import importer
+from tracker.export import stream_csv
+from tracker.models import CustomExerciseName, Exercise, Set, Workout
+
+User = get_user_model()
+
+STRONG_CSV = '''\
+Date;Workout Name;Duration;Exercise Name;Set Order;Weight;Reps;Distance;Seconds;Notes;Workout Notes;RPE
+2024-03-04 18:00:00;Push;1h;Bench Press;1;80;5;0;0;;Felt good;
+2024-03-04 18:00:00;Push;1h;Bench Press;2;82.5;5;0;0;"Paused, ""slow""";Felt good;
+2024-03-04 18:00:00;Push;1h;Bench Press;Rest Timer;0;0;0;90;;Felt good;
+2024-03-04 18:00:00;Push;1h;Cable Fly (Cable);1;20;12;0;0;;Felt good;
+2024-03-06 18:00:00;Legs;1h;Squat (Barbell);1;120;5;0;0;;;
+'''
+
+HEVY_CSV = """\
+"title","start_time","end_time","description","exercise_title","superset_id","exercise_notes","set_index","set_type","weight_kg","reps","distance_km","duration_seconds","rpe"
+"Upper","4 Mar 2024, 18:00","4 Mar 2024, 19:00","","Bench Press (Barbell)","","","0","warmup","40","10","","",""
+"Upper","4 Mar 2024, 18:00","4 Mar 2024, 19:00","","Bench Press (Barbell)","","","1","normal","80","5","","",""
+"""
+
+
+def import_text(user, text, **kwargs):
+    return importer.import_csv(user, io.StringIO(text), **kwargs)
+
+
+class ImporterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword", email="user@user.com"
+        )
+
+    def test_strong_export(self):
+        tz = ZoneInfo("Europe/London")
+        totals = import_text(self.user, STRONG_CSV, tz=tz)
+        self.assertEqual(
+            totals,
+            {
+                "workouts": 2,
+                "already_imported": 0,
+                "sets": 4,
+                "custom_exercise_names": 2,
+            },
+        )
+
+        push = Workout.objects.get(name="Push")
+        self.assertEqual(push.date, datetime(2024, 3, 4, 18, tzinfo=tz))
+        self.assertEqual(push.notes, "Felt good")
+        bench, fly = push.exercises.order_by("id")
+        self.assertEqual((bench.name, fly.name), ("Bench Press", "Cable Fly (Cable)"))
+        self.assertEqual(bench.rest_period, timedelta(0))
+        self.assertEqual(
+            list(bench.sets.order_by("id").values_list("weight", "reps", "notes")),
+            [(80, 5, ""), (82.5, 5, 'Paused, "slow"')],
+        )
+        self.assertEqual(
+            set(CustomExerciseName.objects.values_list("name", flat=True)),
+            {"Cable Fly (Cable)", "Squat (Barbell)"},
+        )
+
+    def test_hevy_export(self):
+        import_text(self.user, HEVY_CSV)
+        exercise = Exercise.objects.get()
+        self.assertEqual(exercise.name, "Bench Press (Barbell)")
+        self.assertEqual(
+            list(exercise.sets.order_by("id").values_list("weight", "notes")),
+            [(40, "warmup"), (80, "")],
+        )
+
+    def test_own_export_round_trips(self):
+        workout = Workout.objects.create(
+            user=self.user, name="Pull", date=timezone.now()
+        )
+        exercise = Exercise.objects.create(
+            workout=workout, name="Row", rest_period=timedelta(seconds=90)
+        )
+        Set.objects.create(exercise=exercise, min_reps=8, max_reps=12, reps=10)
+        csv_text = "".join(stream_csv(self.user))
+
+        other_user = User.objects.create_user(
+            username="other", password="password", email="other@user.com"
+        )
+        import_text(other_user, csv_text)
+        imported = Exercise.objects.get(user=other_user)
+        self.assertEqual(imported.workout.date, workout.date)
+        self.assertEqual(imported.rest_period, timedelta(seconds=90))
+        self.assertEqual(
+            list(imported.sets.values_list("min_reps", "max_reps", "reps")),
+            [(8, 12, 10)],
+        )
+
+    def test_importing_again_skips_what_is_there(self):
+        import_text(self.user, STRONG_CSV)
+        totals = import_text(self.user, STRONG_CSV)
+        self.assertEqual(totals["workouts"], 0)
+        self.assertEqual(totals["already_imported"], 2)
+        self.assertEqual(Workout.objects.count(), 2)
+        self.assertEqual(Set.objects.count(), 4)
+
+    def test_chunks_report_progress(self):
+        progress = []
+        with patch("tracker.importer.CHUNK_SIZE", 1):
+            import_text(
+                self.user, STRONG_CSV, progress=lambda t: progress.append(dict(t))
+            )
+        self.assertEqual([t["workouts"] for t in progress], [1, 2])
+
+    def test_bad_row_reports_its_line(self):
+        text = STRONG_CSV.replace("2024-03-06 18:00:00", "yesterday")
+        with patch("tracker.importer.CHUNK_SIZE", 1):
+            with self.assertRaisesMessage(importer.CSVImportError, "Line 6"):
+                import_text(self.user, text)
+        # Chunks before it are kept
+        self.assertTrue(Workout.objects.filter(name="Push").exists())
+
+    def test_numbers_must_be_finite_and_reps_not_negative(self):
+        for weight, reps, error in [
+            ("nan", "5", "Line 2: 'nan' is not a number"),
+            ("80", "inf", "Line 2: 'inf' is not a number"),
+            ("80", "-5", "Line 2: '-5' can't be negative"),
+        ]:
+            with self.subTest(weight=weight, reps=reps):
+                text = STRONG_CSV.replace(";1;80;5;", f";1;{weight};{reps};")
+                with self.assertRaisesMessage(importer.CSVImportError, error):
+                    import_text(self.user, text)
+        self.assertFalse(Workout.objects.exists())
+
+    def test_unrecognised_export(self):
+        with self.assertRaises(importer.CSVImportError):
+            import_text(self.user, "a,b,c\n1,2,3\n")
+
+    def test_command(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv") as file:
+            file.write(STRONG_CSV)
+            file.flush()
+            out = io.StringIO()
+            call_command("import_workouts", file.name, user_id=self.user.pk, stdout=out)
+        self.assertIn("Imported 2 workouts with 4 sets", out.getvalue())
+
+
+class ImportViewTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword", email="user@user.com"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, text, **data):
+        file = SimpleUploadedFile("strong.csv", text.encode(), "text/csv")
+        return self.client.post(
+            reverse("import") + "?tz=Europe/London",
+            {"file": file, **data},
+            format="multipart",
+        )
+
+    def test_upload(self):
+        response = self.upload(STRONG_CSV)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["workouts"], 2)
+        self.assertEqual(Workout.objects.filter(user=self.user).count(), 2)
+
+    def test_bad_upload(self):
+        response = self.upload(STRONG_CSV, profile="hevy")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Line 2", response.data["error"])
+
+    def test_upload_that_is_not_utf8(self):
+        for text in (
+            STRONG_CSV.replace("Date;", "Daté;"),
+            STRONG_CSV.replace("Squat", "Sentadilla ñ"),
+        ):
+            file = SimpleUploadedFile("strong.csv", text.encode("latin-1"), "text/csv")
+            response = self.client.post(
+                reverse("import"), {"file": file}, format="multipart"
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(
+                response.data["error"], "The file is not UTF-8 encoded text."
+            )
+
+    def test_malformed_csv(self):
+        text = STRONG_CSV.replace(";Felt good;", f";{'x' * csv.field_size_limit()}x;")
+        response = self.upload(text)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Line 2: field larger than field limit", response.data["error"])
+
+    def test_unknown_profile(self):
+        response = self.upload(STRONG_CSV, profile="fitbod")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,16 +1,29 @@
+from io import StringIO
+from unittest.mock import patch
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
 from rest_framework.test import APITestCase
-from unittest.mock import patch, MagicMock
 from datetime import timedelta
 from django.utils import timezone
+from tracker.signals import flush_pending_summaries
 from tracker.models import (
     User,
     WorkoutTemplate,
+    WorkoutTemplateVersion,
     ExerciseTemplate,
     SetTemplate,
     Workout,
     Exercise,
+    ExerciseSummary,
+    ExerciseNameTrigram,
+    CustomExerciseName,
     Set,
+    Tombstone,
+    OutboxMessage,
 )
 
 User = get_user_model()
@@ -25,23 +38,25 @@ class UserModelTests(APITestCase):
             supabase_id="mock-uuid-1234",
         )
 
-    @patch("tracker.models.create_client")
-    def test_delete_user_supabase_sync(self, mock_create_client):
-        mock_supabase = MagicMock()
-        mock_create_client.return_value = mock_supabase
+    def test_delete_user_queues_supabase_deletion(self):
         self.user.delete()
         self.assertFalse(User.objects.filter(username="testuser").exists())
-        mock_create_client.assert_called_once()
-        mock_supabase.auth.admin.delete_user.assert_called_once_with("mock-uuid-1234")
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.kind, OutboxMessage.DELETE_SUPABASE_USER)
+        self.assertEqual(message.payload, {"supabase_id": "mock-uuid-1234"})
 
-    @patch("tracker.models.create_client")
-    def test_delete_user_no_supabase_id(self, mock_create_client):
+    def test_delete_user_no_supabase_id(self):
         user_no_sb = User.objects.create_user(
             username="testuser2", password="testpassword2"
         )
         user_no_sb.delete()
         self.assertFalse(User.objects.filter(username="testuser2").exists())
-        mock_create_client.assert_not_called()
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_delete_user_leaves_no_tombstones(self):
+        Workout.objects.create(user=self.user, name="Push", date=timezone.now())
+        self.user.delete()
+        self.assertFalse(Tombstone.objects.exists())
 
 
 class WorkoutTemplateModelTests(APITestCase):
@@ -111,6 +126,55 @@ class WorkoutTemplateModelTests(APITestCase):
             duplicate.exercise_templates.count(), template.exercise_templates.count()
         )
 
+    def test_duplicate_shares_version_until_edited(self):
+        template = WorkoutTemplate.create_with_exercises(
+            user=self.user, template_data=self.template_data
+        )
+        # Savepoint, lookup, data version bump (2), insert, release - regardless
+        # of template size
+        with self.assertNumQueries(6):
+            duplicate = WorkoutTemplate.duplicate_from_id(
+                user=self.user, template_to_duplicate_id=template.id
+            )
+        self.assertEqual(duplicate.current_version_id, template.current_version_id)
+        self.assertEqual(ExerciseTemplate.objects.count(), 1)
+
+        duplicate.update_with_exercises(
+            {
+                "exercise_templates": [
+                    {
+                        "name": "Dips",
+                        "rest_period": timedelta(seconds=90),
+                        "set_templates": [{"min_reps": 8, "max_reps": 12}],
+                    }
+                ]
+            }
+        )
+        self.assertNotEqual(duplicate.current_version_id, template.current_version_id)
+        self.assertEqual(template.exercise_templates.get().name, "Bench Press")
+        self.assertEqual(duplicate.exercise_templates.get().name, "Dips")
+
+    def test_workout_keeps_version_it_was_started_from(self):
+        template = WorkoutTemplate.create_with_exercises(
+            user=self.user, template_data=self.template_data
+        )
+        workout = Workout.create_from_template(
+            user=self.user, template=template, date=timezone.now()
+        )
+        original_version = template.current_version
+        template.update_with_exercises({"exercise_templates": []})
+
+        workout.refresh_from_db()
+        self.assertEqual(workout.template_version, original_version)
+        self.assertEqual(WorkoutTemplateVersion.objects.count(), 2)
+
+        # Once nothing refers to the old version it is removed
+        workout.delete()
+        self.assertFalse(
+            WorkoutTemplateVersion.objects.filter(pk=original_version.pk).exists()
+        )
+        self.assertEqual(ExerciseTemplate.objects.count(), 0)
+
     def test_duplicate_invalid_template(self):
         duplicate = WorkoutTemplate.duplicate_from_id(
             user=self.user, template_to_duplicate_id=999
@@ -199,6 +263,70 @@ class WorkoutModelTests(APITestCase):
         for s in new_exercise.sets.all():
             self.assertEqual(s.weight, 100)
 
+    def test_create_from_template_uses_most_recent_previous_exercise(self):
+        for days_ago, weight in [(14, 90), (7, 100)]:
+            prev_workout = Workout.objects.create(
+                user=self.user,
+                name="Leg Day",
+                date=timezone.now() - timedelta(days=days_ago),
+            )
+            prev_exercise = Exercise.objects.create(
+                workout=prev_workout, name="Squat", rest_period=timedelta(seconds=180)
+            )
+            Set.objects.create(
+                exercise=prev_exercise, reps=4, min_reps=4, max_reps=6, weight=weight
+            )
+
+        new_workout = Workout.create_from_template(
+            user=self.user, template=self.template, date=timezone.now()
+        )
+        weights = set(
+            Set.objects.filter(exercise__workout=new_workout).values_list(
+                "weight", flat=True
+            )
+        )
+        self.assertEqual(weights, {100})
+
+    def test_create_from_template_query_count_is_constant(self):
+        def make_template(exercise_count):
+            return WorkoutTemplate.create_with_exercises(
+                user=self.user,
+                template_data={
+                    "name": "Full Body",
+                    "exercise_templates": [
+                        {
+                            "name": f"Exercise {i}",
+                            "rest_period": timedelta(seconds=90),
+                            "set_templates": [
+                                {"min_reps": 8, "max_reps": 10} for _ in range(4)
+                            ],
+                        }
+                        for i in range(exercise_count)
+                    ],
+                },
+            )
+
+        small_template = make_template(1)
+        large_template = make_template(10)
+        # Give every exercise some history to autofill from
+        Workout.create_from_template(
+            user=self.user,
+            template=large_template,
+            date=timezone.now() - timedelta(days=7),
+        )
+
+        with CaptureQueriesContext(connection) as small_context:
+            Workout.create_from_template(
+                user=self.user, template=small_template, date=timezone.now()
+            )
+        with CaptureQueriesContext(connection) as large_context:
+            workout = Workout.create_from_template(
+                user=self.user, template=large_template, date=timezone.now()
+            )
+
+        self.assertEqual(len(small_context), len(large_context))
+        self.assertEqual(Set.objects.filter(exercise__workout=workout).count(), 40)
+
     def test_update_workout_with_exercises(self):
         workout = Workout.create_from_template(
             user=self.user, template=self.template, date=timezone.now()
@@ -223,3 +351,380 @@ class WorkoutModelTests(APITestCase):
         updated_set = workout.exercises.first().sets.first()
         self.assertEqual(updated_set.reps, 6)
         self.assertEqual(updated_set.weight, 110)
+
+    def _workout_payload(self, workout):
+        return {
+            "exercises": [
+                {
+                    "id": exercise.id,
+                    "name": exercise.name,
+                    "rest_period": exercise.rest_period,
+                    "notes": exercise.notes,
+                    "sets": [
+                        {
+                            "id": s.id,
+                            "reps": s.reps,
+                            "min_reps": s.min_reps,
+                            "max_reps": s.max_reps,
+                            "weight": s.weight,
+                            "notes": s.notes,
+                        }
+                        for s in exercise.sets.order_by("id")
+                    ],
+                }
+                for exercise in workout.exercises.order_by("id")
+            ]
+        }
+
+    def test_update_workout_only_writes_changed_rows(self):
+        workout = Workout.create_from_template(
+            user=self.user, template=self.template, date=timezone.now()
+        )
+        set_ids = list(Set.objects.order_by("id").values_list("id", flat=True))
+        payload = self._workout_payload(workout)
+        payload["exercises"][0]["sets"][1]["reps"] = 5
+        payload["exercises"][0]["sets"][1]["weight"] = 100
+
+        workout.update_with_exercises(payload)
+
+        self.assertEqual(
+            workout.write_counts["sets"], {"created": 0, "updated": 1, "deleted": 0}
+        )
+        self.assertEqual(
+            workout.write_counts["exercises"],
+            {"created": 0, "updated": 0, "deleted": 0},
+        )
+        self.assertEqual(
+            list(Set.objects.order_by("id").values_list("id", flat=True)), set_ids
+        )
+        self.assertEqual(Set.objects.get(id=set_ids[1]).reps, 5)
+
+    def test_update_workout_adds_and_removes_sets(self):
+        workout = Workout.create_from_template(
+            user=self.user, template=self.template, date=timezone.now()
+        )
+        first_set_id = Set.objects.order_by("id").first().id
+        payload = self._workout_payload(workout)
+        sets = payload["exercises"][0]["sets"]
+        del sets[1]
+        # Ids the client made up for new sets are ignored
+        sets.append({"id": 1700000000000, "min_reps": 4, "max_reps": 6, "reps": 6})
+
+        workout.update_with_exercises(payload)
+
+        self.assertEqual(
+            workout.write_counts["sets"], {"created": 1, "updated": 0, "deleted": 1}
+        )
+        new_sets = list(workout.exercises.first().sets.order_by("id"))
+        self.assertEqual(len(new_sets), 2)
+        self.assertEqual(new_sets[0].id, first_set_id)
+        self.assertEqual(new_sets[1].weight, 0)
+
+    def test_update_workout_reordered_exercises_are_recreated(self):
+        template = WorkoutTemplate.create_with_exercises(
+            user=self.user,
+            template_data={
+                "name": "Upper",
+                "exercise_templates": [
+                    {
+                        "name": name,
+                        "rest_period": timedelta(seconds=90),
+                        "set_templates": [{"min_reps": 8, "max_reps": 10}],
+                    }
+                    for name in ["Bench Press", "Row"]
+                ],
+            },
+        )
+        workout = Workout.create_from_template(
+            user=self.user, template=template, date=timezone.now()
+        )
+        payload = self._workout_payload(workout)
+        payload["exercises"].reverse()
+
+        workout.update_with_exercises(payload)
+
+        self.assertEqual(
+            list(workout.exercises.order_by("id").values_list("name", flat=True)),
+            ["Row", "Bench Press"],
+        )
+        self.assertEqual(workout.write_counts["exercises"]["created"], 2)
+        self.assertEqual(workout.write_counts["exercises"]["deleted"], 2)
+
+    def test_exercises_copy_workout_user_and_date(self):
+        workout = Workout.create_from_template(
+            user=self.user, template=self.template, date=timezone.now()
+        )
+        payload = self._workout_payload(workout)
+        payload["exercises"].append(
+            {"name": "Lunge", "rest_period": timedelta(seconds=60), "sets": []}
+        )
+        workout.update_with_exercises(payload)
+        single = Exercise.objects.create(
+            workout=workout, name="Calf Raise", rest_period=timedelta(seconds=60)
+        )
+        self.assertEqual(single.date, workout.date)
+
+        new_date = workout.date - timedelta(days=3)
+        workout.update_with_exercises({"date": new_date})
+        self.assertEqual(
+            list(workout.exercises.values_list("user_id", "date").distinct()),
+            [(self.user.id, new_date)],
+        )
+
+        reloaded = Workout.objects.get(pk=workout.pk)
+        reloaded.date = new_date - timedelta(days=1)
+        reloaded.save()
+        self.assertEqual(
+            set(workout.exercises.values_list("date", flat=True)), {reloaded.date}
+        )
+
+    def test_history_lookups_do_not_join_workouts(self):
+        with CaptureQueriesContext(connection) as queries:
+            Workout.create_from_template(
+                user=self.user, template=self.template, date=timezone.now()
+            )
+        lookup = next(
+            q["sql"] for q in queries.captured_queries if "ROW_NUMBER" in q["sql"]
+        )
+        self.assertNotIn("tracker_workout", lookup)
+
+
+class ExerciseSummaryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+        self.template = WorkoutTemplate.create_with_exercises(
+            user=self.user,
+            template_data={
+                "name": "Leg Day",
+                "exercise_templates": [
+                    {
+                        "name": "Squat",
+                        "rest_period": timedelta(seconds=180),
+                        "set_templates": [{"min_reps": 4, "max_reps": 6}] * 2,
+                    }
+                ],
+            },
+        )
+
+    def log_workout(self, days_ago, reps, weight):
+        workout = Workout.create_from_template(
+            user=self.user,
+            template=self.template,
+            date=timezone.now() - timedelta(days=days_ago),
+        )
+        exercise = workout.exercises.get()
+        workout.update_with_exercises(
+            {
+                "exercises": [
+                    {
+                        "id": exercise.id,
+                        "name": "Squat",
+                        "rest_period": exercise.rest_period,
+                        "sets": [
+                            {
+                                "id": s.id,
+                                "min_reps": 4,
+                                "max_reps": 6,
+                                "reps": reps,
+                                "weight": weight,
+                            }
+                            for s in exercise.sets.order_by("id")
+                        ],
+                    }
+                ]
+            }
+        )
+        return workout
+
+    def test_summary_follows_workout_writes(self):
+        older = self.log_workout(days_ago=7, reps=5, weight=100)
+        newer = self.log_workout(days_ago=1, reps=6, weight=90)
+
+        summary = ExerciseSummary.objects.get(user=self.user, name="Squat")
+        self.assertEqual(summary.session_count, 2)
+        self.assertEqual(summary.last_performed, newer.date)
+        self.assertEqual(summary.best_weight, 100)
+        self.assertEqual(summary.best_one_rep_max, 112)  # 100 * 36 / 32
+        self.assertEqual(summary.total_volume, 2 * 5 * 100 + 2 * 6 * 90)
+
+        newer.delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.session_count, 1)
+        self.assertEqual(summary.last_performed, older.date)
+
+        older.delete()
+        self.assertFalse(ExerciseSummary.objects.exists())
+
+    def test_renaming_exercise_moves_summary(self):
+        workout = self.log_workout(days_ago=1, reps=5, weight=100)
+        exercise = workout.exercises.get()
+        workout.update_with_exercises(
+            {
+                "exercises": [
+                    {
+                        "id": exercise.id,
+                        "name": "Front Squat",
+                        "rest_period": exercise.rest_period,
+                        "sets": [],
+                    }
+                ]
+            }
+        )
+        self.assertEqual(
+            list(ExerciseSummary.objects.values_list("name", flat=True)),
+            ["Front Squat"],
+        )
+
+    def test_single_row_writes_refresh_once_on_commit(self):
+        workout = Workout.objects.create(
+            user=self.user, name="Legs", date=timezone.now()
+        )
+        with patch.object(ExerciseSummary, "refresh_for") as refresh_for:
+            with self.captureOnCommitCallbacks(execute=True):
+                exercise = Exercise.objects.create(
+                    workout=workout, name="Squat", rest_period=timedelta(seconds=90)
+                )
+                for weight in (100, 105, 110):
+                    Set.objects.create(
+                        exercise=exercise, min_reps=5, max_reps=5, reps=5, weight=weight
+                    )
+                refresh_for.assert_not_called()
+        refresh_for.assert_called_once_with(self.user.pk, {"Squat"})
+
+    def test_reads_before_the_refresh_are_not_kept(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("exercisesummary-list")
+        workout = Workout.objects.create(
+            user=self.user, name="Legs", date=timezone.now()
+        )
+        with self.captureOnCommitCallbacks() as callbacks:
+            Exercise.objects.create(
+                workout=workout, name="Squat", rest_period=timedelta(seconds=90)
+            )
+        # Committed, but the summaries not refreshed yet
+        for callback in callbacks:
+            if callback is not flush_pending_summaries:
+                callback()
+        stale = self.client.get(url)
+        self.assertEqual(stale.data, [])
+
+        flush_pending_summaries()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=stale["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([s["name"] for s in response.data], ["Squat"])
+
+    def test_summary_follows_single_row_deletes(self):
+        workout = self.log_workout(days_ago=1, reps=5, weight=100)
+        exercise = workout.exercises.get()
+        heaviest = exercise.sets.first()
+        heaviest.weight = 120
+        with self.captureOnCommitCallbacks(execute=True):
+            heaviest.save()
+        self.assertEqual(ExerciseSummary.objects.get().best_weight, 120)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            heaviest.delete()
+        self.assertEqual(ExerciseSummary.objects.get().best_weight, 100)
+
+        refresh_for = ExerciseSummary.refresh_for
+        with patch.object(ExerciseSummary, "refresh_for", wraps=refresh_for) as mock:
+            with self.captureOnCommitCallbacks(execute=True):
+                exercise.delete()
+        # Once, not again for each set deleted in the cascade
+        mock.assert_called_once_with(self.user.pk, {"Squat"})
+        self.assertFalse(ExerciseSummary.objects.exists())
+
+    def test_rebuild_command(self):
+        self.log_workout(days_ago=1, reps=5, weight=100)
+        expected = list(ExerciseSummary.objects.values())
+        ExerciseSummary.objects.update(session_count=99)
+
+        call_command("rebuild_exercise_summaries", stdout=StringIO())
+
+        rebuilt = list(ExerciseSummary.objects.values())
+        for row in expected + rebuilt:
+            row.pop("id")
+        self.assertEqual(rebuilt, expected)
+
+
+class ExerciseNameTrigramTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword"
+        )
+
+    def log_exercise(self, name, days_ago):
+        # Indexed when the summary is refreshed, on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            workout = Workout.objects.create(
+                user=self.user,
+                name="Session",
+                date=timezone.now() - timedelta(days=days_ago),
+            )
+            return Exercise.objects.create(
+                workout=workout, name=name, rest_period=timedelta(seconds=90)
+            )
+
+    def search(self, query, **kwargs):
+        return ExerciseNameTrigram.search(self.user, query, **kwargs)
+
+    def test_prefix_and_typo_matching(self):
+        self.log_exercise("Bench Press", days_ago=3)
+        self.log_exercise("Squat", days_ago=2)
+        self.log_exercise("Deadlift", days_ago=1)
+
+        self.assertEqual(self.search("ben"), ["Bench Press"])
+        self.assertEqual(self.search("press"), ["Bench Press"])
+        self.assertEqual(self.search("bnech press"), ["Bench Press"])
+        self.assertEqual(self.search("squta"), ["Squat"])
+        self.assertEqual(self.search("!!"), [])
+
+    def test_equal_matches_are_ranked_by_recency(self):
+        self.log_exercise("Leg Press", days_ago=5)
+        self.log_exercise("Bench Press", days_ago=1)
+        self.log_exercise("Overhead Press", days_ago=3)
+
+        self.assertEqual(
+            self.search("press"), ["Bench Press", "Overhead Press", "Leg Press"]
+        )
+        self.assertEqual(self.search("press", limit=1), ["Bench Press"])
+
+    def test_custom_names_are_indexed(self):
+        self.log_exercise("Squat", days_ago=1)
+        custom = CustomExerciseName.objects.create(user=self.user, name="Sissy Squat")
+
+        self.assertEqual(self.search("squat"), ["Squat", "Sissy Squat"])
+        self.assertEqual(self.search("squat", performed_only=True), ["Squat"])
+
+        custom.name = "Zercher Squat"
+        custom.save()
+        self.assertEqual(self.search("sissy"), [])
+        self.assertEqual(self.search("zercher"), ["Zercher Squat"])
+
+        custom.delete()
+        self.assertEqual(self.search("zercher"), [])
+
+    def test_names_leave_the_index_with_their_history(self):
+        exercise = self.log_exercise("Squat", days_ago=1)
+        CustomExerciseName.objects.create(user=self.user, name="Squat")
+
+        exercise.workout.delete()
+        self.assertEqual(self.search("squat"), ["Squat"])
+        self.assertEqual(self.search("squat", performed_only=True), [])
+
+        CustomExerciseName.objects.get().delete()
+        self.assertFalse(ExerciseNameTrigram.objects.exists())
+
+    def test_rebuild_restores_index(self):
+        self.log_exercise("Squat", days_ago=1)
+        CustomExerciseName.objects.create(user=self.user, name="Sissy Squat")
+        expected = set(ExerciseNameTrigram.objects.values_list("trigram", "name"))
+        ExerciseNameTrigram.objects.all().delete()
+
+        call_command("rebuild_exercise_summaries", stdout=StringIO())
+
+        self.assertEqual(
+            set(ExerciseNameTrigram.objects.values_list("trigram", "name")), expected
+        )
@@ -0,0 +1,188 @@
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+from tracker.models import OutboxMessage
+from tracker.outbox import OutboxWorker, backoff
+
+User = get_user_model()
+
+
+class SupabaseError(Exception):
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class StubAdmin:
+    """
+    Stands in for a Supabase client's auth.admin, failing with the given
+    errors before it starts succeeding.
+    """
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.deleted = []
+
+    def delete_user(self, supabase_id):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.deleted.append(supabase_id)
+
+
+def stub_supabase(errors=()):
+    return SimpleNamespace(auth=SimpleNamespace(admin=StubAdmin(errors)))
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="lifter", email="lifter@test.com", supabase_id="supabase-1"
+        )
+
+    def make_due(self):
+        OutboxMessage.objects.update(available_at=timezone.now())
+
+    def test_deletion_is_queued_in_the_same_transaction(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            User.objects.get(pk=self.user.pk).delete()
+            self.assertTrue(OutboxMessage.objects.exists())
+            raise RuntimeError
+        self.assertTrue(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_drain_delivers_batches_with_one_client(self):
+        self.user.delete()
+        for i in range(2, 5):
+            User.objects.create_user(
+                username=f"lifter-{i}",
+                email=f"lifter-{i}@test.com",
+                supabase_id=f"supabase-{i}",
+            ).delete()
+        supabase = stub_supabase()
+        worker = OutboxWorker()
+
+        with patch("tracker.outbox.create_client", return_value=supabase) as create:
+            self.assertEqual(worker.drain(batch_size=3), {"delivered": 3})
+            self.assertEqual(worker.drain(batch_size=3), {"delivered": 1})
+            self.assertEqual(worker.drain(batch_size=3), {})
+        create.assert_called_once()
+        self.assertEqual(
+            supabase.auth.admin.deleted,
+            ["supabase-1", "supabase-2", "supabase-3", "supabase-4"],
+        )
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_failures_are_retried_with_backoff(self):
+        self.user.delete()
+        supabase = stub_supabase([ConnectionError("timed out")] * 2)
+        worker = OutboxWorker(supabase=supabase, base_delay=30)
+
+        before = timezone.now()
+        self.assertEqual(worker.drain(), {"retried": 1})
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.attempts, 1)
+        self.assertEqual(message.last_error, "ConnectionError: timed out")
+        self.assertGreaterEqual((message.available_at - before).total_seconds(), 30)
+        # Not due yet
+        self.assertEqual(worker.drain(), {})
+
+        self.make_due()
+        self.assertEqual(worker.drain(), {"retried": 1})
+        message.refresh_from_db()
+        self.assertGreaterEqual((message.available_at - before).total_seconds(), 60)
+
+        self.make_due()
+        self.assertEqual(worker.drain(), {"delivered": 1})
+        self.assertEqual(supabase.auth.admin.deleted, ["supabase-1"])
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_dead_lettered_after_max_attempts(self):
+        self.user.delete()
+        supabase = stub_supabase([SupabaseError("Forbidden", 403)] * 3)
+        worker = OutboxWorker(supabase=supabase, max_attempts=3)
+
+        outcomes = []
+        for _ in range(3):
+            outcomes.append(worker.drain())
+            self.make_due()
+        self.assertEqual(outcomes, [{"retried": 1}, {"retried": 1}, {"dead": 1}])
+
+        message = OutboxMessage.objects.get()
+        self.assertIsNotNone(message.dead_at)
+        self.assertEqual(message.last_error, "SupabaseError: Forbidden")
+        # Dead messages are never claimed again, even when due
+        self.assertEqual(worker.drain(), {})
+
+    def test_user_already_deleted_from_supabase(self):
+        self.user.delete()
+        supabase = stub_supabase([SupabaseError("User not found", 404)])
+        self.assertEqual(OutboxWorker(supabase=supabase).drain(), {"delivered": 1})
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_claimed_messages_are_leased(self):
+        self.user.delete()
+        self.assertEqual(len(OutboxMessage.claim(10, timedelta(minutes=5))), 1)
+        # Held by the first claim until its lease runs out
+        self.assertEqual(OutboxMessage.claim(10, timedelta(minutes=5)), [])
+
+    def test_leases_are_renewed_before_each_call(self):
+        self.user.delete()
+        User.objects.create_user(
+            username="lifter-2", email="lifter-2@test.com", supabase_id="supabase-2"
+        ).delete()
+        supabase = stub_supabase()
+        worker = OutboxWorker(supabase=supabase, lease=60)
+        leases = []
+
+        def delete_user(supabase_id):
+            leases.append(OutboxMessage.objects.get(payload__supabase_id=supabase_id))
+            supabase.auth.admin.deleted.append(supabase_id)
+
+        supabase.auth.admin.delete_user = delete_user
+        self.assertEqual(worker.drain(), {"delivered": 2})
+        # Both were claimed with the same lease, the second's runs from its call
+        first, second = leases
+        self.assertGreater(second.available_at, first.available_at)
+
+    def test_messages_claimed_by_another_worker_are_skipped(self):
+        self.user.delete()
+        supabase = stub_supabase()
+        worker = OutboxWorker(supabase=supabase)
+        claim = OutboxMessage.claim
+
+        def claim_then_lose_lease(limit, lease):
+            messages = claim(limit, lease)
+            # The lease ran out and another worker claimed the message
+            OutboxMessage.objects.update(available_at=timezone.now() + lease * 2)
+            return messages
+
+        with patch.object(OutboxMessage, "claim", claim_then_lose_lease):
+            self.assertEqual(worker.drain(), {})
+        self.assertEqual(supabase.auth.admin.deleted, [])
+        self.assertTrue(OutboxMessage.objects.exists())
+
+    def test_backoff(self):
+        delays = [backoff(attempts, 30, 3600) for attempts in range(1, 10)]
+        self.assertEqual(delays, [30, 60, 120, 240, 480, 960, 1920, 3600, 3600])
+
+    def test_drain_outbox_command(self):
+        self.user.delete()
+        supabase = stub_supabase()
+        out = StringIO()
+        with (
+            patch("tracker.outbox.create_client", return_value=supabase),
+            patch(
+                "tracker.management.commands.drain_outbox.close_old_connections"
+            ) as close_old_connections,
+        ):
+            call_command("drain_outbox", "--once", stdout=out)
+        close_old_connections.assert_called_once()
+        self.assertEqual(supabase.auth.admin.deleted, ["supabase-1"])
+        self.assertIn("Delivered 1, retrying 0, dead-lettered 0.", out.getvalue())
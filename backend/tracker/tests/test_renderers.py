@@ -0,0 +1,97 @@
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+import msgpack
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from tracker.models import Exercise, Set, Workout
+from tracker.renderers import MessagePackRenderer, ORJSONRenderer
+
+User = get_user_model()
+
+
+class RendererTests(APITestCase):
+    def test_orjson_matches_drf_json(self):
+        data = {
+            "date": datetime(2024, 3, 4, 18, 0, 0, 123456, tzinfo=dt_timezone.utc),
+            "weights": [80.0, 82.5, 0.1 + 0.2],
+            "decimal": Decimal("2.50"),
+            "rest_period": timedelta(seconds=90),
+            "label": gettext_lazy("Bench Press"),
+            "name": "Zercher Squat ✓",
+            "nested": {"reps": None, "done": True},
+        }
+        self.assertEqual(
+            json.loads(ORJSONRenderer().render(data)),
+            json.loads(JSONRenderer().render(data)),
+        )
+
+    def test_indented_json_is_left_to_drf(self):
+        rendered = ORJSONRenderer().render({"a": 1}, "application/json; indent=4", {})
+        self.assertEqual(rendered, b'{\n    "a": 1\n}')
+
+    def test_messagepack_falls_back_to_json_types(self):
+        data = {"date": datetime(2024, 3, 4, tzinfo=dt_timezone.utc), "n": 1.5}
+        self.assertEqual(
+            msgpack.unpackb(MessagePackRenderer().render(data)),
+            {"date": "2024-03-04T00:00:00Z", "n": 1.5},
+        )
+
+
+class ContentNegotiationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", password="testpassword", email="user@user.com"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.workout = Workout.objects.create(
+            user=self.user, name="Push", date=timezone.now()
+        )
+        exercise = Exercise.objects.create(
+            workout=self.workout, name="Bench Press", rest_period=timedelta(seconds=90)
+        )
+        Set.objects.create(
+            exercise=exercise, min_reps=5, max_reps=8, reps=6, weight=82.5
+        )
+        self.url = reverse("workout-detail", args=[self.workout.id])
+
+    def test_json_is_the_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(
+            json.loads(response.content),
+            json.loads(JSONRenderer().render(response.data)),
+        )
+
+    def test_messagepack_on_request(self):
+        json_response = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), json_response.json())
+        # A different representation, so a different ETag
+        self.assertNotEqual(response["ETag"], json_response["ETag"])
+
+    def test_messagepack_request_body(self):
+        response = self.client.post(
+            reverse("exercisegoal-list"),
+            msgpack.packb({"exercise_name": "Squat", "goal_weight": 140.0}),
+            content_type="application/msgpack",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_malformed_bodies(self):
+        for body, content_type in [
+            (b'{"exercise_name": ', "application/json"),
+            (b"\xc1", "application/msgpack"),
+        ]:
+            response = self.client.post(
+                reverse("exercisegoal-list"), body, content_type=content_type
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,11 +1,14 @@
 from django.urls import path, include
-from . import views
+from . import async_views, views
 from rest_framework import routers
 
 router = routers.DefaultRouter()
 router.register(r"users", views.UserViewSet, basename="user")
 router.register(r"workouts", views.WorkoutViewSet, basename="workout")
 router.register(r"exercises", views.ExerciseViewSet, basename="exercise")
+router.register(
+    r"exercise-summaries", views.ExerciseSummaryViewSet, basename="exercisesummary"
+)
 router.register(
     r"workout-templates", views.WorkoutTemplateViewSet, basename="workouttemplate"
 )
@@ -16,6 +19,35 @@ router.register(
 )
 router.register(r"exercise-goals", views.ExerciseGoalViewSet, basename="exercisegoal")
 
+# Async versions of read-heavy endpoints, at the same paths under async/
+async_urlpatterns = [
+    path(
+        "exercises/directory/",
+        async_views.ExerciseDirectoryView.as_view(),
+        name="async-exercise-directory",
+    ),
+    path(
+        "exercises/last-performance/",
+        async_views.LastPerformanceView.as_view(),
+        name="async-exercise-last-performance",
+    ),
+    path(
+        "exercises/single-exercise-history/",
+        async_views.SingleExerciseHistoryView.as_view(),
+        name="async-exercise-single-exercise-history",
+    ),
+    path(
+        "exercise-goals/",
+        async_views.ExerciseGoalListView.as_view(),
+        name="async-exercisegoal-list",
+    ),
+]
+
 urlpatterns = [
     path("", include(router.urls)),
+    path("sync/", views.SyncView.as_view(), name="sync"),
+    path("batch/", views.BatchView.as_view(), name="batch"),
+    path("export/<str:file_format>/", views.ExportView.as_view(), name="export"),
+    path("import/", views.ImportView.as_view(), name="import"),
+    path("async/", include(async_urlpatterns)),
 ]
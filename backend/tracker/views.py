@@ -1,10 +1,21 @@
 from .models import *
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Max
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.db.models import Count, F, Max, Prefetch, Sum
+from django.db.models.functions import TruncDate
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from rest_framework import viewsets, status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.parsers import MultiPartParser
+from rest_framework.views import APIView
+from . import batch, export, fast_reads, importer
+from .etags import ConditionalGetMixin
+from .response_cache import cache_response
 from .permissions import *
 from .serializers import *
 
@@ -28,13 +39,34 @@ class UserViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
 
-class WorkoutTemplateViewSet(viewsets.ModelViewSet):
+class WorkoutTemplateViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    """
+    list: 1 query. Detail actions: 3 queries (templates with their version,
+    exercise templates, set templates).
+    """
+
     serializer_class = WorkoutTemplateSerializer
     permission_classes = [IsAuthenticated, IsObjectOwner]
 
     def get_queryset(self):
         user = self.request.user
-        return WorkoutTemplate.objects.filter(user=user)
+        queryset = WorkoutTemplate.objects.filter(user=user).select_related("user")
+        if self.action == "list":
+            return queryset
+        return prefetch_template_contents(queryset)
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return WorkoutTemplateListSerializer
+        return self.serializer_class
+
+    @cache_response("templates")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(lambda pk: f"template:{pk}")
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
 
     @action(detail=True, methods=["post"], url_path="duplicate")
     def duplicate(self, request, pk=None):
@@ -52,27 +84,115 @@ class WorkoutTemplateViewSet(viewsets.ModelViewSet):
             )
 
 
-class WorkoutViewSet(viewsets.ModelViewSet):
+class WorkoutViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    """
+    list: 1 query. Detail actions: 3 queries (workout, exercises, sets).
+    ingest: 2 queries (templates, existing keys) when every workout was
+    already uploaded.
+    """
+
     serializer_class = WorkoutSerializer
     permission_classes = [IsAuthenticated, IsObjectOwner]
 
     def get_queryset(self):
         user = self.request.user
-        return Workout.objects.filter(user=user).order_by("-date")
+        queryset = (
+            Workout.objects.filter(user=user).select_related("user").order_by("-date")
+        )
+        if self.action == "list":
+            return queryset
+        return prefetch_exercises(queryset)
 
     def get_serializer_class(self):
         if self.action == "list":
             return WorkoutListSerializer
         return self.serializer_class
 
+    def list(self, request, *args, **kwargs):
+        # WorkoutListSerializer's output, built from plain rows
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(fast_reads.workout_list(request, queryset))
+
+    @action(detail=False, methods=["post"], url_path="ingest")
+    def ingest(self, request):
+        """
+        Uploads complete workouts logged offline:
+
+            {"workouts": [{"client_key", "name", "date", "notes"?,
+                           "template"?, "exercises"?}, ...]}
+
+        client_key is generated by the app and identifies the workout, so
+        retrying or replaying an upload is safe: workouts whose key exists are
+        not written again. Returns the server id for every key and which keys
+        were created by this call.
+        """
+        serializer = WorkoutIngestBatchSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        ids, created = Workout.ingest(
+            request.user, serializer.validated_data["workouts"]
+        )
+        return Response(
+            {"ids": ids, "created": created},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+def get_time_zone(request):
+    """
+    The ?tz= query parameter as a ZoneInfo (UTC if missing), None if unknown.
+    """
+    try:
+        return ZoneInfo(request.query_params.get("tz", "UTC"))
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def prefetch_template_contents(queryset):
+    return queryset.select_related("current_version").prefetch_related(
+        Prefetch(
+            "current_version__exercise_templates",
+            queryset=ExerciseTemplate.objects.order_by("id"),
+        ),
+        Prefetch(
+            "current_version__exercise_templates__set_templates",
+            queryset=SetTemplate.objects.order_by("id"),
+        ),
+    )
+
+
+def prefetch_exercises(queryset):
+    return queryset.prefetch_related(
+        Prefetch("exercises", queryset=Exercise.objects.order_by("id")),
+        Prefetch("exercises__sets", queryset=Set.objects.order_by("id")),
+    )
+
+
+def prefetch_sets(queryset):
+    return queryset.prefetch_related(
+        Prefetch("sets", queryset=Set.objects.order_by("id"))
+    )
+
+
+class ExerciseViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    list, retrieve and single-exercise-history: 2 queries (exercises, sets).
+    last-performance and last-performances: 3, as they also load the current
+    workout.
+    directory, search and one-rep-max-series: 1 query.
+    """
 
-class ExerciseViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = ExerciseSerializer
     permission_classes = [IsAuthenticated, IsObjectOwner]
 
     def get_queryset(self):
         user = self.request.user
-        return Exercise.objects.filter(workout__user=user)
+        queryset = prefetch_sets(Exercise.objects.filter(user=user))
+        if self.action == "retrieve":
+            # For the ownership check
+            return queryset.select_related("user")
+        return queryset
 
     @action(detail=False, methods=["get"], url_path="last-performance")
     def last_performance(self, request):
@@ -95,15 +215,13 @@ class ExerciseViewSet(viewsets.ReadOnlyModelViewSet):
                 {"error": "Workout not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        last_exercise = (
+        last_exercise = prefetch_sets(
             Exercise.objects.filter(
-                workout__user=request.user,
+                user=request.user,
                 name=exercise_name,
-                workout__date__lt=current_workout.date,
-            )
-            .order_by("-workout__date")
-            .first()
-        )
+                date__lt=current_workout.date,
+            ).order_by("-date", "-id")
+        ).first()
 
         if last_exercise:
             serializer = self.get_serializer(last_exercise)
@@ -111,7 +229,43 @@ class ExerciseViewSet(viewsets.ReadOnlyModelViewSet):
         else:
             return Response(None)
 
+    @action(detail=False, methods=["get"], url_path="last-performances")
+    def last_performances(self, request):
+        """
+        The previous performance of every exercise in the ?workout_id= workout,
+        keyed by exercise name. Exercises with no earlier performance are left
+        out.
+        """
+        current_workout_id = request.query_params.get("workout_id")
+
+        if not current_workout_id:
+            return Response(
+                {"error": "Missing 'workout_id' query parameter"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            current_workout = Workout.objects.only("id", "date").get(
+                id=current_workout_id, user=request.user
+            )
+        except (Workout.DoesNotExist, ValueError):
+            return Response(
+                {"error": "Workout not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+
+        last_exercises = prefetch_sets(
+            Exercise.objects.latest_per_name(
+                request.user,
+                current_workout.exercises.values("name"),
+                before=current_workout.date,
+            )
+        )
+
+        serializer = self.get_serializer(last_exercises, many=True)
+        return Response({exercise["name"]: exercise for exercise in serializer.data})
+
     @action(detail=False, methods=["get"], url_path="directory")
+    @cache_response("exercises")
     def directory(self, request):
         """
         Returns a list of unique user completed exercise names, sorted by the date they were
@@ -119,21 +273,43 @@ class ExerciseViewSet(viewsets.ReadOnlyModelViewSet):
         """
         search_query = request.query_params.get("search", None)
 
-        queryset = Exercise.objects.filter(workout__user=request.user)
-
         if search_query:
-            queryset = queryset.filter(name__icontains=search_query)
+            return Response(
+                ExerciseNameTrigram.search(
+                    request.user, search_query, performed_only=True
+                )
+            )
 
         exercises = (
-            queryset.values("name")
-            .annotate(last_performed=Max("workout__date"))
+            ExerciseSummary.objects.filter(user=request.user)
             .order_by("-last_performed")
             .values_list("name", flat=True)
         )
 
         return Response(list(exercises))
 
+    @action(detail=False, methods=["get"], url_path="search")
+    def search(self, request):
+        """
+        Searches the names of exercises the user has performed and their custom
+        exercise names, tolerating prefixes and typos. Takes ?q= and an optional
+        ?limit=, best match first then most recently performed.
+        """
+        query = request.query_params.get("q", "")
+        try:
+            limit = int(request.query_params.get("limit", 20))
+        except ValueError:
+            return Response(
+                {"error": "'limit' must be an integer"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            ExerciseNameTrigram.search(request.user, query, limit=max(limit, 1))
+        )
+
     @action(detail=False, methods=["get"], url_path="single-exercise-history")
+    @cache_response("exercises")
     def single_exercise_history(self, request):
         """
         Returns the exercise history for a specific exercise, oldest to newest
@@ -148,21 +324,93 @@ class ExerciseViewSet(viewsets.ReadOnlyModelViewSet):
 
         exercise_history = (
             Exercise.objects.filter(
-                workout__user=request.user,
+                user=request.user,
                 name=exercise_name,
                 sets__reps__isnull=False,
                 sets__weight__isnull=False,
             )
             .distinct()
-            .select_related("workout")
-            .order_by("workout__date")
+            .order_by("date")
         )
 
-        serializer = self.get_serializer(exercise_history, many=True)
-        return Response(serializer.data)
+        # ExerciseSerializer's output, built from plain rows
+        return Response(fast_reads.exercise_history(exercise_history))
+
+    @action(detail=False, methods=["get"], url_path="one-rep-max-series")
+    def one_rep_max_series(self, request):
+        """
+        Daily max weight, max estimated 1RM and volume for one exercise as
+        parallel arrays, oldest day first. Days are bucketed in the ?tz= time
+        zone (UTC by default).
+        """
+        exercise_name = request.query_params.get("exercise_name")
 
+        if not exercise_name:
+            return Response(
+                {"error": "Missing 'exercise_name' in query parameters"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-class CustomExerciseNameViewSet(viewsets.ModelViewSet):
+        tz = get_time_zone(request)
+        if tz is None:
+            return Response(
+                {"error": "Unknown time zone in 'tz' query parameter"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        days = (
+            Set.objects.filter(
+                valid_set_filter(),
+                exercise__user=request.user,
+                exercise__name=exercise_name,
+            )
+            .annotate(day=TruncDate("exercise__date", tzinfo=tz))
+            .values("day")
+            .annotate(
+                max_weight=Max("weight"),
+                max_one_rep_max=Max(one_rep_max("weight", "reps")),
+                volume=Sum(F("weight") * F("reps")),
+            )
+            .order_by("day")
+            .values_list("day", "max_weight", "max_one_rep_max", "volume")
+        )
+
+        dates, max_weight, max_one_rep_max, volume = [], [], [], []
+        for day, weight, estimate, day_volume in days:
+            dates.append(day.isoformat())
+            max_weight.append(weight)
+            max_one_rep_max.append(estimate)
+            volume.append(day_volume)
+
+        return Response(
+            {
+                "dates": dates,
+                "max_weight": max_weight,
+                "max_one_rep_max": max_one_rep_max,
+                "volume": volume,
+            }
+        )
+
+
+class ExerciseSummaryViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Per-exercise statistics for the progress list, most recently performed
+    first. 1 query.
+    """
+
+    serializer_class = ExerciseSummarySerializer
+    permission_classes = [IsAuthenticated, IsObjectOwner]
+
+    def get_queryset(self):
+        user = self.request.user
+        return ExerciseSummary.objects.filter(user=user).order_by("-last_performed")
+
+    @cache_response("exercises")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+
+class CustomExerciseNameViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = CustomExerciseNameSerializer
     permission_classes = [IsAuthenticated, IsObjectOwner]
 
@@ -171,9 +419,11 @@ class CustomExerciseNameViewSet(viewsets.ModelViewSet):
         return CustomExerciseName.objects.filter(user=user)
 
 
-class ExerciseGoalViewSet(viewsets.ModelViewSet):
+class ExerciseGoalViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = ExerciseGoalSerializer
     permission_classes = [IsAuthenticated, IsObjectOwner]
+    # Predictions move on with the current date
+    etag_exempt_actions = ("predictions",)
 
     def get_queryset(self):
         user = self.request.user
@@ -183,3 +433,243 @@ class ExerciseGoalViewSet(viewsets.ModelViewSet):
             return queryset.filter(exercise_name=name)
 
         return queryset
+
+    @cache_response("goals")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @action(detail=False, methods=["get"], url_path="predictions")
+    def predictions(self, request):
+        """
+        Goal date predictions for all of the user's goals (or ?exercise_name=)
+        in one response. Daily maxes are bucketed in the ?tz= time zone.
+        """
+        tz = get_time_zone(request)
+        if tz is None:
+            return Response(
+                {"error": "Unknown time zone in 'tz' query parameter"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Imported here as it loads NumPy, which no other endpoint needs
+        from . import analytics
+
+        goals = list(self.get_queryset())
+        daily_maxes = analytics.load_daily_maxes(
+            request.user, {goal.exercise_name for goal in goals}, tz
+        )
+        return Response(analytics.predict_goals(goals, daily_maxes, timezone.now(), tz))
+
+
+class SyncView(ConditionalGetMixin, APIView):
+    """
+    Workouts and templates changed since ?since=, the cursor returned by the
+    previous sync (leave it out to get everything), plus the ids of those
+    deleted since. At most ?limit= changes are returned, oldest first. While
+    has_more is true, call again with the new cursor.
+
+    At most 9 queries on top of the data version lookup: changed ids (3),
+    workouts (3) and templates (3).
+    """
+
+    permission_classes = [IsAuthenticated]
+    page_size = 500
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get("since", 0))
+            limit = int(request.query_params.get("limit", self.page_size))
+        except ValueError:
+            return Response(
+                {"error": "'since' and 'limit' must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if since < 0 or limit < 1:
+            return Response(
+                {"error": "'since' must not be negative and 'limit' must be positive"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = min(limit, self.page_size)
+
+        # Read first: anything committed after it is picked up by the next sync
+        current = self.data_version
+        changed = Q(user=request.user, sync_version__gt=since)
+        changed &= Q(sync_version__lte=current)
+
+        # The first limit + 1 changes of each kind, merged below
+        changes = [
+            (version, Tombstone.WORKOUT, pk)
+            for version, pk in Workout.objects.filter(changed)
+            .order_by("sync_version")
+            .values_list("sync_version", "pk")[: limit + 1]
+        ]
+        changes += [
+            (version, Tombstone.WORKOUT_TEMPLATE, pk)
+            for version, pk in WorkoutTemplate.objects.filter(changed)
+            .order_by("sync_version")
+            .values_list("sync_version", "pk")[: limit + 1]
+        ]
+        deleted = set()
+        if since:
+            tombstones = (
+                Tombstone.objects.filter(changed)
+                .order_by("sync_version")
+                .values_list("sync_version", "model", "object_id")[: limit + 1]
+            )
+            for version, model, object_id in tombstones:
+                changes.append((version, model, object_id))
+                deleted.add(version)
+
+        changes.sort()
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        ids = {
+            key: {"changed": [], "deleted": []}
+            for key in (Tombstone.WORKOUT, Tombstone.WORKOUT_TEMPLATE)
+        }
+        for version, model, pk in changes:
+            ids[model]["deleted" if version in deleted else "changed"].append(pk)
+
+        context = {"request": request}
+        workouts = prefetch_exercises(
+            Workout.objects.filter(pk__in=ids[Tombstone.WORKOUT]["changed"])
+            .select_related("user")
+            .order_by("sync_version")
+        )
+        templates = prefetch_template_contents(
+            WorkoutTemplate.objects.filter(
+                pk__in=ids[Tombstone.WORKOUT_TEMPLATE]["changed"]
+            )
+            .select_related("user")
+            .order_by("sync_version")
+        )
+        return Response(
+            {
+                "cursor": changes[-1][0] if has_more else current,
+                "has_more": has_more,
+                "workouts": WorkoutSerializer(
+                    workouts, many=True, context=context
+                ).data,
+                "workout_templates": WorkoutTemplateSerializer(
+                    templates, many=True, context=context
+                ).data,
+                "deleted": {
+                    "workouts": ids[Tombstone.WORKOUT]["deleted"],
+                    "workout_templates": ids[Tombstone.WORKOUT_TEMPLATE]["deleted"],
+                },
+            }
+        )
+
+
+class BatchView(APIView):
+    """
+    Runs up to BATCH_MAX_REQUESTS API requests in one round trip:
+
+        {"requests": [{"method": "GET", "path": "/api/workouts/"}, ...]}
+
+    Paths may leave out the /api prefix. Each request may also have a JSON
+    "body" and "headers" such as If-None-Match. The batch is authenticated
+    once and every request runs as its user, in order, on the same database
+    connection. Set "atomic" to run them in one transaction that is rolled
+    back if any of them fails, in which case the requests after the failing
+    one are not run.
+
+    Returns {"responses": [{"status", "body", "headers"?}, ...]} in request
+    order, with status 400 if an atomic batch was rolled back.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        atomic = serializer.validated_data["atomic"]
+        responses = batch.run_batch(
+            request, serializer.validated_data["requests"], atomic, type(self)
+        )
+        rolled_back = atomic and responses[-1]["status"] >= 400
+        return Response(
+            {"responses": responses},
+            status=status.HTTP_400_BAD_REQUEST if rolled_back else status.HTTP_200_OK,
+        )
+
+
+class ExportView(APIView):
+    """
+    The user's whole log as a download, streamed so that it takes constant
+    memory however long the history is. /api/export/csv/ has one row per set,
+    /api/export/ndjson/ one workout per line, both oldest first.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # The file is streamed as is, Accept only picks how errors render
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, file_format):
+        if file_format not in export.FORMATS:
+            raise NotFound(f"Unknown export format '{file_format}'.")
+        stream, content_type = export.FORMATS[file_format]
+        filename = f"lifting-log-{timezone.localdate().isoformat()}.{file_format}"
+        content = stream(request.user)
+        if isinstance(request._request, ASGIRequest):
+            content = export.aiterate(content)
+        return StreamingHttpResponse(
+            content,
+            content_type=content_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+
+
+class ImportView(APIView):
+    """
+    Imports a CSV export from Strong, Hevy or this app, uploaded as the
+    multipart field "file". The format is detected from the header unless
+    "profile" is given. Dates without a time zone are read in ?tz=.
+
+    The upload is read and written in chunks as it is parsed, so it takes
+    the same memory however big it is. Workouts already imported are skipped,
+    so a failed import can be retried with the same file. Very large files
+    are better imported with the import_workouts command.
+    """
+
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        profile = request.data.get("profile") or None
+        if upload is None:
+            return Response(
+                {"error": "Upload the CSV as 'file'"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if profile is not None and profile not in importer.PROFILES:
+            return Response(
+                {"error": f"'profile' must be one of {sorted(importer.PROFILES)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        tz = get_time_zone(request)
+        if tz is None:
+            return Response(
+                {"error": "Unknown time zone"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        progress = {}
+        try:
+            totals = importer.import_csv(
+                request.user,
+                importer.decode_upload(upload),
+                profile=profile,
+                tz=tz,
+                progress=progress.update,
+            )
+        except importer.CSVImportError as e:
+            # Chunks before the error stay imported
+            return Response(
+                {"error": str(e), "imported": progress},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(totals, status=status.HTTP_201_CREATED)
@@ -13,7 +13,7 @@ import {
     createExerciseGoal,
     updateExerciseGoal,
     fetchExerciseGoal,
-    fetchSingleExerciseHistory,
+    fetchExerciseProgress,
 } from "@/services/api";
 import { useState, useLayoutEffect, useCallback, useMemo } from "react";
 import { LineChart } from "react-native-gifted-charts";
@@ -62,11 +62,22 @@ export default function ProgressDetailScreen() {
         navigation.setOptions({ title: exercise_name });
     }, [navigation]);
 
-    const getSingleExerciseHistory = async () => {
+    const applyExerciseGoals = (goals: ExerciseGoal[]) => {
+        if (goals.length > 0) {
+            setExerciseGoal(goals[0]);
+            setOriginalGoalWeight(goals[0].goal_weight);
+        } else {
+            setOriginalGoalWeight(undefined);
+        }
+    };
+
+    const getExerciseProgress = async () => {
         try {
             setLoading(true);
-            const res = await fetchSingleExerciseHistory(exercise_name);
-            setExerciseHistory(res.data);
+            const { history, goals } =
+                await fetchExerciseProgress(exercise_name);
+            setExerciseHistory(history);
+            applyExerciseGoals(goals);
         } catch (error) {
             Alert.alert("Error", "Failed to fetch this exercise's history.");
         } finally {
@@ -77,12 +88,7 @@ export default function ProgressDetailScreen() {
     const getExerciseGoal = async () => {
         try {
             const res = await fetchExerciseGoal(exercise_name);
-            if (res.data.length > 0) {
-                setExerciseGoal(res.data[0]);
-                setOriginalGoalWeight(res.data[0].goal_weight);
-            } else {
-                setOriginalGoalWeight(undefined);
-            }
+            applyExerciseGoals(res.data);
         } catch (error) {
             console.error("Failed to fetch goal", error);
         }
@@ -126,8 +132,7 @@ export default function ProgressDetailScreen() {
 
     useFocusEffect(
         useCallback(() => {
-            getSingleExerciseHistory();
-            getExerciseGoal();
+            getExerciseProgress();
         }, [exercise_name]),
     );
 
@@ -9,11 +9,15 @@ import {
     Text,
 } from "react-native";
 import { useLocalSearchParams } from "expo-router";
-import { fetchWorkout, updateWorkout } from "@/services/api";
+import {
+    fetchLastExercisePerformances,
+    fetchWorkout,
+    updateWorkout,
+} from "@/services/api";
 import ExerciseCard from "./_components/ExerciseCard";
 import useDebounce from "@/hooks/useDebounce";
 import { useNavigation } from "expo-router";
-import { Workout } from "@/types";
+import { Exercise, Workout } from "@/types";
 import { Textarea } from "@/components/ui/textarea";
 import ScreenStateWrapper from "@/components/common/screen-state-wrapper";
 import {
@@ -33,6 +37,11 @@ export default function WorkoutDetailScreen() {
         null,
     );
     const [loading, setLoading] = useState(true);
+    const [lastPerformances, setLastPerformances] = useState<
+        Record<string, Exercise>
+    >({});
+    const [isLoadingLastPerformances, setIsLoadingLastPerformances] =
+        useState(true);
     const [isSaving, setIsSaving] = useState(false);
     const [isEditing, setIsEditing] = useState(false);
 
@@ -78,8 +87,23 @@ export default function WorkoutDetailScreen() {
         }
     };
 
+    // One request for the previous performance of every exercise card
+    const getLastPerformances = async () => {
+        if (!id) return;
+        try {
+            setIsLoadingLastPerformances(true);
+            const res = await fetchLastExercisePerformances(id);
+            setLastPerformances(res.data);
+        } catch (error) {
+            console.error(error);
+        } finally {
+            setIsLoadingLastPerformances(false);
+        }
+    };
+
     useEffect(() => {
         getWorkout();
+        getLastPerformances();
     }, [id]);
 
     useLayoutEffect(() => {
@@ -335,7 +359,14 @@ export default function WorkoutDetailScreen() {
                                         <ExerciseCard
                                             exercise={exercise}
                                             exerciseIndex={index}
-                                            workoutId={workout.id}
+                                            lastPerformance={
+                                                lastPerformances[
+                                                    exercise.name
+                                                ] ?? null
+                                            }
+                                            isLoadingLastPerformance={
+                                                isLoadingLastPerformances
+                                            }
                                             onSetUpdate={handleSetUpdate}
                                             isLast={
                                                 index ===
@@ -1,7 +1,5 @@
 import { View, Text, TouchableOpacity } from "react-native";
 import { Exercise } from "@/types";
-import { useEffect, useState } from "react";
-import { fetchLastExercisePerformance } from "@/services/api";
 import SetRow from "./SetRow";
 import { Plus, Timer as TimerIcon } from "lucide-react-native";
 import { Icon } from "@/components/ui/icon";
@@ -16,7 +14,8 @@ interface ExerciseCardProps {
         value: string,
     ) => void;
     exerciseIndex: number;
-    workoutId: number;
+    lastPerformance: Exercise | null;
+    isLoadingLastPerformance: boolean;
     isLast?: boolean;
     isEditing: boolean;
     onAddSet: (exerciseIndex: number) => void;
@@ -28,39 +27,14 @@ export default function ExerciseCard({
     exercise,
     onSetUpdate,
     exerciseIndex,
-    workoutId,
+    lastPerformance,
+    isLoadingLastPerformance,
     isLast,
     isEditing,
     onAddSet,
     onDeleteSet,
     onStartRestTimer,
 }: ExerciseCardProps) {
-    const [lastPerformance, setLastPerformance] = useState<Exercise | null>(
-        null,
-    );
-    const [isLoadingLastPerformance, setIsLoadingLastPerformance] =
-        useState<boolean>(true);
-
-    useEffect(() => {
-        const fetchLastPerformance = async () => {
-            if (!workoutId || !exercise.name) return;
-            try {
-                setIsLoadingLastPerformance(true);
-                const res = await fetchLastExercisePerformance(
-                    exercise.name,
-                    workoutId,
-                );
-                setLastPerformance(res.data);
-            } catch (error) {
-                console.error(error);
-            } finally {
-                setIsLoadingLastPerformance(false);
-            }
-        };
-
-        fetchLastPerformance();
-    }, []);
-
     const formatLastPerformanceSet = (setIndex: number) => {
         if (
             !lastPerformance ||
@@ -34,6 +34,29 @@ api.interceptors.request.use(
 // API Service Layer
 // ===================================
 
+// --- Batch ---
+
+export type BatchRequest = {
+    method: "GET" | "POST" | "PUT" | "PATCH" | "DELETE";
+    path: string;
+    body?: unknown;
+};
+
+export type BatchResponse<T = any> = {
+    status: number;
+    body: T;
+    headers?: Record<string, string>;
+};
+
+// Runs several requests in one round trip, responses come back in order
+export const batch = async (requests: BatchRequest[], atomic = false) => {
+    const response = await api.post<{ responses: BatchResponse[] }>(
+        "/batch/",
+        { requests, atomic },
+    );
+    return response.data.responses;
+};
+
 // --- Workouts ---
 
 export const fetchWorkoutList = async () => {
@@ -54,6 +77,21 @@ export const createWorkout = async (template_url: string, date: Date) => {
     return response;
 };
 
+export type OfflineWorkout = Omit<Workout, "id"> & {
+    client_key: string;
+    template?: number;
+};
+
+// Workouts logged offline, each with a key generated when it was logged.
+// Safe to retry: workouts already uploaded under their key are left alone.
+export const ingestWorkouts = async (workouts: OfflineWorkout[]) => {
+    const response = await api.post<{
+        ids: Record<string, number>;
+        created: string[];
+    }>("/workouts/ingest/", { workouts });
+    return response;
+};
+
 export const updateWorkout = async (id: number | string, data: Workout) => {
     const response = await api.put<Workout>(`/workouts/${id}/`, data);
     return response;
@@ -114,32 +152,19 @@ export const duplicateTemplate = async (id: number | string) => {
 
 // --- Exercises ---
 
-export const fetchSingleExerciseHistory = async (exercise_name: string) => {
-    const response = await api.get<Exercise[]>(
-        "/exercises/single-exercise-history/",
-        {
-            params: {
-                exercise_name,
-            },
-        },
-    );
-    return response;
-};
-
 export const fetchPerformedExercises = async () => {
     const response = await api.get<string[]>("/exercises/directory/");
     return response;
 };
 
-export const fetchLastExercisePerformance = async (
-    name: string,
-    workoutId: number,
+// Keyed by exercise name, exercises with no previous performance are left out
+export const fetchLastExercisePerformances = async (
+    workoutId: number | string,
 ) => {
-    const response = await api.get<Exercise | null>(
-        "/exercises/last-performance/",
+    const response = await api.get<Record<string, Exercise>>(
+        "/exercises/last-performances/",
         {
             params: {
-                name: name,
                 workout_id: workoutId,
             },
         },
@@ -147,6 +172,22 @@ export const fetchLastExercisePerformance = async (
     return response;
 };
 
+// History and goal for the progress screen in one request
+export const fetchExerciseProgress = async (exercise_name: string) => {
+    const query = new URLSearchParams({ exercise_name }).toString();
+    const [history, goals] = await batch([
+        { method: "GET", path: `/exercises/single-exercise-history/?${query}` },
+        { method: "GET", path: `/exercise-goals/?${query}` },
+    ]);
+    if (history.status !== 200 || goals.status !== 200) {
+        throw new Error("Failed to fetch exercise progress");
+    }
+    return {
+        history: history.body as Exercise[],
+        goals: goals.body as ExerciseGoal[],
+    };
+};
+
 // --- Exercise Goals ---
 
 export const fetchExerciseGoal = async (exercise_name: string) => {